@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Request, Response, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import logging
 import time
+import json
+import hmac
 import hashlib
+import os
 
 logger = logging.getLogger("ChatbotRouter")
 router = APIRouter()
@@ -14,6 +18,8 @@ _recent_requests: dict = {}
 DEDUP_WINDOW_SECS = 2.0
 RATE_LIMIT_WINDOW = 60.0
 RATE_LIMIT_MAX    = 20
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"   # Prometheus text exposition
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")   # /debug/* endpoints are disabled while unset
 
 # { session_id: [timestamps] }
 _rate_tracker: dict = {}
@@ -21,13 +27,15 @@ _rate_tracker: dict = {}
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
-def _get_session_id(request: Request, chat_request=None) -> str:
+def _get_session_id(request, chat_request=None) -> str:
     """
-    Extract session_id from request.
-    Priority: body field → X-Session-ID header → client IP (fallback).
+    Extract session_id from a request or WebSocket handshake.
+    Priority: body field → session_id query param (WebSocket) → X-Session-ID header → client IP (fallback).
     """
     if chat_request and hasattr(chat_request, "session_id") and chat_request.session_id:
         return chat_request.session_id.strip()
+    if isinstance(request, WebSocket) and request.query_params.get("session_id", "").strip():
+        return request.query_params["session_id"].strip()
     header_id = request.headers.get("X-Session-ID", "").strip()
     if header_id:
         return header_id
@@ -35,6 +43,19 @@ def _get_session_id(request: Request, chat_request=None) -> str:
     return "ip_" + client_ip
 
 
+def _get_deadline_ms(request: Request) -> Optional[int]:
+    """
+    Client's time budget for this request from the X-Request-Deadline-Ms header
+    (how long it will wait, in ms). None → the service default applies.
+    """
+    raw = request.headers.get("X-Request-Deadline-Ms", "").strip()
+    try:
+        deadline_ms = int(raw)
+    except ValueError:
+        return None
+    return deadline_ms if deadline_ms > 0 else None
+
+
 def _is_duplicate(session_id: str, query: str) -> bool:
     key = hashlib.md5((session_id + query.strip().lower()).encode()).hexdigest()
     now = time.time()
@@ -61,15 +82,31 @@ def _is_rate_limited(session_id: str) -> bool:
     return False
 
 
-def _is_rag_ready(request: Request) -> bool:
+def _is_rag_ready(request) -> bool:
     """Check if RAG service is fully initialized and ready to accept queries."""
     try:
         svc = request.app.state.rag_service
-        return svc is not None and svc.vector_db is not None
+        return svc is not None and svc.ready
     except AttributeError:
         return False
 
 
+def _require_admin(request: Request):
+    """Debug endpoints need X-Admin-Token == ADMIN_TOKEN; without a configured token they do not exist."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def _count_rejection(request, reason: str):
+    """Count a canned-notice answer (not_ready / rate_limited / duplicate) in /metrics."""
+    svc = getattr(request.app.state, "rag_service", None)
+    if svc is not None:
+        svc.count_rejection(reason)
+
+
 def _error_response(message: str, session_id: str = None) -> dict:
     """
     Return a Flutter-safe error response in the same shape as ChatResponse.
@@ -89,6 +126,43 @@ def _error_response(message: str, session_id: str = None) -> dict:
     }
 
 
+def _sse(event: str, data) -> str:
+    """One Server-Sent Events frame with a JSON payload."""
+    return "event: " + event + "\ndata: " + json.dumps(data, ensure_ascii=False) + "\n\n"
+
+
+def _sse_payload(event: str, data, session_id: str):
+    """Client-facing payload of a pipeline event."""
+    if event == "token":
+        return {"text": data}
+    if event == "sources":
+        return {"sources": [str(s) for s in data]}
+    if event == "suggestions":
+        return {"suggestions": [chip.model_dump() for chip in _to_chips(data)]}
+    if event == "done":
+        return {
+            "answer":       data.get("answer", ""),
+            "display_type": data.get("display_type", "text"),
+            "char_count":   data.get("char_count", len(data.get("answer", ""))),
+            "session_id":   session_id,
+        }
+    return data
+
+
+def _sse_message(message: str, session_id: str):
+    """A complete SSE stream for a canned message (not ready, rate limited, duplicate)."""
+    body = _error_response(message, session_id)
+    yield _sse("meta", {"intent": None, "cached": False})
+    yield _sse("token", {"text": message})
+    yield _sse("sources", {"sources": []})
+    yield _sse("suggestions", {"suggestions": body["suggestions"]})
+    yield _sse("done", {"answer": message, "display_type": "text", "char_count": len(message),
+                        "session_id": session_id})
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
 # ── Request / Response Models ─────────────────────────────────────────────────
 
 class ChatRequest(BaseModel):
@@ -103,6 +177,12 @@ class ClearMemoryRequest(BaseModel):
     session_id: Optional[str] = None
 
 
+class ProfilerConfig(BaseModel):
+    sample_rate: Optional[float] = None   # fraction of requests to profile, 0–1
+    slow_ms:     Optional[float] = None   # also keep requests at least this slow; 0 = off
+    reset:       Optional[bool]  = False  # drop the samples aggregated so far
+
+
 class SuggestionChip(BaseModel):
     id:   int
     text: str
@@ -124,10 +204,32 @@ class ClearMemoryResponse(BaseModel):
     session_id: Optional[str] = None
 
 
+def _to_chips(raw_sugs) -> List[SuggestionChip]:
+    """Convert suggestion dicts / strings → SuggestionChip models, skipping malformed ones."""
+    suggestion_chips: List[SuggestionChip] = []
+    for s in raw_sugs:
+        try:
+            if isinstance(s, dict):
+                suggestion_chips.append(SuggestionChip(
+                    id=int(s.get("id", len(suggestion_chips) + 1)),
+                    text=str(s.get("text", "")),
+                    icon=str(s.get("icon", "🌿")),
+                ))
+            elif isinstance(s, str) and s.strip():
+                suggestion_chips.append(SuggestionChip(
+                    id=len(suggestion_chips) + 1,
+                    text=s.strip(),
+                    icon="🌿",
+                ))
+        except Exception as e:
+            logger.warning("Skipping malformed suggestion: " + str(e))
+    return suggestion_chips
+
+
 # ── Endpoints ─────────────────────────────────────────────────────────────────
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: Request, chat_request: ChatRequest):
+async def chat(request: Request, chat_request: ChatRequest, response: Response):
     """
     Main chat endpoint.
     - Returns Flutter-safe JSON even on errors (no raw 500s)
@@ -135,12 +237,17 @@ async def chat(request: Request, chat_request: ChatRequest):
     - Deduplicates double-tap requests within 2 seconds
     - Rate limits to 20 requests/minute per session
     - Passes session_id to RAG service for isolated memory
+    - Honours the client's X-Request-Deadline-Ms time budget end to end
+    - When the LLM lane for the query is full, answers at once with a
+      Retry-After header instead of queueing behind it
+    - Returns the request's trace id in X-Trace-ID (client-supplied if valid)
     """
     session_id = _get_session_id(request, chat_request)
 
     # ── FIX 3: Check RAG is fully ready before accepting queries ─────────────
     if not _is_rag_ready(request):
         logger.warning("Query received before RAG fully initialized")
+        _count_rejection(request, "not_ready")
         return ChatResponse(
             **_error_response(
                 "The assistant is still starting up. Please wait a few seconds and try again. 🌿",
@@ -151,6 +258,7 @@ async def chat(request: Request, chat_request: ChatRequest):
     # ── Rate limiting ─────────────────────────────────────────────────────────
     if _is_rate_limited(session_id):
         logger.warning("Rate limit hit for session: " + session_id)
+        _count_rejection(request, "rate_limited")
         # FIX 2: Return Flutter-safe response instead of raw 429
         return ChatResponse(
             **_error_response(
@@ -162,6 +270,7 @@ async def chat(request: Request, chat_request: ChatRequest):
     # ── Deduplication ─────────────────────────────────────────────────────────
     if _is_duplicate(session_id, chat_request.query):
         logger.info("Duplicate request ignored for session: " + session_id)
+        _count_rejection(request, "duplicate")
         # FIX 2: Return Flutter-safe response instead of raw 429
         return ChatResponse(
             **_error_response(
@@ -172,44 +281,32 @@ async def chat(request: Request, chat_request: ChatRequest):
 
     try:
         rag_service = request.app.state.rag_service
+        trace_id    = rag_service.new_trace_id(request.headers.get("X-Trace-ID"))
+        response.headers["X-Trace-ID"] = trace_id
 
-        result = rag_service.query(
+        result = await rag_service.aquery(
             message=chat_request.query,
             response_type=chat_request.response_type,
             include_suggestions=chat_request.include_suggestions,
             use_emojis=chat_request.use_emojis,
             session_id=session_id,
+            deadline_ms=_get_deadline_ms(request),
+            trace_id=trace_id,
         )
 
+        if result.get("retry_after"):
+            response.headers["Retry-After"] = str(result["retry_after"])
+            return ChatResponse(**_error_response(result["answer"], session_id))
+
         answer       = result.get("answer", "I couldn't find an answer for that.")
         sources      = result.get("sources", [])
-        raw_sugs     = result.get("suggestions", [])
         display_type = result.get("display_type", "text")
         char_count   = result.get("char_count")
 
-        # Convert suggestion dicts → SuggestionChip models
-        suggestion_chips: List[SuggestionChip] = []
-        for s in raw_sugs:
-            try:
-                if isinstance(s, dict):
-                    suggestion_chips.append(SuggestionChip(
-                        id=int(s.get("id", len(suggestion_chips) + 1)),
-                        text=str(s.get("text", "")),
-                        icon=str(s.get("icon", "🌿")),
-                    ))
-                elif isinstance(s, str) and s.strip():
-                    suggestion_chips.append(SuggestionChip(
-                        id=len(suggestion_chips) + 1,
-                        text=s.strip(),
-                        icon="🌿",
-                    ))
-            except Exception as e:
-                logger.warning("Skipping malformed suggestion: " + str(e))
-
         return ChatResponse(
             answer=answer,
             sources=[str(s) for s in sources],
-            suggestions=suggestion_chips,
+            suggestions=_to_chips(result.get("suggestions", [])),
             display_type=display_type,
             char_count=char_count,
             session_id=session_id,
@@ -229,41 +326,169 @@ async def chat(request: Request, chat_request: ChatRequest):
 @router.post("/chat/stream")
 async def chat_stream(request: Request, chat_request: ChatRequest):
     """
-    Streaming chat endpoint — text appears word-by-word on mobile.
-    Better perceived performance on slow connections.
+    Streaming chat endpoint (Server-Sent Events) — the same pipeline as /chat,
+    so one round trip gives the answer, sources and suggestions:
+      event: meta         {"intent", "language", "display_type", "model", "cached", ...}
+      event: token        {"text"}  — repeated; cached answers arrive as fast bursts
+      event: sources      {"sources": [...]}
+      event: suggestions  {"suggestions": [SuggestionChip, ...]}
+      event: done         {"answer", "display_type", "char_count", "session_id"}
+    done.answer is the final cleaned answer and should replace the streamed text.
+    When the service is overloaded, meta carries {"retry_after": seconds} and
+    the stream holds only that notice.
     """
     session_id = _get_session_id(request, chat_request)
+    headers    = dict(SSE_HEADERS, **{"X-Session-ID": session_id})
 
     if not _is_rag_ready(request):
-        async def not_ready():
-            yield "Assistant is still starting up. Please try again in a moment."
-        return StreamingResponse(not_ready(), media_type="text/plain")
+        _count_rejection(request, "not_ready")
+        return StreamingResponse(_sse_message("Assistant is still starting up. Please try again in a moment.",
+                                              session_id), media_type="text/event-stream", headers=headers)
 
     if _is_rate_limited(session_id):
-        async def rate_limited():
-            yield "Too many requests. Please wait a moment."
-        return StreamingResponse(rate_limited(), media_type="text/plain")
+        logger.warning("Rate limit hit for session: " + session_id)
+        _count_rejection(request, "rate_limited")
+        return StreamingResponse(_sse_message("Too many requests. Please wait a moment.", session_id),
+                                 media_type="text/event-stream", headers=headers)
 
     if _is_duplicate(session_id, chat_request.query):
-        async def duplicate():
-            yield "Your message is being processed."
-        return StreamingResponse(duplicate(), media_type="text/plain")
+        _count_rejection(request, "duplicate")
+        return StreamingResponse(_sse_message("Your message is being processed.", session_id),
+                                 media_type="text/event-stream", headers=headers)
 
     rag_service = request.app.state.rag_service
+    trace_id    = rag_service.new_trace_id(request.headers.get("X-Trace-ID"))
+    headers["X-Trace-ID"] = trace_id
+
+    async def event_generator():
+        try:
+            async for event, data in rag_service.query_events(
+                chat_request.query,
+                session_id=session_id,
+                include_suggestions=chat_request.include_suggestions,
+                deadline_ms=_get_deadline_ms(request),
+                trace_id=trace_id,
+            ):
+                yield _sse(event, _sse_payload(event, data, session_id))
+        except Exception as e:
+            logger.error("Stream error: " + str(e), exc_info=True)
+            for frame in _sse_message("Something went wrong. Please try again.", session_id):
+                yield frame
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=headers)
+
 
-    async def token_generator():
+@router.websocket("/ws")
+async def chat_socket(websocket: WebSocket):
+    """
+    Persistent chat channel for the mobile app. The session is bound once at
+    connect (?session_id=…, X-Session-ID or client IP); every message then
+    reuses the open connection. Frames are JSON.
+
+    Client → server:
+      {"type": "query", "id": "m1", "query": "...", "include_suggestions": true, "deadline_ms": 8000}
+      {"type": "cancel", "id": "m1"}
+      {"type": "ping"}
+    Server → client:
+      {"type": "ready", "session_id": ...}  then pushed starter {"type": "suggestions", "id": null, ...}
+      {"type": "meta" | "token" | "sources" | "suggestions" | "done", "id": "m1", ...}  — as on /chat/stream;
+      meta also carries the query's "trace_id"
+      {"type": "cancelled", "id": "m1"}   {"type": "error", "id": ..., "message": ...}   {"type": "pong"}
+
+    A new query cancels the generation still in flight for this connection.
+    """
+    await websocket.accept()
+    session_id = _get_session_id(websocket)
+
+    if not _is_rag_ready(websocket):
+        _count_rejection(websocket, "not_ready")
+        await websocket.send_json({"type": "error", "id": None,
+                                   "message": "Assistant is still starting up. Please try again in a moment."})
+        await websocket.close(code=1013)   # try again later
+        return
+
+    rag_service = websocket.app.state.rag_service
+    send_lock   = asyncio.Lock()
+    inflight    = {"id": None, "task": None}
+
+    async def send(frame: dict):
+        async with send_lock:
+            await websocket.send_json(frame)
+
+    async def answer(msg_id, query: str, include_suggestions: bool, deadline_ms):
+        trace_id = rag_service.new_trace_id()
         try:
-            async for token in rag_service.query_stream(chat_request.query, session_id=session_id):
-                yield token
+            async for event, data in rag_service.query_events(query, session_id=session_id,
+                                                              include_suggestions=include_suggestions,
+                                                              deadline_ms=deadline_ms, trace_id=trace_id):
+                frame = dict(type=event, id=msg_id, **_sse_payload(event, data, session_id))
+                if event == "meta":
+                    frame["trace_id"] = trace_id
+                await send(frame)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.error("Stream error: " + str(e))
-            yield "\nSomething went wrong. Please try again."
+            logger.error("WebSocket answer error: " + str(e), exc_info=True)
+            await send({"type": "error", "id": msg_id, "message": "Something went wrong. Please try again."})
+
+    async def cancel_inflight():
+        task = inflight["task"]
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+            await send({"type": "cancelled", "id": inflight["id"]})
+        inflight["task"] = None
+
+    try:
+        await send({"type": "ready", "session_id": session_id})
+        await send({"type": "suggestions", "id": None,
+                    "suggestions": [chip.model_dump() for chip in _to_chips(rag_service.starter_suggestions(session_id))]})
 
-    return StreamingResponse(
-        token_generator(),
-        media_type="text/plain",
-        headers={"X-Session-ID": session_id},
-    )
+        while True:
+            try:
+                frame = json.loads(await websocket.receive_text())
+            except (ValueError, TypeError):
+                await send({"type": "error", "id": None, "message": "Frames must be JSON objects."})
+                continue
+            if not isinstance(frame, dict):
+                await send({"type": "error", "id": None, "message": "Frames must be JSON objects."})
+                continue
+            kind = frame.get("type")
+
+            if kind == "ping":
+                await send({"type": "pong"})
+            elif kind == "cancel":
+                if frame.get("id") in (None, inflight["id"]):
+                    await cancel_inflight()
+            elif kind == "query":
+                query = str(frame.get("query") or "").strip()
+                if not query:
+                    await send({"type": "error", "id": frame.get("id"), "message": "Please ask me something!"})
+                    continue
+                await cancel_inflight()
+                if _is_rate_limited(session_id):
+                    logger.warning("Rate limit hit for session: " + session_id)
+                    _count_rejection(websocket, "rate_limited")
+                    await send({"type": "error", "id": frame.get("id"),
+                                "message": "You're sending messages too quickly. Please wait a moment. 🙏"})
+                    continue
+                deadline_ms = frame.get("deadline_ms")
+                inflight["id"]   = frame.get("id")
+                inflight["task"] = asyncio.create_task(answer(
+                    frame.get("id"), query, frame.get("include_suggestions", True) is not False,
+                    deadline_ms if isinstance(deadline_ms, int) and deadline_ms > 0 else None,
+                ))
+            else:
+                await send({"type": "error", "id": frame.get("id"), "message": "Unknown frame type: " + str(kind)})
+    except WebSocketDisconnect:
+        logger.info("WebSocket closed for session: " + session_id)
+    finally:
+        task = inflight["task"]
+        if task is not None and not task.done():
+            task.cancel()
 
 
 @router.post("/clear-memory", response_model=ClearMemoryResponse)
@@ -305,16 +530,99 @@ async def health_check(request: Request):
     FIX 3: Health check now verifies RAG is actually ready, not just reachable.
     Flutter should poll this until ready=True before showing the chat UI.
     """
-    rag_ready = _is_rag_ready(request)
+    rag_ready  = _is_rag_ready(request)
+    svc        = getattr(request.app.state, "rag_service", None)
+    init_error = getattr(svc, "init_error", None)
+    if rag_ready:
+        status = "healthy"
+    elif init_error:
+        status = "failed"
+    else:
+        status = "initializing"
     return {
-        "status":       "healthy" if rag_ready else "initializing",
+        "status":       status,
         "ready":        rag_ready,       # ← Flutter checks this bool
+        "startup":      getattr(svc, "startup_timings", {}),
         "timestamp":    time.time(),
         "llm_provider": "Groq",
         "llm_model":    "llama-3.1-8b-instant / llama-3.3-70b-versatile",
     }
 
 
+@router.get("/metrics")
+async def get_metrics(request: Request):
+    """
+    Prometheus scrape endpoint: per-stage latency histograms, request / cache /
+    model counters and live queue gauges in the text exposition format.
+    """
+    svc = getattr(request.app.state, "rag_service", None)
+    if svc is None:
+        return PlainTextResponse("", media_type=METRICS_CONTENT_TYPE)
+    return PlainTextResponse(svc.metrics_text(), media_type=METRICS_CONTENT_TYPE)
+
+
+@router.get("/debug/traces")
+async def debug_traces(request: Request, order: str = "recent", limit: int = 20):
+    """
+    Recent (order=recent) or slowest (order=slowest) request traces with
+    per-stage spans, intent, model, tokens and cache outcome. Admin only.
+    """
+    _require_admin(request)
+    if order not in ("recent", "slowest"):
+        raise HTTPException(status_code=400, detail="order must be 'recent' or 'slowest'")
+    traces = request.app.state.rag_service.recent_traces(order, min(max(limit, 1), 200))
+    return {"order": order, "count": len(traces), "traces": traces}
+
+
+@router.get("/debug/traces/{trace_id}")
+async def debug_trace(request: Request, trace_id: str):
+    """One trace by the id returned in X-Trace-ID, while it is still buffered. Admin only."""
+    _require_admin(request)
+    trace = request.app.state.rag_service.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (evicted or unknown)")
+    return trace
+
+
+@router.get("/debug/profile")
+async def debug_profile(request: Request, format: str = "collapsed", limit: int = 50):
+    """
+    Aggregated samples of profiled requests. format=collapsed (default) is
+    plain-text collapsed stacks for flamegraph.pl / speedscope;
+    format=functions is JSON with self/total samples per function. Admin only.
+    """
+    _require_admin(request)
+    rag_service = request.app.state.rag_service
+    if format == "collapsed":
+        return PlainTextResponse(rag_service.profile_collapsed())
+    if format == "functions":
+        return rag_service.profile_functions(min(max(limit, 1), 500))
+    raise HTTPException(status_code=400, detail="format must be 'collapsed' or 'functions'")
+
+
+@router.post("/debug/profile")
+async def configure_profile(request: Request, config: ProfilerConfig):
+    """Change the profiler's sample rate / slow threshold at runtime, optionally resetting it. Admin only."""
+    _require_admin(request)
+    if config.sample_rate is not None and not 0 <= config.sample_rate <= 1:
+        raise HTTPException(status_code=400, detail="sample_rate must be between 0 and 1")
+    if config.slow_ms is not None and config.slow_ms < 0:
+        raise HTTPException(status_code=400, detail="slow_ms must not be negative")
+    return request.app.state.rag_service.configure_profiler(config.sample_rate, config.slow_ms, bool(config.reset))
+
+
+@router.get("/debug/memory")
+async def debug_memory(request: Request, tracemalloc: int = 0):
+    """
+    Approximate per-component memory (sessions, caches, FAISS index, docstore,
+    BM25, embedding model) with counts, and process RSS. tracemalloc=N adds
+    the N top allocating lines and their growth since the last call. Admin only.
+    The object walk runs in a worker thread so open streams keep flowing.
+    """
+    _require_admin(request)
+    return await asyncio.to_thread(request.app.state.rag_service.memory_report, min(max(tracemalloc, 0), 100))
+
+
 @router.get("/status")
 async def get_status(request: Request):
     """Returns full RAG engine statistics."""
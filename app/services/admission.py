@@ -0,0 +1,199 @@
+"""
+admission.py — Admission control for LLM-bound requests
+========================================================
+Every request shares one event loop, and nothing used to cap how many Groq
+generations ran at once. Under a burst of slow 70b list answers, greetings,
+activity lists, cache hits and cheap 8b price answers waited behind them, and
+Groq rate-limited the whole batch.
+
+Requests are split into lanes:
+  - the fast lane: answers that need no LLM (greeting, activity list,
+    response-cache and prefetch hits). They are only counted, never queued.
+  - one lane per model. Each lane has a concurrency limit (a semaphore) and
+    a queue limit. A request is admitted when its model is chosen, before
+    retrieval, and holds a semaphore slot only while it generates. Once
+    limit + queue_limit requests are admitted, further ones are rejected
+    with a Retry-After estimate taken from recent generation times.
+  - background work (prefetch) gets a separate small lane per model, which
+    never queues and never counts against user capacity. It is refused
+    outright while the model's user lane has a request waiting or no free
+    slot.
+
+Queue depth, wait and hold times per lane are reported under /status
+"admission".
+"""
+
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+MODEL_70B = "llama-3.3-70b-versatile"
+MODEL_8B  = "llama-3.1-8b-instant"
+
+# (concurrent generations, requests allowed to wait for one) per model
+LANE_LIMITS = {
+    MODEL_70B: (int(os.getenv("LLM_CONCURRENCY_70B", "4")), int(os.getenv("LLM_QUEUE_70B", "8"))),
+    MODEL_8B:  (int(os.getenv("LLM_CONCURRENCY_8B", "8")),  int(os.getenv("LLM_QUEUE_8B", "16"))),
+}
+DEFAULT_LANE_LIMIT   = (4, 8)
+BACKGROUND_SUFFIX    = " (background)"
+BACKGROUND_LIMIT     = (int(os.getenv("LLM_CONCURRENCY_BACKGROUND", "2")), 0)   # no queue
+LANE_SAMPLES         = 200     # recent waits / holds kept per lane
+DEFAULT_HOLD_SECS    = 3.0     # assumed generation time before any has finished
+MAX_RETRY_AFTER_SECS = 30
+
+
+class AdmissionRejected(Exception):
+    """The model's lane is full. retry_after is a whole number of seconds."""
+
+    def __init__(self, model: str, retry_after: int):
+        super().__init__("LLM lane " + model + " is full (retry after " + str(retry_after) + "s)")
+        self.model       = model
+        self.retry_after = retry_after
+
+
+def _percentile(samples, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Ticket:
+    """
+    An admitted request's place in a lane. `async with ticket.slot():` waits
+    for a generation slot and holds it for the block — once per generation,
+    so a hedged race or a confidence retry takes its own slot. close() gives
+    the place up and is idempotent.
+    """
+
+    def __init__(self, lane: "Lane"):
+        self._lane   = lane
+        self._closed = False
+
+    @asynccontextmanager
+    async def slot(self):
+        await self._lane.acquire()
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._lane.release(time.perf_counter() - t)
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._lane.pending -= 1
+
+
+class Lane:
+    def __init__(self, name: str, limit: int, queue_limit: int):
+        self.name        = name
+        self.limit       = max(1, limit)
+        self.queue_limit = max(0, queue_limit)
+        self.pending     = 0                  # admitted and not yet closed
+        self.waiting     = 0                  # blocked on the semaphore right now
+        self.running     = 0                  # generating right now
+        self.admitted    = 0
+        self.rejected    = 0
+        self._semaphore  = None               # created on the serving event loop
+        self._waits: deque = deque(maxlen=LANE_SAMPLES)
+        self._holds: deque = deque(maxlen=LANE_SAMPLES)
+
+    def admit(self) -> Ticket:
+        if self.pending >= self.limit + self.queue_limit:
+            self.rejected += 1
+            raise AdmissionRejected(self.name, self.retry_after())
+        self.pending  += 1
+        self.admitted += 1
+        return Ticket(self)
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request has likely drained."""
+        hold  = sum(self._holds) / len(self._holds) if self._holds else DEFAULT_HOLD_SECS
+        ahead = self.pending - self.limit + 1
+        return max(1, min(MAX_RETRY_AFTER_SECS, math.ceil(hold * ahead / self.limit)))
+
+    async def acquire(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        t = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self._waits.append(time.perf_counter() - t)
+        self.running += 1
+
+    def release(self, held_secs: float):
+        self.running -= 1
+        self._holds.append(held_secs)
+        self._semaphore.release()
+
+    def stats(self) -> Dict:
+        return {
+            "limit":         self.limit,
+            "queue_limit":   self.queue_limit,
+            "pending":       self.pending,
+            "waiting":       self.waiting,
+            "running":       self.running,
+            "admitted":      self.admitted,
+            "rejected":      self.rejected,
+            "wait_p50_ms":   round(_percentile(self._waits, 0.50) * 1000, 1),
+            "wait_p95_ms":   round(_percentile(self._waits, 0.95) * 1000, 1),
+            "hold_avg_ms":   round(sum(self._holds) / len(self._holds) * 1000, 1) if self._holds else 0.0,
+            "retry_after_s": self.retry_after(),
+        }
+
+
+class AdmissionController:
+    def __init__(self, limits: Dict = None):
+        self._limits = dict(LANE_LIMITS if limits is None else limits)
+        self.lanes: Dict[str, Lane] = {}
+        self.fast: Dict[str, int]   = {}      # no-LLM answers by kind
+
+    def lane(self, model: str) -> Lane:
+        lane = self.lanes.get(model)
+        if lane is None:
+            if model.endswith(BACKGROUND_SUFFIX):
+                limit, queue_limit = BACKGROUND_LIMIT
+            else:
+                limit, queue_limit = self._limits.get(model, DEFAULT_LANE_LIMIT)
+            lane = self.lanes[model] = Lane(model, limit, queue_limit)
+        return lane
+
+    def admit(self, model: str, background: bool = False) -> Ticket:
+        """
+        Place in the model's lane, or AdmissionRejected when it is full.
+        background=True admits low-priority work to the model's background
+        lane instead, failing at once rather than competing with users.
+        """
+        if background:
+            lane = self.lane(model)
+            if lane.waiting or lane.pending >= lane.limit:
+                background_lane = self.lane(model + BACKGROUND_SUFFIX)
+                background_lane.rejected += 1
+                raise AdmissionRejected(model, lane.retry_after())
+            return self.lane(model + BACKGROUND_SUFFIX).admit()
+        try:
+            return self.lane(model).admit()
+        except AdmissionRejected as e:
+            logger.warning("Admission rejected for " + model + " — retry after " + str(e.retry_after) + "s")
+            raise
+
+    def count_fast(self, kind: str):
+        self.fast[kind] = self.fast.get(kind, 0) + 1
+
+    def stats(self) -> Dict:
+        return {
+            "fast_lane": dict(self.fast, total=sum(self.fast.values())),
+            "lanes":     {name: lane.stats() for name, lane in self.lanes.items()},
+        }
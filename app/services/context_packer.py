@@ -0,0 +1,142 @@
+"""
+context_packer.py — Token-budgeted prompt context
+==================================================
+Retrieved documents used to be joined into the prompt whole, however many
+there were. The packer fills a per-intent token budget instead:
+  - Documents are taken in relevance order (as retrieval returned them)
+  - The first document that no longer fits is trimmed at a line boundary if
+    enough budget is left to be useful; later ones that don't fit are dropped
+  - Token counts are cached on each document's metadata at index time
+  - Prompt tokens per request are tallied for the logs and /stats
+
+Counts use tiktoken's cl100k_base encoding — close to, not exactly, Llama's
+tokenizer, which is fine for budgeting. If the encoding cannot be loaded
+(e.g. no network on first use) it falls back to ~4 characters per token.
+"""
+
+import logging
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKEN_ENCODING   = "cl100k_base"
+CHARS_PER_TOKEN  = 4          # fallback estimate when tiktoken is unavailable
+DOC_SEPARATOR    = "\n\n"
+MIN_TRIM_TOKENS  = 60         # a trimmed tail shorter than this is dropped instead
+
+# Context budget (tokens) per intent — lists need many species, convo needs few
+CONTEXT_BUDGETS = {
+    "list":         1400,
+    "bare_list":    1200,
+    "conservation": 1400,
+    "price":        700,
+    "convo":        600,
+}
+DEFAULT_CONTEXT_BUDGET = 600
+
+
+class ContextPacker:
+    def __init__(self, encoding_name: str = TOKEN_ENCODING):
+        self._encoding = None
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            logger.warning("tiktoken unavailable, estimating tokens from length: " + str(e))
+        self.requests       = 0
+        self.prompt_tokens  = 0
+        self.context_tokens = 0
+        self.docs_trimmed   = 0
+        self.docs_dropped   = 0
+        self.last_prompt_tokens = 0
+
+    @property
+    def method(self) -> str:
+        return "tiktoken:" + self._encoding.name if self._encoding else "chars/" + str(CHARS_PER_TOKEN)
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+    def doc_tokens(self, doc) -> int:
+        """Token count of doc.page_content, cached in its metadata."""
+        tokens = doc.metadata.get("tokens")
+        if tokens is None:
+            tokens = self.count(doc.page_content)
+            doc.metadata["tokens"] = tokens
+        return tokens
+
+    def annotate(self, docs: list) -> None:
+        """Cache token counts for a whole corpus (called when the index is built/loaded)."""
+        for doc in docs:
+            self.doc_tokens(doc)
+
+    def _trim(self, text: str, max_tokens: int) -> str:
+        """Longest prefix of text within max_tokens, cut back to the last full line."""
+        if self._encoding is not None:
+            prefix = self._encoding.decode(self._encoding.encode(text, disallowed_special=())[:max_tokens])
+        else:
+            prefix = text[:max_tokens * CHARS_PER_TOKEN]
+        if "\n" in prefix:
+            prefix = prefix.rsplit("\n", 1)[0]
+        return prefix.rstrip()
+
+    def pack(self, docs: list, intent: str) -> Tuple[str, list, Dict]:
+        """
+        Build the context string for an intent's budget.
+        Returns (context, docs actually used, packing stats).
+        """
+        budget  = CONTEXT_BUDGETS.get(intent, DEFAULT_CONTEXT_BUDGET)
+        sep     = self.count(DOC_SEPARATOR)
+        parts: List[str] = []
+        used, trimmed, dropped, spent = [], 0, 0, 0
+
+        for doc in docs:
+            cost = self.doc_tokens(doc) + (sep if parts else 0)
+            left = budget - spent
+            if cost <= left:
+                parts.append(doc.page_content)
+                used.append(doc)
+                spent += cost
+            elif not trimmed and left - sep >= MIN_TRIM_TOKENS:
+                text = self._trim(doc.page_content, left - (sep if parts else 0))
+                if text:
+                    parts.append(text)
+                    used.append(doc)
+                    spent += self.count(text) + (sep if len(parts) > 1 else 0)
+                    trimmed += 1
+                else:
+                    dropped += 1
+            else:
+                dropped += 1
+
+        return DOC_SEPARATOR.join(parts), used, {
+            "budget": budget, "context_tokens": spent, "docs_in": len(docs),
+            "docs_used": len(used), "trimmed": trimmed, "dropped": dropped,
+        }
+
+    def record(self, prompt: str, packed: Dict) -> int:
+        """Tally one request's filled prompt and packing stats; returns its token count."""
+        tokens = self.count(prompt)
+        self.requests          += 1
+        self.prompt_tokens     += tokens
+        self.context_tokens    += packed["context_tokens"]
+        self.docs_trimmed      += packed["trimmed"]
+        self.docs_dropped      += packed["dropped"]
+        self.last_prompt_tokens = tokens
+        return tokens
+
+    def stats(self) -> Dict:
+        n = max(self.requests, 1)
+        return {
+            "method":             self.method,
+            "requests":           self.requests,
+            "avg_prompt_tokens":  round(self.prompt_tokens / n, 1),
+            "avg_context_tokens": round(self.context_tokens / n, 1),
+            "last_prompt_tokens": self.last_prompt_tokens,
+            "docs_trimmed":       self.docs_trimmed,
+            "docs_dropped":       self.docs_dropped,
+        }
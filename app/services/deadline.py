@@ -0,0 +1,50 @@
+"""
+deadline.py — Per-request time budget
+======================================
+One deadline is set when a request arrives (from the client's
+X-Request-Deadline-Ms header, or REQUEST_DEADLINE_SECS) and handed down the
+query pipeline. Every stage waits at most for what is left of it, and
+optional stages (translation, confidence-guard retry, suggestions) are
+skipped when less than their minimum budget remains.
+"""
+
+import os
+import time
+
+DEFAULT_DEADLINE_SECS = float(os.getenv("REQUEST_DEADLINE_SECS", "20"))
+MAX_DEADLINE_SECS     = 60.0
+
+# Optional stages only run with at least this much budget left, so the
+# required LLM call is never starved by an extra round trip.
+MIN_STAGE_SECS = {
+    "translation": 3.0,
+    "retry":       3.0,
+    "suggestions": 0.25,
+}
+
+
+class Deadline:
+    def __init__(self, budget_secs: float = None):
+        budget = DEFAULT_DEADLINE_SECS if budget_secs is None else budget_secs
+        self.budget_secs = max(0.0, min(float(budget), MAX_DEADLINE_SECS))
+        self._expires_at = time.monotonic() + self.budget_secs
+
+    @classmethod
+    def from_ms(cls, deadline_ms=None) -> "Deadline":
+        return cls(None if deadline_ms is None else deadline_ms / 1000.0)
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float = None) -> float:
+        """Seconds a stage may wait: the remaining budget, capped at the stage's own limit."""
+        left = self.remaining()
+        return left if cap is None else min(cap, left)
+
+    def allows(self, stage: str) -> bool:
+        """Whether an optional stage still has its minimum budget."""
+        return self.remaining() >= MIN_STAGE_SECS.get(stage, 0.0)
@@ -0,0 +1,144 @@
+"""
+footprint.py — Approximate memory footprint of the service's components
+========================================================================
+We could not tell how much of a worker's RSS went to sessions, the response
+cache, the FAISS index, the docstore, BM25 or the embedding model, so
+instance sizes were guesses. This module provides the measurements behind
+the admin-only /api/v1/debug/memory endpoint:
+
+  - deep_sizeof() walks containers, object __dict__s and __slots__ and adds
+    up sys.getsizeof(). It runs in a worker thread while the event loop keeps
+    mutating sessions and caches, so a container that changes while it is
+    being copied is counted without its contents. numpy arrays count their
+    buffer. Functions, classes and modules are not followed. A shared `seen`
+    set means an object reachable from two components (a Document in both
+    the docstore and the BM25 corpus) is counted once, for whichever is
+    measured first.
+  - model_file_bytes() is the on-disk size of a FastEmbed model's ONNX
+    weights, which is roughly what the loaded session keeps resident.
+  - process_memory() is the RSS and peak RSS of the worker (None where the
+    platform does not report it).
+  - tracemalloc_report() lists the top allocating source lines. It also
+    lists growth since the previous report, so a regression shows up as a
+    line that keeps growing. tracemalloc only sees allocations made after
+    it starts, so main.py starts it before the index and model load when
+    TRACEMALLOC_FRAMES > 0.
+"""
+
+import sys
+import threading
+import tracemalloc
+from collections import deque
+from pathlib import Path
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from typing import Dict, Optional
+
+import numpy as np
+
+MAX_OBJECTS = 2_000_000   # a walk stops here; the result is then a lower bound
+
+_OPAQUE = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType)
+
+_last_snapshot = None     # previous tracemalloc snapshot, for growth between reports
+_snapshot_lock = threading.Lock()
+
+
+def deep_sizeof(*objs, seen: set = None) -> int:
+    """
+    Approximate bytes held by objs and everything they reference that is not
+    already in seen. Pass several roots rather than a temporary tuple: seen
+    holds ids, and a freed temporary's id can be reused by a later object.
+    """
+    seen  = set() if seen is None else seen
+    stack = list(objs)
+    total = 0
+    while stack and len(seen) < MAX_OBJECTS:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _OPAQUE):
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            total += sys.getsizeof(item) + (item.nbytes if item.base is None else 0)
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, bytearray, int, float, bool)) or item is None:
+            continue
+        try:
+            if isinstance(item, dict):
+                for key, value in list(item.items()):
+                    stack.append(key)
+                    stack.append(value)
+                continue
+            if isinstance(item, (list, tuple, set, frozenset, deque)):
+                stack.extend(list(item))
+                continue
+        except RuntimeError:             # changed size while being copied
+            continue
+        attrs = getattr(item, "__dict__", None)
+        if attrs is not None:
+            stack.append(attrs)
+        for cls in type(item).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if name not in ("__dict__", "__weakref__") and hasattr(item, name):
+                    stack.append(getattr(item, name))
+    return total
+
+
+def model_file_bytes(embeddings) -> Optional[int]:
+    """Size of the ONNX files behind a LangChain FastEmbedEmbeddings, or None when unknown."""
+    model_dir = getattr(getattr(getattr(embeddings, "model", None), "model", None), "_model_dir", None)
+    if model_dir is None or not Path(model_dir).is_dir():
+        return None
+    return sum(path.stat().st_size for path in Path(model_dir).rglob("*.onnx*") if path.is_file())
+
+
+def process_memory() -> Dict:
+    """Resident set size now and at its peak, in bytes."""
+    rss, peak = None, None
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if peak is None:
+        try:
+            import resource                    # not on Windows
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            peak = peak if sys.platform == "darwin" else peak * 1024     # bytes on macOS, KiB on Linux
+        except ImportError:
+            pass
+    return {"rss_bytes": rss, "peak_rss_bytes": peak}
+
+
+def tracemalloc_report(limit: int = 20) -> Dict:
+    """Top allocating lines, and growth since the previous call. Needs tracemalloc to be tracing."""
+    if not tracemalloc.is_tracing():
+        return {"tracing": False, "detail": "start the server with TRACEMALLOC_FRAMES=n (n > 0) to enable"}
+    with _snapshot_lock:
+        return _snapshot_report(limit)
+
+
+def _snapshot_report(limit: int) -> Dict:
+    global _last_snapshot
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    report = {
+        "tracing":      True,
+        "traced_bytes": current,
+        "traced_peak":  peak,
+        "top":          [{"line": str(stat.traceback[0]), "bytes": stat.size, "count": stat.count}
+                         for stat in snapshot.statistics("lineno")[:limit]],
+    }
+    if _last_snapshot is not None:
+        report["growth"] = [{"line": str(stat.traceback[0]), "bytes": stat.size_diff, "count": stat.count_diff}
+                            for stat in snapshot.compare_to(_last_snapshot, "lineno")[:limit]
+                            if stat.size_diff > 0]
+    _last_snapshot = snapshot
+    return report
@@ -0,0 +1,142 @@
+"""
+index_factory.py — Build-time FAISS index selection
+====================================================
+The vector index type is chosen when the index is built and recorded in
+index_meta.json, so the server loads whatever the ingest step produced:
+  - flat  : exact search over full-precision vectors (default, best quality)
+  - hnsw  : graph-based ANN, full-precision storage, fastest large-corpus search
+  - ivfpq : inverted lists + product quantization, smallest memory footprint
+  - sq8   : 8-bit scalar quantization, exact scan at 1/4 the memory
+  - fp16  : float16 scalar quantization, exact scan at 1/2 the memory
+
+All types use L2 distance, matching LangChain's default FAISS wrapper; on
+normalized embeddings that ranks identically to cosine similarity.
+
+faiss is imported on first use so importing this module stays cheap at startup.
+"""
+
+import math
+import time
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import faiss
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq", "sq8", "fp16")
+DEFAULT_INDEX_TYPE = "flat"
+
+HNSW_M               = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH       = 64
+IVF_POINTS_PER_LIST  = 39     # FAISS' recommended minimum training points per centroid
+IVF_MAX_PQ_SUBQUANT  = 48
+
+
+def _pq_subquantizers(dim: int) -> int:
+    """Largest divisor of dim not above IVF_MAX_PQ_SUBQUANT."""
+    for m in range(min(IVF_MAX_PQ_SUBQUANT, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def build_index(vectors: np.ndarray, index_type: str = DEFAULT_INDEX_TYPE) -> Tuple["faiss.Index", Dict]:
+    """
+    Build and fill a FAISS index of the given type.
+    Returns the index and the parameters used (persisted in the index metadata).
+    Training-based types scale their parameters down for small corpora.
+    """
+    import faiss
+
+    if index_type not in INDEX_TYPES:
+        raise ValueError("Unknown index type '" + str(index_type) + "' — expected one of " + ", ".join(INDEX_TYPES))
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim  = vectors.shape
+    params: Dict = {}
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        params = {"M": HNSW_M, "efConstruction": HNSW_EF_CONSTRUCTION, "efSearch": HNSW_EF_SEARCH}
+    elif index_type == "ivfpq":
+        nlist  = max(1, min(int(4 * math.sqrt(n)), n // IVF_POINTS_PER_LIST))
+        m      = _pq_subquantizers(dim)
+        nbits  = max(1, min(8, int(math.log2(max(n, 2)))))
+        index  = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, m, nbits)
+        params = {"nlist": nlist, "m": m, "nbits": nbits, "nprobe": min(nlist, 8)}
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+    else:
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16)
+
+    if not index.is_trained:
+        index.train(vectors)
+    if n:
+        index.add(vectors)
+    apply_search_params(index, index_type, params)
+    return index, params
+
+
+def apply_search_params(index, index_type: str, params: Dict) -> None:
+    """Restore query-time knobs (efSearch / nprobe) and enable reconstruction."""
+    import faiss
+
+    if index_type == "hnsw" and params.get("efSearch"):
+        index.hnsw.efSearch = int(params["efSearch"])
+    elif index_type == "ivfpq":
+        ivf = faiss.extract_index_ivf(index)
+        if params.get("nprobe"):
+            ivf.nprobe = int(params["nprobe"])
+        ivf.make_direct_map()
+
+
+def index_nbytes(index) -> int:
+    """Approximate resident size of an index (its serialized size)."""
+    import faiss
+
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def evaluate_index_types(vectors: np.ndarray, queries: np.ndarray, k: int = 10,
+                         index_types=INDEX_TYPES) -> List[Dict]:
+    """
+    Recall@k vs latency vs memory for each index type, using exact flat
+    search over the same vectors as ground truth.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    k       = min(k, len(vectors))
+
+    exact, _ = build_index(vectors, "flat")
+    _, truth = exact.search(queries, k)
+
+    rows = []
+    for index_type in index_types:
+        t0 = time.perf_counter()
+        index, params = build_index(vectors, index_type)
+        build_secs = time.perf_counter() - t0
+
+        latencies, found = [], []
+        for q in queries:
+            t = time.perf_counter()
+            _, ids = index.search(q[None, :], k)
+            latencies.append(time.perf_counter() - t)
+            found.append(ids[0])
+
+        recall = np.mean([len(set(f.tolist()) & set(t.tolist())) / k for f, t in zip(found, truth)])
+        rows.append({
+            "index_type":  index_type,
+            "params":      params,
+            "recall_at_k": round(float(recall), 4),
+            "k":           k,
+            "p50_ms":      round(float(np.percentile(latencies, 50)) * 1000, 4),
+            "p99_ms":      round(float(np.percentile(latencies, 99)) * 1000, 4),
+            "memory_bytes": index_nbytes(index),
+            "build_secs":  round(build_secs, 3),
+        })
+    return rows
@@ -0,0 +1,217 @@
+"""
+intent_classifier.py — Single-pass query classification
+========================================================
+Replaces the per-request chain of _is_greeting / _is_activity_list /
+_is_bare_list / _is_price / _is_conservation / _is_list /
+_get_category_filter / _is_nepali / _is_followup_query, each of which
+rescanned a lowercased copy of the message.
+
+Every trigger phrase is compiled into one trie-shaped regex, wrapped in a
+lookahead so a single finditer() over the message reports a match at every
+position (overlapping matches included). Each phrase maps to a bitmask of
+the rules it belongs to; a phrase's mask also includes the masks of every
+shorter phrase that is its prefix, so taking only the longest match at each
+position still gives exact `phrase in message` semantics for all phrases.
+
+Precedence is unchanged: greeting → activity list → bare list → price →
+conservation → list → conversational. tests/test_intent_classifier.py pins
+the classifications; scripts/benchmark_intents.py times it against the old
+checks.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+# ── Rule flags ────────────────────────────────────────────────────────────────
+GREETING_PHRASE = 1 << 0
+ACTIVITY_LIST   = 1 << 1
+BARE_LIST       = 1 << 2
+PRICE           = 1 << 3
+CONSERVATION    = 1 << 4
+LIST            = 1 << 5
+FOLLOWUP        = 1 << 6
+GREETING_NE     = 1 << 7
+# Set by classify() when the message opens with a conversational question starter
+LIST_EXCLUDED         = 1 << 16
+CONSERVATION_EXCLUDED = 1 << 17
+
+# Category filters, checked in this order (first hit wins)
+CATEGORY_KEYWORDS = [
+    ("birds",       ["bird", "birds", "avian", "feather", "beak", "nest", "flock"]),
+    ("mammals",     ["mammal", "tiger", "rhino", "elephant", "deer", "leopard", "bear"]),
+    ("reptiles",    ["reptile", "crocodile", "gharial", "snake", "lizard", "turtle"]),
+    ("fish",        ["fish", "aquatic", "river fish", "mahseer"]),
+    ("butterflies", ["butterfly", "butterflies", "insect"]),
+    ("amphibians",  ["amphibian", "frog", "toad"]),
+    ("plants",      ["plant", "flora", "tree", "flower", "grass"]),
+]
+_CATEGORY_FLAGS = [(name, 1 << (8 + i)) for i, (name, _) in enumerate(CATEGORY_KEYWORDS)]
+
+RULE_PHRASES = {
+    # Greetings: multi-word English phrases + Nepali words (single words are whole-word, below)
+    GREETING_PHRASE: ["good morning", "good evening", "good afternoon"],
+    GREETING_NE:     ["नमस्ते", "नमस्कार", "सुप्रभात", "नमस्"],
+    ACTIVITY_LIST: [
+        "what activities", "list activities", "what can i do", "available activities",
+        "what to do", "things to do", "activities available", "all activities",
+        "what are the activities", "what activities are there",
+        "गतिविधिहरू छन्", "गतिविधि छन्", "के-के गतिविधि", "कुन-कुन गतिविधि",
+        "कुन कुन गतिविधि", "के गर्न सकिन्छ", "गतिविधिहरू",
+    ],
+    BARE_LIST: [
+        "no explanation", "only list", "just list", "just names", "names only",
+        "no description", "without description", "only names", "bare list",
+        "list only", "just the names", "no details",
+    ],
+    PRICE: [
+        "how much", "cost", "price", "fee", "ticket", "entry fee",
+        "rate", "charge", "tariff", "npr", "rupee", "rupees",
+        # timing triggers — answered from the same hardcoded table
+        "when does", "when do", "what time", "timing", "schedule",
+        "opening time", "closing time", "start time", "open at", "close at",
+        "what are the timings", "what are the hours",
+        "कति", "शुल्क", "मूल्य", "टिकट", "पैसा", "रुपैयाँ",
+        "कहिले", "कति बजे", "समय", "सुरु हुन्छ", "बन्द हुन्छ",
+        "कार्यक्रम समय", "खुल्ने", "बन्द हुने",
+    ],
+    CONSERVATION: [
+        "endangered", "threatened", "vulnerable", "critically",
+        "conservation", "extinction", "extinct",
+        "at risk", "dying out", "nearly extinct", "conservation status",
+        "need protection", "needs protection", "protect",
+        "लोपोन्मुख", "संकटापन्न", "संरक्षण", "विलुप्त", "खतरामा",
+    ],
+    LIST: [
+        "list", "name all", "name some", "tell me all", "give me all", "show all",
+        "enumerate", "what types", "what kind", "what species", "examples of",
+        "types of", "kinds of", "all the", "all animals", "all birds", "all mammals",
+        "mention", "can you list", "could you list", "top 5", "top 10",
+        "top five", "top ten", "top three", "top 3", "what are the", "what are some",
+        "सूची", "नाम बताउ", "सबै बताउ", "कुन-कुन", "कुन कुन",
+        "प्रजातिहरू", "जनावरहरू", "चराहरू", "सबै जनावर",
+        "चराहरू छन्", "जनावरहरू छन्",
+    ],
+    FOLLOWUP: [
+        "describe it", "tell me more", "more about it", "what about it",
+        "explain it", "elaborate", "more details", "describe that",
+        "tell me about it", "what is it", "what's it", "and it",
+    ],
+}
+
+GREETING_WORDS    = {"hello", "hi", "hey", "namaste", "howdy", "greetings", "yo"}
+GREETING_MAX_WORDS = 4
+FOLLOWUP_PRONOUNS = {"it", "that", "this", "them", "they", "those"}
+FOLLOWUP_MAX_WORDS = 3
+
+# Question starters that keep a message conversational even if it has list /
+# conservation triggers (matched at the start of the lowercased message)
+_CONSERVATION_EXCLUDE = re.compile(r"(where|when|how|why|is |are |what is|what's|which|who|can i|should i)")
+_LIST_EXCLUDE = re.compile(r"(which|what is|what's|how does|how do|why|who|when is|when|where|how much"
+                           r"|how many|is |are |can i|should i)")
+_DEVANAGARI   = re.compile(r"[\u0900-\u097F]")
+
+
+def trie_regex(phrases: List[str]) -> str:
+    """Regex alternation shaped as a trie; greedy, so the longest phrase wins at each position."""
+    trie: Dict = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node) -> str:
+        ends     = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends:
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+def _compile():
+    masks: Dict[str, int] = {}
+    for flag, phrases in RULE_PHRASES.items():
+        for p in phrases:
+            masks[p] = masks.get(p, 0) | flag
+    for (_, flag), (_, words) in zip(_CATEGORY_FLAGS, CATEGORY_KEYWORDS):
+        for w in words:
+            masks[w] = masks.get(w, 0) | flag
+    # fold each phrase's prefixes in, so the longest match at a position implies them
+    for phrase in list(masks):
+        for other, flag in list(masks.items()):
+            if other != phrase and phrase.startswith(other):
+                masks[phrase] |= flag
+    return re.compile("(?=(" + trie_regex(list(masks)) + "))"), masks
+
+
+_MATCHER, _PHRASE_MASKS = _compile()
+
+
+def is_nepali(text: str) -> bool:
+    """True if the text contains Nepali (Devanagari) characters."""
+    return _DEVANAGARI.search(text) is not None
+
+
+class QueryIntent:
+    """What the pipeline needs to know about a message, from one scan."""
+    __slots__ = ("intent", "category", "is_nepali", "is_followup", "flags")
+
+    def __init__(self, intent: str, category: Optional[str], is_nepali: bool, is_followup: bool, flags: int = 0):
+        self.intent      = intent         # greeting | activity_list | bare_list | price | conservation | list | convo
+        self.category    = category       # category filter for retrieval, or None
+        self.is_nepali   = is_nepali
+        self.is_followup = is_followup
+        self.flags       = flags          # every rule bit that matched, plus the *_EXCLUDED bits
+
+    def with_route(self, intent: str = None, category: str = None) -> "QueryIntent":
+        """Copy with the intent and/or category replaced (used by the semantic router)."""
+        return QueryIntent(intent or self.intent, category or self.category,
+                           self.is_nepali, self.is_followup, self.flags)
+
+    @property
+    def is_list_like(self) -> bool:
+        return self.intent in ("bare_list", "conservation", "list")
+
+    def __repr__(self):
+        return ("QueryIntent(" + self.intent + ", category=" + str(self.category) + ", nepali="
+                + str(self.is_nepali) + ", followup=" + str(self.is_followup) + ")")
+
+
+def classify(message: str) -> QueryIntent:
+    lower = message.lower()
+    flags = 0
+    for m in _MATCHER.finditer(lower):
+        flags |= _PHRASE_MASKS[m.group(1)]
+    words = lower.split()
+
+    stripped = lower.strip()
+    if _CONSERVATION_EXCLUDE.match(stripped):
+        flags |= CONSERVATION_EXCLUDED
+    if _LIST_EXCLUDE.match(lower):
+        flags |= LIST_EXCLUDED
+
+    if len(words) <= GREETING_MAX_WORDS and (
+            flags & (GREETING_PHRASE | GREETING_NE) or not GREETING_WORDS.isdisjoint(words)):
+        intent = "greeting"
+    elif flags & ACTIVITY_LIST:
+        intent = "activity_list"
+    elif flags & BARE_LIST:
+        intent = "bare_list"
+    elif flags & PRICE:
+        intent = "price"
+    elif flags & CONSERVATION and not flags & CONSERVATION_EXCLUDED:
+        intent = "conservation"
+    elif flags & LIST and not flags & LIST_EXCLUDED:
+        intent = "list"
+    else:
+        intent = "convo"
+
+    category = next((name for name, flag in _CATEGORY_FLAGS if flags & flag), None)
+    followup = bool(flags & FOLLOWUP) or (
+        len(words) <= FOLLOWUP_MAX_WORDS and not FOLLOWUP_PRONOUNS.isdisjoint(words))
+    return QueryIntent(intent, category, is_nepali(message), followup, flags)
@@ -0,0 +1,197 @@
+"""
+metrics.py — Stage latency histograms and counters in Prometheus text format
+============================================================================
+A minimal in-process registry. prometheus_client is not needed for a handful
+of series. Histograms use fixed cumulative buckets. An observation is one
+bisect plus three additions under a lock, so instrumenting the hot path costs
+well under a microsecond.
+
+The pipeline records:
+  rag_stage_duration_seconds{stage}          classification, semantic_routing,
+                                             translation, embedding, faiss,
+                                             bm25, fusion, llm_ttft, llm,
+                                             postprocess, suggestions
+  rag_request_duration_seconds{path}         whole request: llm | cache |
+                                             prefetch | canned | rejected |
+                                             cancelled
+  rag_requests_total{intent,path}            intent mix
+  rag_cache_requests_total{tier,result}      response_cache / prefetch hit | miss
+  rag_llm_generations_total{model,outcome}   ok | error | rate_limit | timeout
+  chat_rejections_total{reason}              API-level: rate_limited, duplicate,
+                                             not_ready, overloaded
+
+Every stage observation is also a span of the current request trace
+(tracing.py).
+
+Live gauges (LLM lane depth, open breakers, retrieval queue) are read at
+scrape time by RAGService.metrics_text(); GET /api/v1/metrics serves it.
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+
+import tracing
+
+# Seconds — from sub-millisecond regex/FAISS work up to the 20s request budget
+STAGE_BUCKETS   = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 6.0, 8.0, 10.0, 15.0, 20.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [name + '="' + _escape(value) + '"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name       = name
+        self.help       = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple, float] = {}
+        self._lock      = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = ["# HELP " + self.name + " " + self.help, "# TYPE " + self.name + " counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(self.name + _labels(self.labelnames, labelvalues) + " " + _number(value))
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = STAGE_BUCKETS):
+        self.name       = name
+        self.help       = help_text
+        self.labelnames = labelnames
+        self.buckets    = tuple(sorted(buckets))
+        # labelvalues → [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple, list] = {}
+        self._lock      = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1]    += value
+            series[2]    += 1
+
+    @contextmanager
+    def time(self, *labelvalues):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t, *labelvalues)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = ["# HELP " + self.name + " " + self.help, "# TYPE " + self.name + " histogram"]
+        with self._lock:
+            items = sorted((k, [list(v[0]), v[1], v[2]]) for k, v in self._series.items())
+        for labelvalues, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append(self.name + "_bucket" + _labels(self.labelnames, labelvalues, 'le="' + le + '"')
+                             + " " + str(cumulative))
+            lines.append(self.name + "_sum" + _labels(self.labelnames, labelvalues) + " " + repr(round(total, 6)))
+            lines.append(self.name + "_count" + _labels(self.labelnames, labelvalues) + " " + str(count))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = STAGE_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def reset(self):
+        """Forget everything observed so far (the warm-up's synthetic queries)."""
+        for metric in self._metrics:
+            metric.reset()
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS   = REGISTRY.histogram("rag_stage_duration_seconds", "Time spent in one pipeline stage.",
+                                     ("stage",), STAGE_BUCKETS)
+REQUEST_SECONDS = REGISTRY.histogram("rag_request_duration_seconds", "Whole query pipeline time by answer path.",
+                                     ("path",), REQUEST_BUCKETS)
+REQUESTS        = REGISTRY.counter("rag_requests_total", "Queries answered, by intent and answer path.",
+                                   ("intent", "path"))
+CACHE_REQUESTS  = REGISTRY.counter("rag_cache_requests_total", "Answer cache lookups by tier and result.",
+                                   ("tier", "result"))
+LLM_GENERATIONS = REGISTRY.counter("rag_llm_generations_total", "LLM generations by model and outcome.",
+                                   ("model", "outcome"))
+CHAT_REJECTIONS = REGISTRY.counter("chat_rejections_total", "Chat requests answered with a canned notice.",
+                                   ("reason",))
+
+
+def observe_stage(name: str, started: float):
+    """A stage that began at perf_counter() == started: histogram + span on the current trace."""
+    secs = time.perf_counter() - started
+    STAGE_SECONDS.observe(secs, name)
+    tracing.add_span(name, started, secs)
+
+
+@contextmanager
+def timed_stage(name: str):
+    """Context manager timing one pipeline stage."""
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, t)
+
+
+def gauge(name: str, help_text: str, labelnames: Tuple[str, ...], samples) -> str:
+    """Exposition of a gauge read at scrape time — samples are (labelvalues, value) pairs."""
+    lines = ["# HELP " + name + " " + help_text, "# TYPE " + name + " gauge"]
+    for labelvalues, value in samples:
+        lines.append(name + _labels(labelnames, labelvalues) + " " + _number(value))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,171 @@
+"""
+model_router.py — Latency-aware model choice with a circuit breaker
+====================================================================
+The pipeline's fixed rules send list and Nepali queries to the 70b model.
+When that model slows down or returns rate-limit errors, every one of those
+queries ran into the 10s timeout. The router keeps a rolling window of
+outcomes (latency, success, error kind) per model and a breaker for each:
+
+  closed     normal — the preferred model is used
+  open       ROUTER_MIN_CALLS+ recent calls with an error rate at or above
+             BREAKER_ERROR_RATE, BREAKER_CONSECUTIVE failures in a row, or a
+             median latency above BREAKER_SLOW_SECS. Traffic goes to the
+             fallback (8b) model for BREAKER_COOLDOWN_SECS.
+  half_open  after the cooldown, one request at a time probes the preferred
+             model. A success closes the breaker; a failure reopens it.
+
+Transitions are logged and kept, with per-model latency and error stats,
+for /status "model_router".
+"""
+
+import os
+import time
+import logging
+from collections import deque
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_MODEL = "llama-3.1-8b-instant"
+
+ROUTER_WINDOW_SECS    = 60.0
+ROUTER_WINDOW_CALLS   = 50      # at most this many recent outcomes per model
+ROUTER_MIN_CALLS      = 5       # error rate / latency only judged over this many calls
+BREAKER_ERROR_RATE    = 0.5
+BREAKER_CONSECUTIVE   = 3
+BREAKER_SLOW_SECS     = float(os.getenv("BREAKER_SLOW_SECS", "6.0"))
+BREAKER_COOLDOWN_SECS = float(os.getenv("BREAKER_COOLDOWN_SECS", "30"))
+PROBE_TIMEOUT_SECS    = 15.0    # a probe that never reported back frees the slot after this
+MAX_TRANSITIONS       = 50
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def error_kind(exc: BaseException) -> str:
+    """Coarse error class for stats: rate_limit, timeout or error."""
+    text = (type(exc).__name__ + " " + str(exc)).lower()
+    if "ratelimit" in text or "rate limit" in text or "429" in text:
+        return "rate_limit"
+    if "timeout" in text:
+        return "timeout"
+    return "error"
+
+
+def _median(values) -> float:
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2] if ordered else 0.0
+
+
+class ModelHealth:
+    def __init__(self, model: str):
+        self.model        = model
+        self.state        = CLOSED
+        self.opened_at    = 0.0
+        self.probe_at     = None             # start time of the half-open probe in flight
+        self.consecutive  = 0                # failures in a row
+        self._window: deque = deque(maxlen=ROUTER_WINDOW_CALLS)   # (time, latency, ok)
+        self.counts       = {"calls": 0, "errors": 0, "rate_limit": 0, "timeout": 0, "error": 0,
+                             "fallbacks": 0, "probes": 0}
+
+    def _recent(self, now: float):
+        while self._window and now - self._window[0][0] > ROUTER_WINDOW_SECS:
+            self._window.popleft()
+        return self._window
+
+    def trip_reason(self, now: float):
+        """Why the breaker should open now, or None."""
+        if self.consecutive >= BREAKER_CONSECUTIVE:
+            return str(self.consecutive) + " consecutive failures"
+        recent = self._recent(now)
+        if len(recent) < ROUTER_MIN_CALLS:
+            return None
+        errors = sum(1 for _, _, ok in recent if not ok)
+        if errors / len(recent) >= BREAKER_ERROR_RATE:
+            return "error rate " + str(round(errors / len(recent), 2))
+        median = _median([latency for _, latency, ok in recent if ok])
+        if median > BREAKER_SLOW_SECS:
+            return "median latency " + str(round(median, 1)) + "s"
+        return None
+
+    def stats(self, now: float) -> Dict:
+        recent    = self._recent(now)
+        latencies = [latency for _, latency, ok in recent if ok]
+        errors    = sum(1 for _, _, ok in recent if not ok)
+        return dict(self.counts,
+                    state=self.state,
+                    window_calls=len(recent),
+                    error_rate=round(errors / len(recent), 3) if recent else 0.0,
+                    latency_p50_ms=round(_median(latencies) * 1000, 1),
+                    open_for_s=round(now - self.opened_at, 1) if self.state != CLOSED else 0.0)
+
+
+class ModelRouter:
+    def __init__(self, fallback: str = FALLBACK_MODEL):
+        self.fallback = fallback
+        self.models: Dict[str, ModelHealth] = {}
+        self.transitions: deque = deque(maxlen=MAX_TRANSITIONS)
+
+    def _health(self, model: str) -> ModelHealth:
+        health = self.models.get(model)
+        if health is None:
+            health = self.models[model] = ModelHealth(model)
+        return health
+
+    def _move(self, health: ModelHealth, state: str, reason: str):
+        logger.warning("Model " + health.model + ": " + health.state + " → " + state + " (" + reason + ")")
+        self.transitions.append({"time": round(time.time(), 1), "model": health.model,
+                                 "from": health.state, "to": state, "reason": reason})
+        health.state = state
+        if state == OPEN:
+            health.opened_at = time.monotonic()
+        if state != HALF_OPEN:
+            health.probe_at = None
+
+    def choose(self, preferred: str) -> Tuple[str, bool]:
+        """(model to call, degraded). Degraded means the fallback stands in for an unhealthy model."""
+        if preferred == self.fallback:
+            return preferred, False
+        health = self._health(preferred)
+        now    = time.monotonic()
+        if health.state == OPEN and now - health.opened_at >= BREAKER_COOLDOWN_SECS:
+            self._move(health, HALF_OPEN, "cooldown elapsed")
+        if health.state == HALF_OPEN and (health.probe_at is None or now - health.probe_at > PROBE_TIMEOUT_SECS):
+            health.probe_at = now
+            health.counts["probes"] += 1
+            return preferred, False
+        if health.state == CLOSED:
+            return preferred, False
+        health.counts["fallbacks"] += 1
+        return self.fallback, True
+
+    def record(self, model: str, latency: float, ok: bool, kind: str = None):
+        """Outcome of one generation on model."""
+        health = self._health(model)
+        now    = time.monotonic()
+        health._window.append((now, latency, ok))
+        health.counts["calls"] += 1
+        if ok:
+            health.consecutive = 0
+        else:
+            health.consecutive += 1
+            health.counts["errors"] += 1
+            health.counts[kind or "error"] += 1
+
+        if health.state == HALF_OPEN and health.probe_at is not None:
+            if ok and latency <= BREAKER_SLOW_SECS:
+                health._window.clear()           # judge the recovered model on fresh calls
+                self._move(health, CLOSED, "probe succeeded in " + str(round(latency, 1)) + "s")
+            else:
+                self._move(health, OPEN, "probe " + ("failed: " + (kind or "error") if not ok else "too slow"))
+        elif health.state == CLOSED and model != self.fallback:
+            reason = health.trip_reason(now)
+            if reason:
+                self._move(health, OPEN, reason)
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "fallback":    self.fallback,
+            "models":      {name: health.stats(now) for name, health in self.models.items()},
+            "transitions": list(self.transitions),
+        }
@@ -0,0 +1,191 @@
+"""
+prefetcher.py — Background answers for the suggestion chips just shown
+=======================================================================
+Users very often tap one of the three chips returned with an answer, and
+that tap used to start the whole pipeline from scratch. With PREFETCH=true,
+after a response is produced the service answers its chips in the
+background, with the same chat history the tap will see, and keeps the
+results in a short-TTL per-session store. A tap that matches is answered
+instantly.
+
+Prefetching is strictly background work:
+  - at most PREFETCH_CONCURRENCY prefetches run at once, service-wide, and
+    their generations go through the admission controller's background lanes,
+    which never take a user's slot or queue place
+  - a sliding one-minute token budget (estimated per answer) caps LLM spend
+  - a prefetch that gets its turn while PREFETCH_MAX_FOREGROUND or more user
+    requests are in flight is dropped instead of competing with them, and
+    prefetches already running are cancelled once that many arrive
+  - an entry only matches while the session's chat history is unchanged, so
+    any other message invalidates that session's prefetches
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from footprint import deep_sizeof
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED        = os.getenv("PREFETCH", "false").lower() == "true"
+PREFETCH_CONCURRENCY    = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+PREFETCH_TOKENS_PER_MIN = int(os.getenv("PREFETCH_TOKENS_PER_MIN", "20000"))
+PREFETCH_TTL_SECS       = float(os.getenv("PREFETCH_TTL_SECS", "180"))
+PREFETCH_MAX_SESSIONS   = 500
+PREFETCH_MAX_FOREGROUND = 2
+PREFETCH_EST_TOKENS     = 900      # prompt + completion reserved per prefetched answer
+PREFETCH_DEADLINE_SECS  = 15.0     # time budget of one background answer
+
+
+def history_key(chat_history: str) -> str:
+    return hashlib.md5(chat_history.encode("utf-8")).hexdigest()
+
+
+def _message_key(message: str) -> str:
+    return " ".join(message.lower().strip().rstrip("?!.").split())
+
+
+class Prefetcher:
+    def __init__(self, enabled: bool = PREFETCH_ENABLED, concurrency: int = PREFETCH_CONCURRENCY,
+                 tokens_per_min: int = PREFETCH_TOKENS_PER_MIN, ttl_secs: float = PREFETCH_TTL_SECS):
+        self.enabled        = enabled
+        self.concurrency    = concurrency
+        self.tokens_per_min = tokens_per_min
+        self.ttl_secs       = ttl_secs
+        self.foreground     = 0                    # user requests currently in the pipeline
+        self._semaphore     = None                 # created on the serving event loop
+        self._spent: deque  = deque()              # (time, tokens) reserved in the last minute
+        # session_id → {"history": key, "answers": {message key: (result, expires_at)}}
+        self._store: "OrderedDict[str, Dict]" = OrderedDict()
+        self._tasks: set    = set()
+        self._running: set  = set()                # tasks answering right now (preempted by users)
+        self.stats_counts   = {"scheduled": 0, "completed": 0, "failed": 0, "lookups": 0, "hits": 0,
+                               "expired": 0, "invalidated": 0, "skipped_budget": 0, "skipped_busy": 0,
+                               "preempted": 0}
+
+    # ── Foreground tracking ───────────────────────────────────────────────────
+    def enter(self):
+        self.foreground += 1
+        if self.foreground >= PREFETCH_MAX_FOREGROUND and self._running:
+            for task in list(self._running):
+                task.cancel()
+
+    def exit(self):
+        self.foreground = max(0, self.foreground - 1)
+
+    # ── Budget ────────────────────────────────────────────────────────────────
+    def _reserve(self, tokens: int) -> bool:
+        now = time.monotonic()
+        while self._spent and now - self._spent[0][0] > 60:
+            self._spent.popleft()
+        if sum(t for _, t in self._spent) + tokens > self.tokens_per_min:
+            return False
+        self._spent.append((now, tokens))
+        return True
+
+    # ── Store ─────────────────────────────────────────────────────────────────
+    def _session(self, session_id: str, history: str) -> Dict:
+        entry = self._store.get(session_id)
+        if entry is None or entry["history"] != history:
+            if entry is not None:
+                self.stats_counts["invalidated"] += len(entry["answers"])
+            entry = {"history": history, "answers": {}}
+            self._store[session_id] = entry
+        self._store.move_to_end(session_id)
+        while len(self._store) > PREFETCH_MAX_SESSIONS:
+            self._store.popitem(last=False)
+        return entry
+
+    def take(self, session_id: str, message: str, chat_history: str) -> Optional[dict]:
+        """Prefetched result for this message and history, or None. A hit is consumed."""
+        if not self.enabled:
+            return None
+        self.stats_counts["lookups"] += 1
+        entry = self._store.get(session_id)
+        if entry is None:
+            return None
+        if entry["history"] != history_key(chat_history):
+            self.stats_counts["invalidated"] += len(entry["answers"])
+            del self._store[session_id]
+            return None
+        found = entry["answers"].pop(_message_key(message), None)
+        if found is None:
+            return None
+        result, expires_at = found
+        if time.monotonic() > expires_at:
+            self.stats_counts["expired"] += 1
+            return None
+        self.stats_counts["hits"] += 1
+        return result
+
+    # ── Scheduling ────────────────────────────────────────────────────────────
+    def schedule(self, session_id: str, messages: list, chat_history: str, answer) -> None:
+        """
+        Answer each message in the background. answer(message, chat_history) is
+        a coroutine function returning the result dict to store (or None).
+        """
+        if not self.enabled or not messages:
+            return
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        history = history_key(chat_history)
+        entry   = self._session(session_id, history)
+        for message in messages:
+            key = _message_key(message)
+            if not key or key in entry["answers"]:
+                continue
+            if not self._reserve(PREFETCH_EST_TOKENS):
+                self.stats_counts["skipped_budget"] += 1
+                continue
+            self.stats_counts["scheduled"] += 1
+            task = asyncio.ensure_future(self._run(session_id, history, key, message, chat_history, answer))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, session_id, history, key, message, chat_history, answer):
+        async with self._semaphore:
+            if self.foreground >= PREFETCH_MAX_FOREGROUND:
+                self.stats_counts["skipped_busy"] += 1
+                return
+            entry = self._store.get(session_id)
+            if entry is None or entry["history"] != history:
+                return                               # the conversation moved on while queued
+            task = asyncio.current_task()
+            self._running.add(task)
+            try:
+                result = await answer(message, chat_history)
+            except asyncio.CancelledError:
+                self.stats_counts["preempted"] += 1     # user load arrived (or shutdown)
+                return
+            except Exception as e:
+                self.stats_counts["failed"] += 1
+                logger.warning("Prefetch failed for '" + message[:40] + "': " + str(e))
+                return
+            finally:
+                self._running.discard(task)
+        entry = self._store.get(session_id)
+        if result is None or entry is None or entry["history"] != history:
+            return
+        entry["answers"][key] = (result, time.monotonic() + self.ttl_secs)
+        self.stats_counts["completed"] += 1
+
+    def memory(self, seen: set = None) -> Dict:
+        """Stored answers and their approximate size — /debug/memory (runs off the event loop)."""
+        try:
+            answers = sum(len(entry["answers"]) for entry in list(self._store.values()))
+        except RuntimeError:                       # the store changed while being copied
+            answers = None
+        return {"sessions": len(self._store), "answers": answers, "bytes": deep_sizeof(self._store, seen=seen)}
+
+    def stats(self) -> Dict:
+        lookups = self.stats_counts["lookups"]
+        return dict(self.stats_counts,
+                    enabled=self.enabled,
+                    hit_rate=round(self.stats_counts["hits"] / lookups, 3) if lookups else 0.0,
+                    inflight=len(self._tasks),
+                    sessions=len(self._store))
@@ -0,0 +1,208 @@
+"""
+profiler.py — On-demand sampling profiler for the query pipeline
+=================================================================
+Traces show which stage was slow. They do not show which Python code inside
+that stage used the CPU: the classifiers, _hybrid_retrieve, suggestion
+generation or the response-cleaning regexes. cProfile is not an option
+here. It instruments every call, and it cannot separate requests that
+interleave on one event loop.
+
+This profiler samples instead. A daemon thread wakes every
+PROFILE_INTERVAL_MS while a profiled request is in flight. Each time it
+reads the stacks of the event-loop thread and the retrieval workers from
+sys._current_frames(). Idle stacks (the loop blocked in select, a worker
+waiting for a task) are dropped. A request is kept when:
+
+  - it was picked by PROFILE_SAMPLE_RATE (fraction 0–1), or
+  - it took at least PROFILE_SLOW_MS (0 = off). Deciding this needs the
+    samples of every request, so the thread runs whenever a request is in
+    flight while this mode is on.
+
+The samples taken during a kept request are merged into one aggregate of
+collapsed stacks ("thread;module:func;module:func count"). That format is
+what flamegraph.pl and speedscope read. Requests overlap on the event
+loop, so a request's samples are what the process was doing while that
+request ran, not only that request's own frames.
+
+Both settings can also be changed at runtime through the admin-only
+/api/v1/debug/profile endpoint, which serves the aggregate.
+"""
+
+import os
+import sys
+import time
+import random
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS     = float(os.getenv("PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_DEPTH   = 64       # innermost frames kept per stack
+PROFILE_MAX_STACKS  = 5000     # distinct collapsed stacks kept; rarer new ones are counted as dropped
+SAMPLE_RING         = 20000    # recent samples kept for attributing to requests still in flight
+
+# (file, function) of a thread's innermost Python frame when it has nothing to do
+_IDLE_LEAVES = {("selectors.py", "select"), ("thread.py", "_worker"), ("threading.py", "wait")}
+
+
+def _label(code) -> str:
+    module = os.path.basename(code.co_filename)
+    if module.endswith(".py"):
+        module = module[:-3]
+    return module + ":" + getattr(code, "co_qualname", code.co_name)
+
+
+class Profile:
+    """Handle of one request that may be kept — see SamplingProfiler.begin()."""
+
+    def __init__(self, sampled: bool):
+        self.sampled = sampled
+        self.started = time.perf_counter()
+
+
+class SamplingProfiler:
+    def __init__(self, sample_rate: float = PROFILE_SAMPLE_RATE, slow_ms: float = PROFILE_SLOW_MS,
+                 interval_ms: float = PROFILE_INTERVAL_MS):
+        self.sample_rate  = min(1.0, max(0.0, sample_rate))
+        self.slow_ms      = max(0.0, slow_ms)
+        self.interval     = max(1.0, interval_ms) / 1000
+        self._active      = 0                  # profiled requests in flight
+        self._busy        = threading.Event()  # set while _active > 0
+        self._thread      = None
+        self._loop_ident  = None               # the event-loop thread, learnt from begin()
+        self._lock        = threading.Lock()
+        self._ring: deque = deque(maxlen=SAMPLE_RING)   # (perf_counter, collapsed stack)
+        self._stacks: Dict[str, int] = {}      # aggregate of kept requests
+        self.counts       = {"requests": 0, "kept_sampled": 0, "kept_slow": 0, "samples": 0,
+                             "dropped_stacks": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_ms > 0
+
+    def configure(self, sample_rate: float = None, slow_ms: float = None, reset: bool = False):
+        if sample_rate is not None:
+            self.sample_rate = min(1.0, max(0.0, sample_rate))
+        if slow_ms is not None:
+            self.slow_ms = max(0.0, slow_ms)
+        if reset:
+            self.reset()
+        logger.info("Profiler: sample_rate=" + str(self.sample_rate) + " slow_ms=" + str(self.slow_ms))
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self._ring.clear()
+            for key in self.counts:
+                self.counts[key] = 0
+
+    # ── Per request (event-loop thread) ───────────────────────────────────────
+    def begin(self) -> Optional[Profile]:
+        """Start of a request. None when it cannot be kept, so no sampling is needed for it."""
+        if not self.enabled:
+            return None
+        sampled = random.random() < self.sample_rate
+        if not sampled and self.slow_ms <= 0:
+            return None
+        self._loop_ident = threading.get_ident()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+        self._active += 1
+        self._busy.set()
+        return Profile(sampled)
+
+    def end(self, profile: Optional[Profile], elapsed_secs: float) -> bool:
+        """End of a request begun with begin(). True when its samples were kept."""
+        if profile is None:
+            return False
+        self._active -= 1
+        if self._active <= 0:
+            self._active = 0
+            self._busy.clear()
+        slow = 0 < self.slow_ms <= elapsed_secs * 1000
+        with self._lock:
+            self.counts["requests"] += 1
+            if not (profile.sampled or slow):
+                return False
+            self.counts["kept_sampled" if profile.sampled else "kept_slow"] += 1
+            for taken, stack in reversed(self._ring):
+                if taken < profile.started:
+                    break
+                if stack in self._stacks:
+                    self._stacks[stack] += 1
+                elif len(self._stacks) < PROFILE_MAX_STACKS:
+                    self._stacks[stack] = 1
+                else:
+                    self.counts["dropped_stacks"] += 1
+        return True
+
+    # ── Sampler thread ────────────────────────────────────────────────────────
+    def _run(self):
+        while True:
+            self._busy.wait()
+            time.sleep(self.interval)
+            if self._busy.is_set():
+                self._sample()
+
+    def _sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        taken = time.perf_counter()
+        found = []
+        for ident, frame in sys._current_frames().items():
+            if ident == self._loop_ident:
+                root = "event_loop"
+            elif names.get(ident, "").startswith("retrieval"):
+                root = "retrieval"
+            else:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                continue
+            labels = []
+            while frame is not None and len(labels) < PROFILE_MAX_DEPTH:
+                labels.append(_label(frame.f_code))
+                frame = frame.f_back
+            found.append((taken, root + ";" + ";".join(reversed(labels))))
+        with self._lock:
+            self._ring.extend(found)
+            self.counts["samples"] += len(found)
+
+    # ── Output ────────────────────────────────────────────────────────────────
+    def collapsed(self) -> str:
+        """The aggregate as collapsed stacks, most frequent first (flamegraph.pl / speedscope input)."""
+        with self._lock:
+            items = sorted(self._stacks.items(), key=lambda item: -item[1])
+        return "".join(stack + " " + str(count) + "\n" for stack, count in items)
+
+    def functions(self, limit: int = 50) -> List[Dict]:
+        """Samples per function: self (innermost frame) and total (anywhere on the stack)."""
+        with self._lock:
+            items = list(self._stacks.items())
+        own, total = {}, {}
+        for stack, count in items:
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            own[frames[-1]] = own.get(frames[-1], 0) + count
+            for name in set(frames):
+                total[name] = total.get(name, 0) + count
+        ranked = sorted(total, key=lambda name: (-own.get(name, 0), -total[name]))
+        return [{"function": name, "self": own.get(name, 0), "total": total[name]} for name in ranked[:limit]]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stacks = len(self._stacks)
+            counts = dict(self.counts)
+        return dict(counts,
+                    enabled=self.enabled,
+                    sample_rate=self.sample_rate,
+                    slow_ms=self.slow_ms,
+                    interval_ms=round(self.interval * 1000, 1),
+                    in_flight=self._active,
+                    stacks=stacks)
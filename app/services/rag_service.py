@@ -3,23 +3,25 @@ rag_service.py  —  Mobile-Optimized RAG Service  v4
 ====================================================
 Zero deprecated LangChain imports. Works with modern LangChain.
 Direct retriever + LLM calls instead of deprecated chains.
+
+LangChain, Groq, FAISS and FastEmbed are imported inside the methods that
+use them, so importing this module is cheap and the server can accept
+connections (and answer health checks) while initialize() runs.
 """
 
 import os
 import re
 import json
 import time
+import pickle
 import logging
 import asyncio
+import threading
 from pathlib import Path
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor
 
-from langchain_groq import ChatGroq
-from langchain_community.embeddings import FastEmbedEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import TextLoader, DirectoryLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
-from langchain_core.prompts import PromptTemplate
+import numpy as np
 
 try:
     from rank_bm25 import BM25Okapi
@@ -31,19 +33,146 @@ import sys
 
 sys.path.append(str(Path(__file__).parent))
 from suggestion_engine import SuggestionEngine
+from vector_engine import VectorEngine
+from context_packer import ContextPacker
+from deadline import Deadline
+from intent_classifier import classify, is_nepali, QueryIntent, LIST_EXCLUDED, CONSERVATION_EXCLUDED
+from semantic_router import SemanticRouter, ROUTER_FILE, router_signature
+from species_lexicon import SpeciesLexicon, collect_names, species_names
+from suggestion_graph import SuggestionGraph, GRAPH_FILE
+from prefetcher import Prefetcher, PREFETCH_DEADLINE_SECS
+from admission import AdmissionController, AdmissionRejected
+from model_router import ModelRouter, error_kind
+from retrieval_executor import RetrievalExecutor, ONNX_THREADS
+import metrics
+import tracing
+from tracing import TraceStore, new_trace_id
+from profiler import SamplingProfiler
+import footprint
+from metrics import (timed_stage, observe_stage, REQUEST_SECONDS, REQUESTS, CACHE_REQUESTS, LLM_GENERATIONS,
+                     CHAT_REJECTIONS)
+from index_factory import INDEX_TYPES, DEFAULT_INDEX_TYPE, build_index, apply_search_params, index_nbytes
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
 logger = logging.getLogger(__name__)
 
 MAX_INPUT_CHARS    = 500
 MAX_MEMORY_TURNS   = 6
+MEMORY_MODE        = os.getenv("MEMORY_MODE", "turns").lower()   # "turns" | "tokens"
+MEMORY_TOKEN_BUDGET   = 350    # verbatim history + summary, in tokens ("tokens" mode)
+MEMORY_SUMMARY_TOKENS = 100    # rolling summary share of that budget
 MAX_RESPONSE_CHARS = 400
 MAX_LIST_RESPONSE_CHARS = 800
 MAX_LIST_ITEMS     = 6
 QUERY_TIMEOUT_SECS = 10.0
+DEGRADED_TIMEOUT_SECS = 6.0  # generation budget when the 8b model stands in for an unhealthy 70b
+# max_tokens per intent is derived from its char limit: Llama spends roughly
+# 4 chars/token on English and 2 on Devanagari; headroom lets the stream reach
+# a sentence/bullet boundary past the limit before the token cap cuts it off.
+CHARS_PER_TOKEN_EN  = 4.0
+CHARS_PER_TOKEN_NE  = 2.0
+MAX_TOKENS_HEADROOM = 1.5
+# The caps used before early stopping are kept as floors: early stopping ends
+# answers at their char limit, so the cap only has to never cut in first. An
+# English list always carries Nepali names (~12% Devanagari), so 800 chars can
+# cost ~275 tokens plus an overshoot bullet, past the 300 that 800/4*1.5 gives.
+MAX_TOKENS_LIST     = 400
+MAX_TOKENS_PRICE    = 250
+MAX_TOKENS_CONVO    = 150
+MAX_TOKENS_CONVO_NE = 300
+REPLAY_WORDS_PER_TOKEN = 3     # cached/canned answers are streamed in bursts of this many words
+MMR_FETCH_FACTOR   = 4      # fetch_k = k * MMR_FETCH_FACTOR
+MMR_LAMBDA         = 0.7
+# Confidence guard for category-filtered queries: "off" retries serially when
+# the answer is uncertain, "merge" adds unfiltered docs to the first context,
+# "hedge" races an unfiltered LLM call against a slow filtered one.
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "off").lower()
+BROAD_K               = 8      # unfiltered docs fetched for the broad context
+SPECULATIVE_EXTRA_DOCS = 3     # unfiltered docs appended in "merge" mode
+HEDGE_DELAY_SECS      = float(os.getenv("HEDGE_DELAY_SECS", "2.0"))
+EMBEDDING_MODEL    = "BAAI/bge-small-en-v1.5"
+GROQ_BASE_URL      = "https://api.groq.com"
+WARMUP_SESSION_ID  = "__warmup__"
+
+# One synthetic query per intent branch, run through the full pipeline at startup
+WARMUP_QUERIES = [
+    ("conversational", "Tell me about the Bengal tiger"),
+    ("greeting",       "hello"),
+    ("activity_list",  "What activities are available?"),
+    ("price",          "How much does a jeep safari cost?"),
+    ("list",           "List some birds found in Chitwan"),
+    ("conservation",   "Endangered mammals in Chitwan"),
+    ("bare_list",      "just list the reptiles, no explanation"),
+    ("nepali",         "चितवनमा कति बाघ छन्?"),
+]
+
+# Bump whenever the on-disk index layout changes — a stale index is rebuilt on load
+INDEX_VERSION      = 2
+INDEX_META_FILE    = "index_meta.json"
+# Indexes saved before index_meta.json existed: flat, one vector per chunk.
+# They still load (no multi-view activity records until REBUILD_INDEX=true).
+LEGACY_INDEX_META  = {"version": 1, "index_type": "flat", "index_params": {}}
+_BULLET_LINE       = re.compile(r"^\s*[•\-*\d]", re.MULTILINE)   # same rule as _enforce_list_limit
+_SENTENCE_END      = re.compile(r"[.!?।](?=\s)|\n")
+_SPECIES_CANDIDATE = re.compile(r"[A-Z][a-z]+(?: [A-Z][a-z]+)+")  # capitalized multi-word phrases
+
+
+def _stop_point(text: str, char_limit: int, max_items: int = None):
+    """
+    Where to cut a streamed answer, or None to keep generating.
+    Lists stop just before bullet max_items+1; anything stops once past
+    char_limit, cut back to the last bullet/sentence boundary within it.
+    """
+    if max_items:
+        starts = [m.start() for m in _BULLET_LINE.finditer(text)]
+        if len(starts) > max_items:
+            return starts[max_items]
+    if len(text) < char_limit:
+        return None
+    window = text[:char_limit]
+    if max_items:
+        cut = window.rfind("\n")
+    else:
+        ends = [m.end() for m in _SENTENCE_END.finditer(window)]
+        cut  = ends[-1] if ends else -1
+    return cut if cut > 0 else char_limit
+
+
+@contextmanager
+def _timed(timings: dict, phase: str):
+    """Record how long a startup phase took (seconds) into timings[phase]."""
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = round(time.perf_counter() - t, 3)
+
+
+class StartupCancelled(Exception):
+    """Shutdown began while the service was still loading."""
+
 
-# ── Known species index (built at startup for hallucination guard) ────────────
-KNOWN_SPECIES: set = set()   # populated in RAGService.initialize()
+class _StubMessage:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class _StubLLM:
+    """
+    Stands in for ChatGroq during warm-up — same ainvoke/astream surface, no
+    network. The canned answer has bullets and prose so every post-processing
+    path (list limits, bare-list and convo cleaners, guards) gets exercised.
+    """
+    ANSWER = ("• Bengal Tiger (बाघ) - Endangered; around 120 tigers live in Chitwan.\n"
+              "• One-horned Rhinoceros (गैंडा) - Vulnerable; Chitwan has the second largest population.\n"
+              "The Jeep Safari runs mornings and evenings.")
+
+    async def ainvoke(self, prompt):
+        return _StubMessage(self.ANSWER)
+
+    async def astream(self, prompt):
+        for line in self.ANSWER.split("\n"):
+            yield _StubMessage(line + "\n")
 
 
 # ── Smart Response Cache ─────────────────────────────────────────────────────
@@ -146,70 +275,223 @@ class SimpleMemory:
     def __init__(self, max_turns=6):
         self.max_turns = max_turns
         self.messages  = []
+        self._rendered = None        # cached chat_history string, reset on change
 
     def load_memory_variables(self, _):
+        if self._rendered is None:
+            self._rendered = self._render()
+        return {"chat_history": self._rendered}
+
+    def _render(self) -> str:
         lines = []
         for msg in self.messages[-self.max_turns * 2:]:
             prefix = "Human" if msg["role"] == "human" else "Assistant"
             lines.append(prefix + ": " + msg["content"])
-        return {"chat_history": "\n".join(lines)}
+        return "\n".join(lines)
 
     def save_context(self, inputs, outputs):
         self.messages.append({"role": "human",     "content": inputs.get("question", "")})
         self.messages.append({"role": "assistant", "content": outputs.get("answer",   "")})
         if len(self.messages) > self.max_turns * 2:
             self.messages = self.messages[-self.max_turns * 2:]
+        self._rendered = None
 
     def clear(self):
-        self.messages = []
+        self.messages  = []
+        self._rendered = None
 
     @property
     def chat_memory(self):
         return self
 
 
+class TokenBudgetMemory(SimpleMemory):
+    """
+    Bounds history by tokens instead of turns (MEMORY_MODE=tokens).
+    Recent turns stay verbatim; once they exceed the budget the oldest turns
+    are folded into a short extractive summary — the question plus the first
+    sentence of the answer — so no LLM call is needed on the request path.
+    """
+
+    def __init__(self, count_tokens=None, token_budget=MEMORY_TOKEN_BUDGET,
+                 summary_tokens=MEMORY_SUMMARY_TOKENS, max_turns=MAX_MEMORY_TURNS):
+        super().__init__(max_turns=max_turns)
+        self.count          = count_tokens or (lambda text: (len(text) + 3) // 4)
+        self.token_budget   = token_budget
+        self.summary_tokens = summary_tokens
+        self.summary: list  = []     # one line per folded turn, oldest first
+        self._tokens: list  = []     # token count per message, parallel to self.messages
+
+    def _render(self) -> str:
+        history = super()._render()
+        if not self.summary:
+            return history
+        return "Earlier in this conversation: " + " ".join(self.summary) + ("\n" + history if history else "")
+
+    @staticmethod
+    def _summarize_turn(question: str, answer: str) -> str:
+        first = re.split(r"(?<=[.!?।])\s+|\n", answer.strip(), maxsplit=1)[0].lstrip("•-* ")
+        return "Asked \"" + question[:80] + "\" → " + first[:120].rstrip(".!?। ") + "."
+
+    def save_context(self, inputs, outputs):
+        question = inputs.get("question", "")
+        answer   = outputs.get("answer",   "")
+        self.messages.append({"role": "human",     "content": question})
+        self.messages.append({"role": "assistant", "content": answer})
+        self._tokens += [self.count("Human: " + question), self.count("Assistant: " + answer)]
+
+        verbatim_budget = self.token_budget - self.summary_tokens
+        # Fold oldest turns into the summary, but always keep the latest turn verbatim
+        while len(self.messages) > 2 and (sum(self._tokens) > verbatim_budget
+                                          or len(self.messages) > self.max_turns * 2):
+            q, a = self.messages[0]["content"], self.messages[1]["content"]
+            self.messages = self.messages[2:]
+            self._tokens  = self._tokens[2:]
+            self.summary.append(self._summarize_turn(q, a))
+        while len(self.summary) > 1 and sum(self.count(line) for line in self.summary) > self.summary_tokens:
+            self.summary.pop(0)
+        self._rendered = None
+
+    def clear(self):
+        super().clear()
+        self.summary = []
+        self._tokens = []
+
+
 class RAGService:
     def __init__(self):
         self.embeddings        = None
         self.llm               = None
         self.vector_db         = None
         self._sessions: dict   = {}          # session_id → SimpleMemory
-        self.retriever_convo   = None
-        self.retriever_list    = None
-        self.retriever_bare    = None
-        self.retriever_price   = None
+        self.vector_engine     = None        # in-memory dense retrieval (VectorEngine)
+        self._index_meta: dict = {}          # contents of index_meta.json
+        self._index_bytes      = 0
+        self.context_packer    = None        # token-budgeted prompt context (ContextPacker)
+        self.router            = None        # embedding-based category/intent router (SemanticRouter)
+        self.species_lexicon   = None        # known species names for the hallucination guard
+        self._species_names: set = set()     # collected while the wildlife JSON is indexed
+        self._hallucination_stats: dict = {"checks": 0, "flagged": 0}
+        self.suggestion_graph  = None        # offline-ranked follow-ups (scripts/build_suggestion_graph.py)
+        self._suggestion_hits: dict = {"question": 0, "document": 0, "keyword": 0}
+        self.prefetcher        = Prefetcher()   # background answers for shown chips (PREFETCH=true)
+        self.admission         = AdmissionController()   # fast lane + bounded per-model LLM lanes
+        self.model_router      = ModelRouter()           # per-model health + circuit breaker → 8b fallback
+        self.retrieval_pool    = RetrievalExecutor()     # sized workers for embedding / FAISS / BM25
+        self.traces            = TraceStore()            # recent + slowest request traces (debug endpoint)
+        self.profiler          = SamplingProfiler()      # sampled / slow requests → collapsed stacks
+        self._router_stats: dict = {"queries": 0, "category_routed": 0, "intent_routed": 0}
+        # ── Startup state ─────────────────────────────────────────────────────
+        self.ready             = False       # flipped at the end of initialize(), after warm-up
+        self.init_error        = None        # set by the caller if initialize() fails
+        self._warming_up       = False       # warm-up bypasses the response cache
+        self._stub_llm         = None        # _StubLLM while warming up
+        # ── Groq clients — reused so keep-alive connections survive requests ─
+        self._llm_cache: dict  = {}          # (model, max_tokens) → ChatGroq
+        self._llm_loop         = None        # event loop the cached clients belong to
+        self._http_async       = None        # shared httpx.AsyncClient for that loop
+        self.startup_timings: dict = {}      # phase → seconds
+        self._stopping         = threading.Event()   # set by ashutdown(); the loader stops between phases
+        self._loader           = None        # future of the _load_all worker thread
         self.suggestion_engine = SuggestionEngine()
         # ── Hybrid search ─────────────────────────────────────────────────────
         self._bm25_index       = None        # BM25 keyword index
         self._all_docs: list   = []          # all Document objects (for BM25 lookup)
         # ── Response cache ────────────────────────────────────────────────────
         self._cache            = ResponseCache(ttl_hours=24, max_size=200)
+        # ── Early-stop generation stats ───────────────────────────────────────
+        # tokens_saved is an upper bound: max_tokens minus what was generated
+        self._gen_stats: dict  = {"requests": 0, "stopped_early": 0, "tokens_saved": 0}
+        # ── Confidence guard stats (retry rate and the latency it costs) ──────
+        self._guard_stats: dict = {"filtered_queries": 0, "uncertain": 0, "retries": 0,
+                                   "retry_secs": 0.0, "hedges": 0, "hedge_wins": 0}
+        # ── Request deadline: stage → times it ran out of (or skipped for) budget
+        self._budget_exhausted: dict = {}
 
     def _get_memory(self, session_id: str) -> "SimpleMemory":
         """Get or create a memory instance for this session."""
         if session_id not in self._sessions:
-            self._sessions[session_id] = SimpleMemory(max_turns=MAX_MEMORY_TURNS)
+            if MEMORY_MODE == "tokens":
+                count = self.context_packer.count if self.context_packer else None
+                self._sessions[session_id] = TokenBudgetMemory(count_tokens=count)
+            else:
+                self._sessions[session_id] = SimpleMemory(max_turns=MAX_MEMORY_TURNS)
         return self._sessions[session_id]
 
     def clear_session(self, session_id: str) -> None:
         """Clear memory for a specific session."""
+        self.suggestion_engine.forget(session_id)
         if session_id in self._sessions:
             del self._sessions[session_id]
             logger.info("Session cleared: " + session_id)
 
-    def initialize(self, rebuild_index=False):
+    def initialize(self, rebuild_index=False, index_type: str = None, warm_up: bool = True, llm: bool = True):
+        """Blocking entry point for scripts — see ainitialize()."""
+        asyncio.run(self.ainitialize(rebuild_index=rebuild_index, index_type=index_type, warm_up=warm_up, llm=llm))
+
+    async def ainitialize(self, rebuild_index=False, index_type: str = None, warm_up: bool = True,
+                          llm: bool = True):
+        """
+        Load everything the service needs (in a worker thread), warm up every
+        hot path on the calling event loop, then flip self.ready.
+        Per-phase timings end up in self.startup_timings and in the log.
+
+        index_type only matters when the index is (re)built — one of
+        index_factory.INDEX_TYPES, defaulting to the INDEX_TYPE env var or "flat".
+        Warm-up can also be disabled with WARMUP=false.
+
+        llm=False skips the Groq client (and the GROQ_API_KEY check): build
+        steps that only produce the index and its side files pass it, with
+        warm_up=False, since nothing can be answered without it.
+        """
+        t_start = time.perf_counter()
+        # Shielded: cancelling startup must not abandon the loader thread —
+        # ashutdown() waits for it to reach a phase boundary and stop
+        self._loader = asyncio.ensure_future(asyncio.to_thread(self._load_all, rebuild_index, index_type, llm))
+        await asyncio.shield(self._loader)
+        if warm_up and os.getenv("WARMUP", "true").lower() != "false":
+            with _timed(self.startup_timings, "warm_up"):
+                await self._warm_up()
+        self.startup_timings["total"] = round(time.perf_counter() - t_start, 3)
+        self.ready = True
+        logger.info("RAG Service fully initialized — startup " + self._format_timings())
+
+    async def ashutdown(self):
+        """
+        Stop a startup that is still loading, wait for its worker thread to
+        notice, then release the retrieval pool (threads + BM25 processes).
+        """
+        self._stopping.set()
+        if self._loader is not None:
+            try:
+                await self._loader
+            except (Exception, asyncio.CancelledError):
+                pass                         # StartupCancelled, or a load that failed anyway
+        self.retrieval_pool.shutdown()
+
+    @contextmanager
+    def _phase(self, phase: str):
+        """A timed startup phase; raises StartupCancelled instead once shutdown has begun."""
+        if self._stopping.is_set():
+            raise StartupCancelled("shutdown before " + phase)
+        with _timed(self.startup_timings, phase):
+            yield
+
+    def _load_all(self, rebuild_index, index_type, llm: bool = True):
+        """
+        The embedding model loads in parallel with the index + vector engine +
+        BM25 chain and the Groq client.
+        """
         logger.info("Initializing RAG Service...")
 
+        index_type = (index_type or os.getenv("INDEX_TYPE") or DEFAULT_INDEX_TYPE).lower()
+        if index_type not in INDEX_TYPES:
+            raise ValueError("INDEX_TYPE must be one of: " + ", ".join(INDEX_TYPES))
+
         api_key = os.getenv("GROQ_API_KEY")
-        if not api_key:
+        if llm and not api_key:
             raise ValueError("GROQ_API_KEY not set.")
-
-        self.embeddings = FastEmbedEmbeddings(model_name="BAAI/bge-small-en-v1.5")
-        logger.info("Embeddings ready (FastEmbed - CPU optimized)")
-
         self._api_key = api_key
-        self.llm = self._make_llm(max_tokens=180)  # default
-        logger.info("Groq LLM ready")
 
         base_dir         = Path(__file__).resolve().parent.parent.parent
         wildlife_dir     = base_dir / "wildlife"
@@ -217,67 +499,414 @@ class RAGService:
         vector_store_dir = base_dir / "vector_store"
         index_path       = vector_store_dir / "faiss_index"
 
+        meta = {}
         if not rebuild_index and index_path.exists():
-            try:
-                self.vector_db = FAISS.load_local(
-                    str(index_path), self.embeddings, allow_dangerous_deserialization=True
-                )
-                logger.info("Loaded " + str(self.vector_db.index.ntotal) + " vectors")
-            except Exception as e:
-                logger.warning("Could not load index: " + str(e) + " - rebuilding")
+            meta = self._read_index_meta(index_path)
+            if not (index_path / INDEX_META_FILE).exists() and (index_path / "index.faiss").exists():
+                logger.warning("Index has no " + INDEX_META_FILE + " - loading it as a v1 flat index without "
+                               "multi-view activity records; run scripts/ingest_dat.py (the deploy build does)")
+                meta = dict(LEGACY_INDEX_META)
+            elif meta.get("version") != INDEX_VERSION:
+                logger.warning("Index format is out of date (want v" + str(INDEX_VERSION) + ") - rebuilding")
                 rebuild_index = True
+        load_index = not rebuild_index and index_path.exists()
+
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="rag-init") as pool:
+            embeddings_future = pool.submit(self._load_embeddings)
+            llm_future        = pool.submit(self._load_llm) if llm else None
+            packer_future     = pool.submit(self._load_context_packer)
+            index_future      = pool.submit(self._load_index, index_path, meta) if load_index else None
+
+            self.embeddings     = embeddings_future.result()
+            self.llm            = llm_future.result() if llm_future else None
+            self.context_packer = packer_future.result()
+            loaded = None
+            if index_future:
+                try:
+                    loaded = index_future.result()
+                except Exception as e:
+                    logger.warning("Could not load index: " + str(e) + " - rebuilding")
+
+        if loaded:
+            from langchain_community.vectorstores import FAISS
+            index, docstore, index_to_docstore_id = loaded
+            self.vector_db = FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+            if meta.get("index_type", DEFAULT_INDEX_TYPE) != index_type:
+                logger.warning("INDEX_TYPE=" + index_type + " differs from the saved "
+                               + meta.get("index_type", DEFAULT_INDEX_TYPE)
+                               + " index — set REBUILD_INDEX=true to switch")
+        else:
+            with self._phase("index_build"):
+                self._build_index(wildlife_dir, raw_data_dir, vector_store_dir, index_path, index_type)
+            with self._phase("vector_engine"):
+                self._build_vector_engine()
+            # ── Build BM25 keyword index ──────────────────────────────────────
+            with self._phase("bm25"):
+                self._build_bm25_index()
+
+        if self.species_lexicon is None:
+            # Index saved before the lexicon was persisted — collect the names once
+            with self._phase("species_lexicon"):
+                self.species_lexicon = SpeciesLexicon(collect_names(wildlife_dir))
+                self.species_lexicon.save(index_path)
+        logger.info("Hallucination guard ready - " + str(len(self.species_lexicon)) + " species names")
+
+        with self._phase("token_counts"):
+            self.context_packer.annotate(self.vector_engine.docs)
+        with self._phase("router"):
+            self._load_router(index_path)
+        with self._phase("suggestion_graph"):
+            self.suggestion_graph = SuggestionGraph.load(vector_store_dir / GRAPH_FILE, self.suggestion_engine)
+        if self.suggestion_graph is not None:
+            logger.info("Suggestion graph ready - " + str(len(self.suggestion_graph)) + " nodes")
+
+    def _load_embeddings(self):
+        with self._phase("embedding_model"):
+            from langchain_community.embeddings import FastEmbedEmbeddings
+            embeddings = FastEmbedEmbeddings(model_name=EMBEDDING_MODEL, threads=ONNX_THREADS)
+        logger.info("Embeddings ready (FastEmbed - CPU optimized, " + str(ONNX_THREADS) + " ONNX thread(s) x "
+                    + str(self.retrieval_pool.workers) + " retrieval worker(s))")
+        return embeddings
+
+    def _load_llm(self):
+        with self._phase("llm_client"):
+            llm = self._make_llm(max_tokens=180)  # default
+        logger.info("Groq LLM ready")
+        return llm
 
-        if rebuild_index or not self.vector_db:
-            self._build_index(wildlife_dir, raw_data_dir, vector_store_dir, index_path)
+    def _load_context_packer(self):
+        with self._phase("tokenizer"):
+            packer = ContextPacker()
+        logger.info("Context packer ready (" + packer.method + ")")
+        return packer
 
-        self.retriever_convo  = self._make_retriever(k=2)
-        self.retriever_list   = self._make_retriever(k=10)
-        self.retriever_bare   = self._make_retriever(k=10)
-        self.retriever_price  = self._make_retriever(k=6)
+    def _load_index(self, index_path, meta):
+        """
+        Read the saved index and build the vector engine and BM25 index from it.
+        Needs no embedding model, so it runs alongside the model load; the
+        LangChain FAISS wrapper is assembled afterwards.
+        """
+        import faiss
+
+        with self._phase("index_load"):
+            index = faiss.read_index(str(Path(index_path) / "index.faiss"))
+            if meta.get("version") == LEGACY_INDEX_META["version"] and not isinstance(index, faiss.IndexFlat):
+                raise ValueError("index without " + INDEX_META_FILE + " is not a flat index")
+            with open(Path(index_path) / "index.pkl", "rb") as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+            self._index_meta = meta
+            apply_search_params(index, meta.get("index_type", DEFAULT_INDEX_TYPE), meta.get("index_params", {}))
+        logger.info("Loaded " + str(index.ntotal) + " vectors ("
+                    + meta.get("index_type", DEFAULT_INDEX_TYPE) + " index)")
+
+        with self._phase("vector_engine"):
+            docs = [docstore.search(index_to_docstore_id[i]) for i in range(index.ntotal)]
+            self._build_vector_engine(index, docs)
+        with self._phase("bm25"):
+            self._build_bm25_index()
+        with self._phase("species_lexicon"):
+            self.species_lexicon = SpeciesLexicon.load(index_path)
+        return index, docstore, index_to_docstore_id
+
+    async def _warm_up(self):
+        """
+        Prime every hot path before reporting ready: ONNX first-run overhead,
+        vector engine pages, regexes, classifiers and suggestions (one synthetic
+        query per intent branch, answered by a stub LLM), plus the TLS
+        connection to Groq. Logs first-query latency before and after.
+        """
+        self._warming_up = True
+        self._stub_llm   = _StubLLM()
+        try:
+            _, first_query = WARMUP_QUERIES[0]
+            t = time.perf_counter()
+            await self._async_query(first_query, "normal", True, True, WARMUP_SESSION_ID)
+            cold_ms = (time.perf_counter() - t) * 1000
 
-        # ── Build BM25 keyword index ──────────────────────────────────────────
-        self._build_bm25_index()
-        logger.info("RAG Service fully initialized")
+            for branch, message in WARMUP_QUERIES[1:]:
+                try:
+                    await self._async_query(message, "normal", True, True, WARMUP_SESSION_ID)
+                except Exception as e:
+                    logger.warning("Warm-up query failed (" + branch + "): " + str(e))
+
+            t = time.perf_counter()
+            await self._async_query(first_query, "normal", True, True, WARMUP_SESSION_ID)
+            warm_ms = (time.perf_counter() - t) * 1000
+            logger.info("Warm-up: first-query latency " + str(round(cold_ms, 1)) + "ms cold → "
+                        + str(round(warm_ms, 1)) + "ms warm (stub LLM, "
+                        + str(len(WARMUP_QUERIES)) + " intent branches)")
+            self.startup_timings["first_query_cold"] = round(cold_ms / 1000, 4)
+            self.startup_timings["first_query_warm"] = round(warm_ms / 1000, 4)
+        finally:
+            self._stub_llm   = None
+            self._warming_up = False
+            self._sessions.pop(WARMUP_SESSION_ID, None)
+            self.suggestion_engine.forget(WARMUP_SESSION_ID)
+            metrics.REGISTRY.reset()           # /metrics starts from real traffic
+
+        await self._prime_groq_connection()
+
+    async def _prime_groq_connection(self):
+        """Open the keep-alive TLS connection to Groq with a free models-list call."""
+        t = time.perf_counter()
+        try:
+            client = self._shared_http_client()
+            resp   = await client.get(GROQ_BASE_URL + "/openai/v1/models",
+                                      headers={"Authorization": "Bearer " + self._api_key},
+                                      timeout=5.0)
+            logger.info("Groq connection primed (HTTP " + str(resp.status_code) + ") in "
+                        + str(round((time.perf_counter() - t) * 1000, 1)) + "ms")
+        except Exception as e:
+            logger.warning("Groq connection warm-up failed (non-critical): " + str(e))
+
+    def _format_timings(self) -> str:
+        return " ".join(k + "=" + str(v) + "s" for k, v in self.startup_timings.items())
 
-    def _build_index(self, wildlife_dir, raw_data_dir, vector_store_dir, index_path):
+    def _build_index(self, wildlife_dir, raw_data_dir, vector_store_dir, index_path,
+                     index_type: str = DEFAULT_INDEX_TYPE):
         documents = self._load_all_documents(wildlife_dir, raw_data_dir)
         if not documents:
             raise ValueError("No documents found.")
+        self.species_lexicon = SpeciesLexicon(self._species_names)
+
+        # Records that carry embedding views are indexed once per view; everything
+        # else is chunked as usual.
+        multi_view = [d for d in documents if d.metadata.get("views")]
+        plain_docs = [d for d in documents if not d.metadata.get("views")]
+
+        from langchain_community.vectorstores import FAISS
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
         splitter   = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=200)
-        final_docs = splitter.split_documents(documents)
+        final_docs = splitter.split_documents(plain_docs)
         logger.info("Created " + str(len(final_docs)) + " chunks")
         self.vector_db = FAISS.from_documents(final_docs, self.embeddings)
+
+        view_texts, view_docs = self._expand_views(multi_view)
+        if view_docs:
+            vectors = self.embeddings.embed_documents(view_texts)
+            self.vector_db.add_embeddings(
+                list(zip([d.page_content for d in view_docs], vectors)),
+                metadatas=[d.metadata for d in view_docs],
+            )
+            logger.info("Indexed " + str(len(multi_view)) + " multi-view records as "
+                        + str(len(view_docs)) + " vectors")
+
+        # Everything is embedded into a flat index first; other types are built
+        # from those full-precision vectors and swapped in.
+        params = {}
+        if index_type != "flat":
+            vectors = self.vector_db.index.reconstruct_n(0, self.vector_db.index.ntotal)
+            self.vector_db.index, params = build_index(vectors, index_type)
+            logger.info("Built " + index_type + " index " + str(params))
+        self._index_meta = {"index_type": index_type, "index_params": params}
+
         vector_store_dir.mkdir(parents=True, exist_ok=True)
-        self.vector_db.save_local(str(index_path))
+        self._save_index(index_path)
         logger.info("Index saved - " + str(self.vector_db.index.ntotal) + " vectors")
 
+    def _expand_views(self, records):
+        """
+        Turn each multi-view record into one index entry per view.
+        The view text is what gets embedded; the stored page_content is always the
+        record's compact canonical text, so any matching phrasing retrieves the
+        same short document.
+        """
+        from langchain_core.documents import Document
+
+        view_texts, view_docs = [], []
+        for record in records:
+            meta = {k: v for k, v in record.metadata.items() if k != "views"}
+            for view in record.metadata["views"]:
+                view_texts.append(view)
+                view_docs.append(Document(
+                    page_content=record.page_content,
+                    metadata={**meta, "view": view},
+                ))
+        return view_texts, view_docs
+
+    def _save_index(self, index_path):
+        """Persist the FAISS index together with its format metadata."""
+        self.vector_db.save_local(str(index_path))
+        self._index_meta = {
+            "version":         INDEX_VERSION,
+            "index_type":      self._index_meta.get("index_type", DEFAULT_INDEX_TYPE),
+            "index_params":    self._index_meta.get("index_params", {}),
+            "embedding_model": EMBEDDING_MODEL,
+            "dim":             self.vector_db.index.d,
+            "ntotal":          self.vector_db.index.ntotal,
+        }
+        with open(Path(index_path) / INDEX_META_FILE, "w", encoding="utf-8") as f:
+            json.dump(self._index_meta, f, indent=2)
+        if self.species_lexicon is not None:
+            self.species_lexicon.save(index_path)
+
+    def _read_index_meta(self, index_path) -> dict:
+        meta_file = Path(index_path) / INDEX_META_FILE
+        if not meta_file.exists():
+            return {}
+        try:
+            with open(meta_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _build_vector_engine(self, index=None, docs=None):
+        """
+        Exact in-memory search for flat indexes, FAISS-backed ANN search otherwise.
+        Defaults to the current vector_db's index and documents.
+        """
+        exact = self._index_meta.get("index_type", DEFAULT_INDEX_TYPE) == "flat"
+        if index is None:
+            self.vector_engine = VectorEngine.from_faiss(self.vector_db, exact=exact)
+            index = self.vector_db.index
+        else:
+            self.vector_engine = VectorEngine.from_index(index, docs, exact=exact)
+        self._index_bytes = index_nbytes(index)
+        logger.info("Vector engine ready - " + str(self.vector_engine.size) + " vectors ("
+                    + self.vector_engine.mode + " mode)")
+
+    def _load_router(self, index_path):
+        """Load the saved router prototypes, or build and save them if stale. Non-critical."""
+        try:
+            path      = Path(index_path) / ROUTER_FILE
+            signature = router_signature(EMBEDDING_MODEL, self.vector_engine.size)
+            router    = SemanticRouter.load(path, signature)
+            if router is None:
+                router = SemanticRouter.build(self.embeddings, self.vector_engine)
+                router.save(path, signature)
+                logger.info("Semantic router built - " + str(router.size) + " prototypes")
+            self.router = router
+        except Exception as e:
+            self.router = None
+            logger.warning("Semantic router unavailable, keyword routing only: " + str(e))
+
+    def _route(self, query_intent: QueryIntent, query_vec) -> QueryIntent:
+        """
+        Fill gaps the keyword classifier left, using the query embedding:
+          - a category when no category keyword matched
+          - price / list / conservation for messages that fell through to convo,
+            unless the message opens with a question starter the keyword rules
+            deliberately keep conversational
+        Greeting, activity-list and bare-list decisions are never overridden.
+        """
+        if self.router is None:
+            return query_intent
+        route    = self.router.route(query_vec)
+        category = None
+        intent   = None
+        if query_intent.category is None and route["category"]:
+            category = route["category"]
+        if query_intent.intent == "convo" and route["intent"] in ("price", "list", "conservation"):
+            blocked = ((route["intent"] == "list" and query_intent.flags & LIST_EXCLUDED)
+                       or (route["intent"] == "conservation" and query_intent.flags & CONSERVATION_EXCLUDED))
+            if not blocked:
+                intent = route["intent"]
+        if not self._warming_up:
+            self._router_stats["queries"] += 1
+            self._router_stats["category_routed"] += int(category is not None)
+            self._router_stats["intent_routed"]   += int(intent is not None)
+        if category or intent:
+            logger.info("Semantic router: category=" + str(category) + " (" + str(round(route["category_score"], 3))
+                        + ") intent=" + str(intent) + " (" + str(round(route["intent_score"], 3)) + ")")
+            return query_intent.with_route(intent=intent, category=category)
+        return query_intent
+
+    def _collapse_views(self, docs: list) -> list:
+        """Keep only the first hit per multi-view record, preserving rank order."""
+        seen, result = set(), []
+        for doc in docs:
+            parent = doc.metadata.get("parent_id")
+            if parent:
+                if parent in seen:
+                    continue
+                seen.add(parent)
+            result.append(doc)
+        return result
+
     def _make_llm(self, max_tokens: int, model: str = "llama-3.1-8b-instant"):
         """
-        Create a Groq LLM with the specified model and token limit.
+        Get a Groq LLM with the specified model and token limit.
         Models:
           - llama-3.1-8b-instant  → fast, for simple/price/greeting queries
           - llama-3.3-70b-versatile → powerful, for lists/conservation/complex queries
+        Clients are cached per (model, max_tokens) and share one keep-alive
+        HTTP client per event loop, so requests skip the TCP/TLS handshake.
         """
-        return ChatGroq(
-            model=model,
-            temperature=0.3,
-            groq_api_key=self._api_key,
-            max_tokens=max_tokens,
-            max_retries=1,
-        )
+        if self._stub_llm is not None:
+            return self._stub_llm
+        self._shared_http_client()              # resets the cache if the loop changed
+        key = (model, max_tokens)
+        llm = self._llm_cache.get(key)
+        if llm is None:
+            from langchain_groq import ChatGroq
+            llm = ChatGroq(
+                model=model,
+                temperature=0.3,
+                groq_api_key=self._api_key,
+                max_tokens=max_tokens,
+                max_retries=1,
+                http_async_client=self._http_async,
+            )
+            self._llm_cache[key] = llm
+        return llm
 
-    def _make_retriever(self, k, filter_category: str = None):
+    def _shared_http_client(self):
         """
-        Build a retriever. If filter_category is given (e.g. "birds", "mammals"),
-        only chunks from that category are searched — much faster and more accurate.
+        The httpx.AsyncClient shared by all Groq calls on the running event loop.
+        Async connections cannot cross loops, so a new loop (or none) gets a
+        fresh client and an empty LLM cache.
         """
-        search_kwargs = {"k": k, "fetch_k": k * 4, "lambda_mult": 0.7}
-        if filter_category:
-            search_kwargs["filter"] = {"category": filter_category}
-        return self.vector_db.as_retriever(
-            search_type="mmr",
-            search_kwargs=search_kwargs,
-        )
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not self._llm_loop:
+            import httpx
+            self._llm_loop   = loop
+            self._llm_cache  = {}
+            self._http_async = httpx.AsyncClient(timeout=QUERY_TIMEOUT_SECS) if loop else None
+        return self._http_async
+
+    def _semantic_search(self, query: str, k: int, filter_category: str = None, query_vec=None) -> list:
+        """
+        MMR search on the in-memory vector engine. If filter_category is given
+        (e.g. "birds", "mammals"), only chunks from that category are searched.
+        Pass query_vec to reuse an embedding already computed for this query.
+        """
+        if query_vec is None:
+            query_vec = self._embed_query(query)
+        ids = self.vector_engine.mmr_search(
+            query_vec, k=k, fetch_k=k * MMR_FETCH_FACTOR, lambda_mult=MMR_LAMBDA,
+            filter_categories=[filter_category],
+        )[0]
+        return [self.vector_engine.docs[i] for i in ids]
+
+    def _embed_query(self, query: str) -> np.ndarray:
+        with timed_stage("embedding"):
+            return np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+
+    def _retrieve_with_broad(self, query: str, k: int, filter_category: str = None, with_broad: bool = False,
+                             query_vec=None):
+        """
+        Hybrid retrieval plus, for speculative modes, the unfiltered candidate
+        set the confidence guard would otherwise fetch after a failed answer.
+        Both share one query embedding. Returns (docs, broad_docs or None).
+        """
+        if query_vec is None:
+            query_vec = self._embed_query(query)
+        if not (with_broad and filter_category):
+            return self._hybrid_retrieve(query, k=k, filter_category=filter_category, query_vec=query_vec), None
+        docs      = self._hybrid_retrieve(query, k=k, filter_category=filter_category, query_vec=query_vec)
+        broad     = self._collapse_views(self._semantic_search(query, k=BROAD_K, query_vec=query_vec))
+        return docs, broad
+
+    @staticmethod
+    def _merge_broad(docs: list, broad: list, limit: int = SPECULATIVE_EXTRA_DOCS) -> list:
+        """Append up to `limit` unfiltered docs not already in docs (lowest priority for packing)."""
+        seen  = {d.page_content[:100] for d in docs}
+        extra = [d for d in broad if d.page_content[:100] not in seen][:limit]
+        return docs + extra
 
     def _build_bm25_index(self):
         """Build a BM25 keyword index over all indexed documents."""
@@ -285,45 +914,60 @@ class RAGService:
             logger.warning("rank-bm25 not installed — keyword search disabled. Run: pip install rank-bm25")
             return
         try:
-            # Fetch all docs from FAISS docstore
-            docstore = self.vector_db.docstore._dict
-            self._all_docs = [doc for doc in docstore.values()]
-            tokenized = [doc.page_content.lower().split() for doc in self._all_docs]
+            # Same documents, in index order, as the vector engine
+            self._all_docs = list(self.vector_engine.docs)
+            # Multi-view entries also match on their view phrasing
+            tokenized = [(doc.metadata.get("view", "") + " " + doc.page_content).lower().split()
+                         for doc in self._all_docs]
             self._bm25_index = BM25Okapi(tokenized)
             logger.info("BM25 index built over " + str(len(self._all_docs)) + " docs")
         except Exception as e:
             logger.warning("BM25 index build failed (non-critical): " + str(e))
+            return
+        if self._stopping.is_set():
+            raise StartupCancelled("shutdown before the BM25 worker processes started")
+        try:
+            self.retrieval_pool.start_bm25(tokenized)
+        except Exception as e:
+            logger.warning("BM25 worker processes failed to start — scoring in-process: " + str(e))
 
-    def _hybrid_retrieve(self, query: str, k: int, filter_category: str = None) -> list:
+    def _hybrid_retrieve(self, query: str, k: int, filter_category: str = None, query_vec=None) -> list:
         """
         Reciprocal Rank Fusion of FAISS (semantic) + BM25 (keyword) results.
         Falls back to FAISS-only if BM25 not available.
         """
+        use_bm25 = bool(self._bm25_index) and BM25_AVAILABLE
+        tokens   = query.lower().split()
+        # In process mode BM25 scores in a worker process while FAISS searches here
+        pending  = self.retrieval_pool.submit_bm25(tokens, k) if use_bm25 else None
+
         # ── FAISS semantic results ────────────────────────────────────────────
-        retriever   = self._make_retriever(k=k, filter_category=filter_category)
-        faiss_docs  = retriever.invoke(query)
+        with timed_stage("faiss"):
+            faiss_docs = self._collapse_views(self._semantic_search(query, k=k, filter_category=filter_category,
+                                                                    query_vec=query_vec))
 
-        if not self._bm25_index or not BM25_AVAILABLE:
+        if not use_bm25:
             return faiss_docs   # fallback: FAISS only
 
         # ── BM25 keyword results ──────────────────────────────────────────────
-        tokens      = query.lower().split()
-        bm25_scores = self._bm25_index.get_scores(tokens)
+        with timed_stage("bm25"):
+            ranked = self.retrieval_pool.bm25_result(pending, self._bm25_index, tokens, k)
 
         # Apply category filter to BM25 results
-        ranked_indices = sorted(range(len(bm25_scores)), key=lambda i: bm25_scores[i], reverse=True)
         bm25_docs = []
-        for idx in ranked_indices[:k]:
+        for idx, score in ranked:
             doc = self._all_docs[idx]
             if filter_category and doc.metadata.get("category") != filter_category:
                 continue
-            if bm25_scores[idx] > 0:
+            if score > 0:
                 bm25_docs.append(doc)
             if len(bm25_docs) >= k:
                 break
+        bm25_docs = self._collapse_views(bm25_docs)
 
         # ── Reciprocal Rank Fusion ────────────────────────────────────────────
         # Score each doc: sum of 1/(rank+60) from each list
+        t_fusion = time.perf_counter()
         rrf_scores: dict = {}
         all_candidates: dict = {}
 
@@ -340,31 +984,14 @@ class RAGService:
         # Sort by combined RRF score
         sorted_keys = sorted(rrf_scores, key=lambda k: rrf_scores[k], reverse=True)
         result      = [all_candidates[k] for k in sorted_keys[:k]]
+        observe_stage("fusion", t_fusion)
 
         logger.info("Hybrid retrieve: " + str(len(faiss_docs)) + " FAISS + "
                     + str(len(bm25_docs)) + " BM25 → " + str(len(result)) + " fused")
         return result
 
-    def _get_category_filter(self, message: str):
-        """Detect if the query is about a specific wildlife category."""
-        m = message.lower()
-        if any(w in m for w in ["bird", "birds", "avian", "feather", "beak", "nest", "flock"]):
-            return "birds"
-        if any(w in m for w in ["mammal", "tiger", "rhino", "elephant", "deer", "leopard", "bear"]):
-            return "mammals"
-        if any(w in m for w in ["reptile", "crocodile", "gharial", "snake", "lizard", "turtle"]):
-            return "reptiles"
-        if any(w in m for w in ["fish", "aquatic", "river fish", "mahseer"]):
-            return "fish"
-        if any(w in m for w in ["butterfly", "butterflies", "insect"]):
-            return "butterflies"
-        if any(w in m for w in ["amphibian", "frog", "toad"]):
-            return "amphibians"
-        if any(w in m for w in ["plant", "flora", "tree", "flower", "grass"]):
-            return "plants"
-        return None  # no filter — search everything
-
     def _prompt_convo(self):
+        from langchain_core.prompts import PromptTemplate
         return PromptTemplate(
             template=(
                 "You are a friendly, knowledgeable local guide at Chitwan National Park, Nepal.\n"
@@ -392,6 +1019,7 @@ class RAGService:
         )
 
     def _prompt_price(self):
+        from langchain_core.prompts import PromptTemplate
         price_table = (
             "VERIFIED ACTIVITY PRICES AND TIMINGS (use ONLY these — never invent other numbers or times):\n"
             "- Jeep Safari (also called Jungle Safari): Domestic NPR 500   | SAARC NPR 1,500  | Foreign Tourist NPR 3,500  | BOTH Morning 6-10AM AND Evening 2-5PM\n"
@@ -441,6 +1069,7 @@ class RAGService:
     )
 
     def _prompt_list(self):
+        from langchain_core.prompts import PromptTemplate
         return PromptTemplate(
             template=(
                 "You are a Chitwan National Park wildlife guide assistant.\n"
@@ -470,6 +1099,7 @@ class RAGService:
         )
 
     def _prompt_bare(self):
+        from langchain_core.prompts import PromptTemplate
         return PromptTemplate(
             template=(
                 "You are a Chitwan National Park wildlife guide assistant.\n"
@@ -494,7 +1124,25 @@ class RAGService:
             input_variables=["context", "chat_history", "question"],
         )
 
-    def query(self, message, response_type="normal", include_suggestions=True, use_emojis=True, session_id="default"):
+    async def aquery(self, message, response_type="normal", include_suggestions=True, use_emojis=True,
+                     session_id="default", deadline_ms=None, trace_id=None):
+        """
+        Async entry point for the API — runs on the server's event loop.
+        deadline_ms is the whole request's time budget (default REQUEST_DEADLINE_SECS).
+        trace_id names this request's trace (see new_trace_id()).
+        """
+        try:
+            return await self._async_query(message, response_type, include_suggestions, use_emojis, session_id,
+                                           Deadline.from_ms(deadline_ms), trace_id)
+        except AdmissionRejected as e:
+            CHAT_REJECTIONS.inc("overloaded")
+            return self._overloaded_response(e.retry_after)
+        except Exception as e:
+            logger.error("aquery() error: " + str(e), exc_info=True)
+            return self._error_response()
+
+    def query(self, message, response_type="normal", include_suggestions=True, use_emojis=True, session_id="default",
+              deadline_ms=None):
         try:
             loop = asyncio.get_event_loop()
             if loop.is_running():
@@ -502,234 +1150,681 @@ class RAGService:
                 with concurrent.futures.ThreadPoolExecutor() as pool:
                     future = pool.submit(
                         asyncio.run,
-                        self._async_query(message, response_type, include_suggestions, use_emojis, session_id),
+                        self._async_query(message, response_type, include_suggestions, use_emojis, session_id,
+                                          Deadline.from_ms(deadline_ms)),
                     )
                     return future.result()
             else:
                 return loop.run_until_complete(
-                    self._async_query(message, response_type, include_suggestions, use_emojis, session_id)
+                    self._async_query(message, response_type, include_suggestions, use_emojis, session_id,
+                                      Deadline.from_ms(deadline_ms))
                 )
         except Exception as e:
             logger.error("query() error: " + str(e), exc_info=True)
             return self._error_response()
 
-    async def _async_query(self, message, response_type, include_suggestions, use_emojis, session_id="default"):
-        if not self.retriever_convo:
-            return {"answer": "Service not ready.", "sources": [], "suggestions": [], "display_type": "text"}
+    async def _async_query(self, message, response_type, include_suggestions, use_emojis, session_id="default",
+                           deadline: Deadline = None, trace_id=None):
+        """Run the pipeline to completion and return the final response dict."""
+        result = None
+        async for event, data in self._pipeline(message, response_type, include_suggestions, use_emojis,
+                                                session_id, deadline, trace_id=trace_id):
+            if event == "done":
+                result = data
+        return result
 
-        message = message.strip()[:MAX_INPUT_CHARS]
-        if not message:
-            return {"answer": "Please ask me something!", "sources": [], "suggestions": [], "display_type": "text"}
+    async def query_events(self, message, session_id="default", include_suggestions=True, deadline_ms=None,
+                           trace_id=None):
+        """
+        Streaming entry point — the same pipeline as aquery(), as typed events:
+          ("meta", {...})  ("token", text)…  ("sources", [...])  ("suggestions", [...])  ("done", response)
+        Tokens are the answer as it is generated (cached and canned answers are
+        replayed in fast bursts); done carries the final cleaned response, which
+        replaces the streamed text if post-processing or a retry changed it.
+        An overloaded service answers with meta {"retry_after": seconds}.
+        """
+        try:
+            async for event in self._pipeline(message, "normal", include_suggestions, True, session_id,
+                                              Deadline.from_ms(deadline_ms), stream=True, trace_id=trace_id):
+                yield event
+        except AdmissionRejected as e:
+            CHAT_REJECTIONS.inc("overloaded")
+            for event in self._final_events(self._overloaded_response(e.retry_after), replay=True,
+                                            meta={"intent": None, "cached": False, "retry_after": e.retry_after}):
+                yield event
+        except Exception as e:
+            logger.error("query_events() error: " + str(e), exc_info=True)
+            for event in self._final_events(self._error_response(), replay=True):
+                yield event
+
+    def _final_events(self, result: dict, replay: bool = False, meta: dict = None):
+        """Closing events of a response; replay streams an already-complete answer as token bursts."""
+        if meta is not None:
+            yield "meta", meta
+        if replay:
+            words = result.get("answer", "").split(" ")
+            for i in range(0, len(words), REPLAY_WORDS_PER_TOKEN):
+                yield "token", " ".join(words[i:i + REPLAY_WORDS_PER_TOKEN]) + (
+                    " " if i + REPLAY_WORDS_PER_TOKEN < len(words) else "")
+        yield "sources", result.get("sources", [])
+        yield "suggestions", result.get("suggestions", [])
+        yield "done", result
+
+    async def _pipeline(self, message, response_type, include_suggestions, use_emojis, session_id="default",
+                        deadline: Deadline = None, stream: bool = False, prefetch_history: str = None,
+                        trace_id: str = None):
+        """
+        The whole query pipeline as an async generator of (event, data) — see
+        query_events(). With stream=False no tokens are emitted and only the
+        closing events matter (aquery() keeps the "done" payload).
+        User requests count as foreground load for the prefetcher and, once
+        answered, queue background answers for the chips they returned. Each
+        one is traced (stage spans + attributes) into self.traces, and
+        profiled when the profiler samples it or it turns out slow.
+        """
+        if prefetch_history is not None:
+            async for event in self._run_pipeline(message, response_type, include_suggestions, use_emojis,
+                                                  session_id, deadline, stream, prefetch_history):
+                yield event
+            return
 
-        if self._is_greeting(message):
-            return self._greeting_response(message)
+        result, meta = None, None
+        path    = "cancelled"               # consumer stopped before the answer was complete
+        t_start = time.perf_counter()
+        trace, token = (None, None) if self._warming_up else self.traces.start(new_trace_id(trace_id), message,
+                                                                                 session_id)
+        profile = None if self._warming_up else self.profiler.begin()
+        self.prefetcher.enter()
+        try:
+            async for event in self._run_pipeline(message, response_type, include_suggestions, use_emojis,
+                                                  session_id, deadline, stream):
+                if event[0] == "meta" and meta is None:
+                    meta = event[1]
+                elif event[0] == "done":
+                    result = event[1]
+                yield event
+            path = self._answer_path(meta)
+        except AdmissionRejected:
+            path = "rejected"
+            raise
+        finally:
+            self.prefetcher.exit()
+            elapsed = time.perf_counter() - t_start
+            if not self._warming_up:
+                REQUEST_SECONDS.observe(elapsed, path)
+                REQUESTS.inc((meta or {}).get("intent") or "none", path)
+            if self.profiler.end(profile, elapsed) and trace is not None:
+                trace.attrs["profiled"] = True
+            if trace is not None:
+                self.traces.finish(trace, token, path=path,
+                                   status=trace.attrs.get("status") or ("ok" if path not in ("rejected", "cancelled")
+                                                                        else path))
+        if result and self.prefetcher.enabled and not self._warming_up:
+            self._schedule_prefetch(session_id, result)
+
+    @staticmethod
+    def _answer_path(meta: dict) -> str:
+        meta = meta or {}
+        if meta.get("prefetched"):
+            return "prefetch"
+        if meta.get("cached"):
+            return "cache"
+        return "llm" if meta.get("model") else "canned"
+
+    new_trace_id = staticmethod(new_trace_id)
+
+    def recent_traces(self, order: str = "recent", limit: int = 20):
+        return self.traces.list(order, limit)
+
+    def get_trace(self, trace_id: str):
+        return self.traces.get(trace_id)
+
+    def profile_collapsed(self) -> str:
+        return self.profiler.collapsed()
+
+    def profile_functions(self, limit: int = 50):
+        return {"profiler": self.profiler.stats(), "functions": self.profiler.functions(limit)}
+
+    def configure_profiler(self, sample_rate: float = None, slow_ms: float = None, reset: bool = False):
+        self.profiler.configure(sample_rate, slow_ms, reset)
+        return self.profiler.stats()
+
+    def memory_report(self, tracemalloc_top: int = 0) -> dict:
+        """
+        Approximate bytes and sizes per component, plus process RSS. Objects
+        shared between components are counted once, under the first one
+        measured (the docstore's Documents are also the BM25 corpus). With
+        tracemalloc_top > 0, the top allocating lines and their growth since
+        the previous report are added (needs TRACEMALLOC_FRAMES at startup).
+        The walk takes a while on a large corpus: call it from a worker thread,
+        not the event loop.
+        """
+        seen     = set()
+        docstore = self.vector_db.docstore if self.vector_db else None
+        components = {
+            "sessions":        {"count": len(self._sessions), "bytes": footprint.deep_sizeof(self._sessions, seen=seen)},
+            "response_cache":  {"entries": self._cache.size, "max_size": self._cache.max_size,
+                                "bytes": footprint.deep_sizeof(self._cache._cache, seen=seen)},
+            "prefetch":        self.prefetcher.memory(seen),
+            "faiss_index":     {"vectors": self.vector_db.index.ntotal if self.vector_db else 0,
+                                "dimension": self.vector_db.index.d if self.vector_db else 0,
+                                "index_type": self._index_meta.get("index_type", DEFAULT_INDEX_TYPE),
+                                "bytes": self._index_bytes},
+            "vector_engine":   {"vectors": self.vector_engine.size if self.vector_engine else 0,
+                                "mode": self.vector_engine.mode if self.vector_engine else None,
+                                "bytes": self.vector_engine.nbytes if self.vector_engine else 0},
+            "docstore":        {"documents": len(getattr(docstore, "_dict", {})),
+                                "bytes": footprint.deep_sizeof(
+                                    getattr(docstore, "_dict", None),
+                                    self.vector_db.index_to_docstore_id if self.vector_db else None, seen=seen)},
+            "bm25":            {"documents": len(self._all_docs) if self._bm25_index else 0,
+                                "bytes": footprint.deep_sizeof(self._bm25_index, self._all_docs, seen=seen)},
+            "embedding_model": {"model": EMBEDDING_MODEL, "bytes": footprint.model_file_bytes(self.embeddings)},
+            "semantic_router": {"prototypes": self.router.size if self.router else 0,
+                                "bytes": self.router.matrix.nbytes if self.router else 0},
+        }
+        report = dict(footprint.process_memory(),
+                      components_bytes=sum(c["bytes"] or 0 for c in components.values()),
+                      components=components)
+        if tracemalloc_top > 0:
+            report["tracemalloc"] = footprint.tracemalloc_report(tracemalloc_top)
+        return report
+
+    @staticmethod
+    def count_rejection(reason: str):
+        CHAT_REJECTIONS.inc(reason)
+
+    def metrics_text(self) -> str:
+        """Prometheus exposition: the metrics registry plus live queue / breaker gauges."""
+        lanes  = self.admission.lanes
+        models = self.model_router.models
+        pool   = self.retrieval_pool.stats()
+        gauges = [
+            metrics.gauge("rag_admission_pending", "Requests admitted to an LLM lane and not yet finished.",
+                          ("model",), [((name,), lane.pending) for name, lane in lanes.items()]),
+            metrics.gauge("rag_admission_waiting", "Requests waiting for an LLM generation slot.",
+                          ("model",), [((name,), lane.waiting) for name, lane in lanes.items()]),
+            metrics.gauge("rag_model_circuit_open", "1 while the model's circuit breaker is not closed.",
+                          ("model",), [((name,), int(h.state != "closed")) for name, h in models.items()]),
+            metrics.gauge("rag_retrieval_queued", "Retrieval tasks waiting for a worker.", (),
+                          [((), pool["queued"])]),
+        ]
+        return metrics.REGISTRY.render() + "".join(gauges)
 
-        if self._is_activity_list(message):
-            return self._activity_list_response(message)
+    def _schedule_prefetch(self, session_id: str, result: dict):
+        chips = [chip.get("text", "") for chip in result.get("suggestions", []) if isinstance(chip, dict)]
+        chat_history = self._get_memory(session_id).load_memory_variables({}).get("chat_history", "")
+        self.prefetcher.schedule(session_id, chips, chat_history,
+                                 lambda message, history: self._prefetch_answer(session_id, message, history))
 
-        is_bare         = self._is_bare_list(message)
-        is_price        = (not is_bare) and self._is_price(message)
-        is_conservation = (not is_bare) and (not is_price) and self._is_conservation(message)
-        is_list         = (not is_bare) and (not is_price) and (not is_conservation) and self._is_list(message)
+    async def _prefetch_answer(self, session_id: str, message: str, chat_history: str):
+        """Answer a chip with the given history, leaving memory and the response cache untouched."""
+        result = None
+        try:
+            async for event, data in self._pipeline(message, "normal", False, True, session_id,
+                                                    Deadline(PREFETCH_DEADLINE_SECS), prefetch_history=chat_history):
+                if event == "done":
+                    result = data
+        except AdmissionRejected:
+            return None                        # user requests are filling the lane — not worth queueing for
+        # Only keep real retrieved answers — not errors, timeouts or what the cache already serves
+        if not result or not result.get("sources") or result["sources"] == ["response_cache"]:
+            return None
+        return result
+
+    async def _run_pipeline(self, message, response_type, include_suggestions, use_emojis, session_id="default",
+                            deadline: Deadline = None, stream: bool = False, prefetch_history: str = None):
+        prefetching = prefetch_history is not None
+        deadline = deadline or Deadline()
+        if not (self.ready or self._warming_up):
+            for event in self._final_events({"answer": "Service not ready.", "sources": [], "suggestions": [],
+                                             "display_type": "text"}, stream, {"intent": None}):
+                yield event
+            return
 
+        message = message.strip()[:MAX_INPUT_CHARS]
+        if not message:
+            for event in self._final_events({"answer": "Please ask me something!", "sources": [], "suggestions": [],
+                                             "display_type": "text"}, stream, {"intent": None}):
+                yield event
+            return
+
+        with timed_stage("classification"):
+            query_intent = classify(message)
+        intent       = query_intent.intent
+        language     = "ne" if query_intent.is_nepali else "en"
+        tracing.annotate(intent=intent, language=language)
+        if intent in ("greeting", "activity_list"):
+            result = (self._greeting_response(message) if intent == "greeting"
+                      else self._activity_list_response(message))
+            if not (self._warming_up or prefetching):
+                self.admission.count_fast(intent)
+            meta   = {"intent": intent, "language": language, "display_type": result.get("display_type", "text"),
+                      "model": None, "cached": False}
+            for event in self._final_events(result, stream, meta):
+                yield event
+            return
 
         # ── Response cache check ─────────────────────────────────────────────
-        cached_answer = self._cache.get(message)
+        cached_answer = None if self._warming_up else self._cache.get(message)
+        if not (self._warming_up or prefetching):
+            CACHE_REQUESTS.inc("response_cache", "hit" if cached_answer else "miss")
         if cached_answer:
             logger.info('Cache hit: ' + message[:50])
-            _is_ne = self._is_nepali(message)
-            _lang  = "ne" if _is_ne else "en"
-            try:
-                fresh_sugs = self._structure_suggestions(
-                    self.suggestion_engine.get_raw_suggestions(
-                        user_query=message, bot_response=cached_answer,
-                        language=_lang,
-                    )
-                )
-            except Exception:
-                fresh_sugs = self._default_suggestions(language=_lang)
-            return {
+            tracing.annotate(cache="response_cache")
+            if not prefetching:
+                self.admission.count_fast("response_cache")
+            result = {
                 'answer':       cached_answer,
                 'sources':      ['response_cache'],
-                'suggestions':  fresh_sugs,
+                'suggestions':  self._suggestions_for(message, cached_answer, session_id, language)
+                                if not prefetching else [],
                 'display_type': 'text',
                 'char_count':   len(cached_answer),
             }
+            meta = {"intent": intent, "language": language, "display_type": "text", "model": None, "cached": True}
+            for event in self._final_events(result, stream, meta):
+                yield event
+            return
+
+        memory       = self._get_memory(session_id)
+        chat_history = prefetch_history if prefetching else memory.load_memory_variables({}).get("chat_history", "")
+
+        # ── Prefetched answer for a tapped chip (same history as when it was computed) ──
+        prefetched = None if (prefetching or self._warming_up) else self.prefetcher.take(session_id, message,
+                                                                                          chat_history)
+        if self.prefetcher.enabled and not (prefetching or self._warming_up):
+            CACHE_REQUESTS.inc("prefetch", "hit" if prefetched else "miss")
+        if prefetched:
+            logger.info("Prefetch hit: " + message[:50])
+            tracing.annotate(cache="prefetch")
+            self.admission.count_fast("prefetch")
+            answer = prefetched["answer"]
+            memory.save_context({"question": message}, {"answer": answer})
+            self._cache.set(message, answer, display_type=prefetched.get("display_type", "text"))
+            result = dict(prefetched, suggestions=self._suggestions_for(message, answer, session_id, language)
+                          if include_suggestions else [])
+            meta = {"intent": intent, "language": language, "display_type": result.get("display_type", "text"),
+                    "model": None, "cached": True, "prefetched": True}
+            for event in self._final_events(result, stream, meta):
+                yield event
+            return
+
+        # ── Translate Nepali → English for FAISS retrieval ───────────────────
+        # The FAISS index is built on English docs; Nepali queries get poor results
+        # without translation. We translate for retrieval only — LLM still sees the
+        # original Nepali message and responds in Nepali.
+
+        retrieval_query = await self._get_retrieval_query(message, session_id, deadline, query_intent,
+                                                          background=prefetching)
+
+        # ── Semantic routing: embed once, the same vector is reused for retrieval ──
+        try:
+            query_vec = await asyncio.wait_for(
+                self.retrieval_pool.run(self._embed_query, retrieval_query),
+                timeout=deadline.timeout(QUERY_TIMEOUT_SECS),
+            )
+        except asyncio.TimeoutError:
+            logger.warning("Query timed out during embedding")
+            self._count_budget_exhausted("retrieval")
+            for event in self._final_events(self._timeout_response(), stream, {"intent": intent, "language": language}):
+                yield event
+            return
+        with timed_stage("semantic_routing"):
+            query_intent = self._route(query_intent, query_vec)
+        intent       = query_intent.intent
+
+        is_bare         = intent == "bare_list"
+        is_price        = intent == "price"
+        is_conservation = intent == "conservation"
+        is_list         = intent == "list"
 
         # Detect category for metadata filtering
-        category_filter = self._get_category_filter(message)
+        category_filter = query_intent.category
 
         if is_bare:
-            retriever    = self._make_retriever(k=10, filter_category=category_filter)
             prompt       = self._prompt_bare()
             display_type = "bare_list"
         elif is_price:
-            retriever    = self.retriever_price
             prompt       = self._prompt_price()
             display_type = "text"
         elif is_conservation:
-            retriever    = self._make_retriever(k=10, filter_category=category_filter)
             prompt       = self._prompt_list()
             display_type = "list"
         elif is_list:
-            retriever    = self._make_retriever(k=10, filter_category=category_filter)
             prompt       = self._prompt_list()
             display_type = "list"
         else:
-            retriever    = self._make_retriever(k=2, filter_category=category_filter)
             prompt       = self._prompt_convo()
             display_type = "text"
 
         logger.info("Type: " + display_type + " | conservation=" + str(is_conservation) + " | " + message[:60])
 
-        # ── Translate Nepali → English for FAISS retrieval ───────────────────
-        # The FAISS index is built on English docs; Nepali queries get poor results
-        # without translation. We translate for retrieval only — LLM still sees the
-        # original Nepali message and responds in Nepali.
-        memory       = self._get_memory(session_id)
-        chat_history = memory.load_memory_variables({}).get("chat_history", "")
-
-        retrieval_query = await self._get_retrieval_query(message, session_id)
-
         # ── Smart model routing ──────────────────────────────────────────────
-        is_nepali_query = self._is_nepali(message)
-        if is_list or is_bare or is_conservation:
-            llm = self._make_llm(max_tokens=400, model="llama-3.3-70b-versatile")
+        is_nepali_query = query_intent.is_nepali
+        is_list_like    = query_intent.is_list_like
+        char_limit      = MAX_LIST_RESPONSE_CHARS if is_list_like else MAX_RESPONSE_CHARS
+        max_items       = MAX_LIST_ITEMS if is_list_like else None
+        if is_list_like:
+            model, floor = "llama-3.3-70b-versatile", MAX_TOKENS_LIST
         elif is_price:
-            llm = self._make_llm(max_tokens=250, model="llama-3.1-8b-instant")
+            model, floor = "llama-3.1-8b-instant", MAX_TOKENS_PRICE
+        elif is_nepali_query:
+            # 70b handles Nepali grammar and vocabulary much more accurately
+            model, floor = "llama-3.3-70b-versatile", MAX_TOKENS_CONVO_NE
         else:
-            if is_nepali_query:
-                # 70b handles Nepali grammar and vocabulary much more accurately
-                llm = self._make_llm(max_tokens=300, model="llama-3.3-70b-versatile")
-            else:
-                llm = self._make_llm(max_tokens=150, model="llama-3.1-8b-instant")
+            model, floor = "llama-3.1-8b-instant", MAX_TOKENS_CONVO
+        max_tokens      = self._max_tokens_for(char_limit, is_nepali_query, floor)
+        # While the preferred model's circuit is open, the 8b model answers on a tighter time budget
+        model, degraded = (model, False) if self._warming_up else self.model_router.choose(model)
+        llm_timeout     = DEGRADED_TIMEOUT_SECS if degraded else QUERY_TIMEOUT_SECS
+        tracing.annotate(cache="miss", intent=intent, category=category_filter, model=model, degraded=degraded,
+                         max_tokens=max_tokens)
+        llm = self._make_llm(max_tokens=max_tokens, model=model)
+        # Place in the model's lane (raises AdmissionRejected when full); a
+        # generation slot is only held while generating, not during retrieval
+        ticket = None if self._warming_up else self.admission.admit(model, background=prefetching)
+        slot   = ticket.slot if ticket is not None else nullcontext
+
+        # Prepend explicit language instruction so LLM never gets confused by chat history
+        lang_prefix = "[RESPOND IN NEPALI]\n" if is_nepali_query else "[RESPOND IN ENGLISH]\n"
+
+        def fill(docs):
+            context, used, packed = self.context_packer.pack(docs, intent)
+            filled = prompt.format(context=context, chat_history=chat_history, question=lang_prefix + message)
+            self._log_prompt_tokens(filled, packed)
+            return filled, used
+
+        async def generate(filled, on_text=None):
+            async with slot():
+                t = time.perf_counter()
+                try:
+                    text = await self._generate(llm, filled, char_limit, max_items, max_tokens, on_text)
+                except Exception as e:
+                    if not self._warming_up:
+                        self.model_router.record(model, time.perf_counter() - t, False, error_kind(e))
+                        LLM_GENERATIONS.inc(model, error_kind(e))
+                    raise
+                observe_stage("llm", t)
+                if not self._warming_up:
+                    self.model_router.record(model, time.perf_counter() - t, True)
+                    LLM_GENERATIONS.inc(model, "ok")
+                return text
+
+        speculative = SPECULATIVE_RETRIEVAL if category_filter else "off"
+        if category_filter and not self._warming_up:
+            self._guard_stats["filtered_queries"] += 1
 
-        t_start = time.time()
         try:
-            # ── Hybrid retrieval (BM25 + FAISS fused) ────────────────────────
-            k_val       = 10 if (is_list or is_bare or is_conservation) else (6 if is_price else 3)
-            source_docs = await asyncio.wait_for(
-                asyncio.get_event_loop().run_in_executor(
-                    None, lambda: self._hybrid_retrieve(retrieval_query, k=k_val, filter_category=category_filter)
-                ),
-                timeout=QUERY_TIMEOUT_SECS,
-            )
-            context     = "\n\n".join(d.page_content for d in source_docs)
-            # Prepend explicit language instruction so LLM never gets confused by chat history
-            lang_prefix = "[RESPOND IN NEPALI]\n" if is_nepali_query else "[RESPOND IN ENGLISH]\n"
-            filled      = prompt.format(context=context, chat_history=chat_history,
-                                        question=lang_prefix + message)
-            llm_resp    = await asyncio.wait_for(llm.ainvoke(filled), timeout=QUERY_TIMEOUT_SECS)
-            raw_answer  = llm_resp.content if hasattr(llm_resp, "content") else str(llm_resp)
-        except asyncio.TimeoutError:
-            logger.warning("Query timed out")
-            return {"answer": "Connection timed out. Please try again.", "sources": [],
-                    "suggestions": self._default_suggestions(), "display_type": "text"}
-        except Exception as e:
-            logger.error("LLM invoke failed: " + str(e), exc_info=True)
-            return self._error_response()
-
-        logger.info("LLM responded in " + str(round(time.time() - t_start, 2)) + "s")
+            yield "meta", {"intent": intent, "language": language, "display_type": display_type,
+                           "category": category_filter, "model": model, "degraded": degraded, "cached": False}
+            streamed = False
 
-        # ── Confidence guard: retry with broader retrieval if LLM is uncertain ──
-        if self._is_uncertain(raw_answer) and category_filter:
-            logger.warning("Low confidence detected — retrying without category filter")
+            t_start = time.time()
+            stage   = "retrieval"
             try:
-                broad_retriever = self._make_retriever(k=8, filter_category=None)
-                source_docs     = await asyncio.wait_for(
-                    broad_retriever.ainvoke(retrieval_query), timeout=QUERY_TIMEOUT_SECS
+                # ── Hybrid retrieval (BM25 + FAISS fused) ────────────────────────
+                k_val       = 10 if (is_list or is_bare or is_conservation) else (6 if is_price else 3)
+                source_docs, broad_docs = await asyncio.wait_for(
+                    self.retrieval_pool.run(
+                        lambda: self._retrieve_with_broad(retrieval_query, k=k_val, filter_category=category_filter,
+                                                          with_broad=speculative != "off", query_vec=query_vec)
+                    ),
+                    timeout=deadline.timeout(QUERY_TIMEOUT_SECS),
                 )
-                context  = "\n\n".join(d.page_content for d in source_docs)
-                filled   = prompt.format(context=context, chat_history=chat_history,
-                                         question=lang_prefix + message)
-                llm_resp = await asyncio.wait_for(llm.ainvoke(filled), timeout=QUERY_TIMEOUT_SECS)
-                raw_answer = llm_resp.content if hasattr(llm_resp, "content") else str(llm_resp)
-                logger.info("Retry succeeded")
+                if speculative == "merge":
+                    source_docs = self._merge_broad(source_docs, broad_docs)
+                filled, source_docs = fill(source_docs)
+                stage = "llm"
+                t_llm = time.perf_counter()
+                if speculative == "hedge":
+                    # Two generations race — nothing is streamed until one has won
+                    raw_answer, source_docs = await asyncio.wait_for(
+                        self._hedged_generate(generate, filled, source_docs, fill, broad_docs, deadline),
+                        timeout=deadline.timeout(llm_timeout),
+                    )
+                elif stream:
+                    tokens = asyncio.Queue()
+                    task   = asyncio.ensure_future(asyncio.wait_for(generate(filled, tokens.put_nowait),
+                                                                    timeout=deadline.timeout(llm_timeout)))
+                    try:
+                        while not (task.done() and tokens.empty()):
+                            if tokens.empty():
+                                getter = asyncio.ensure_future(tokens.get())
+                                await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+                                if not getter.done():
+                                    getter.cancel()
+                                    continue
+                                text = getter.result()
+                            else:
+                                text = tokens.get_nowait()
+                            streamed = True
+                            yield "token", text
+                    finally:
+                        task.cancel()
+                    raw_answer = task.result()
+                else:
+                    raw_answer = await asyncio.wait_for(generate(filled), timeout=deadline.timeout(llm_timeout))
+            except asyncio.TimeoutError:
+                logger.warning("Query timed out during " + stage + " (" + str(round(deadline.budget_secs, 1))
+                               + "s request budget)")
+                self._count_budget_exhausted(stage)
+                tracing.annotate(status="timeout", failed_stage=stage)
+                if stage == "llm" and not self._warming_up:
+                    self.model_router.record(model, time.perf_counter() - t_llm, False, "timeout")
+                    LLM_GENERATIONS.inc(model, "timeout")
+                for event in self._final_events(self._timeout_response(), stream and not streamed):
+                    yield event
+                return
             except Exception as e:
-                logger.warning("Retry failed: " + str(e))
-
-        if is_bare:
-            answer = self._clean_bare_list(raw_answer)
-        elif is_list:
-            answer = self._enforce_list_limit(raw_answer.strip())
-        else:
-            answer = self._clean_convo(raw_answer)
-
-        # ── Hallucination guard: warn in logs if invented species detected ──────
-        if (is_list or is_bare or is_conservation) and self._check_hallucination(answer):
-            logger.warning("Hallucination detected in answer — consider reviewing source data")
-            # Don't block the answer but log it for monitoring
-
-        char_limit = MAX_LIST_RESPONSE_CHARS if (is_list or is_bare or is_conservation) else MAX_RESPONSE_CHARS
-        if len(answer) > char_limit:
-            answer = answer[:char_limit].rsplit("\n", 1)[0]  # cut at last complete bullet
-
-        memory.save_context({"question": message}, {"answer": answer})
-        self._cache.set(message, answer, display_type=display_type)
-
-        sources = list({doc.metadata.get("source", "Knowledge Base") for doc in source_docs})
+                logger.error("LLM invoke failed: " + str(e), exc_info=True)
+                tracing.annotate(status="error", failed_stage=stage, error=str(e)[:200])
+                for event in self._final_events(self._error_response(), stream and not streamed):
+                    yield event
+                return
+
+            logger.info("LLM responded in " + str(round(time.time() - t_start, 2)) + "s")
+
+            # ── Confidence guard: retry with broader retrieval if LLM is uncertain ──
+            # Speculative modes already had the unfiltered docs (merge) or raced them (hedge).
+            if self._is_uncertain(raw_answer) and category_filter:
+                if not self._warming_up:
+                    self._guard_stats["uncertain"] += 1
+                if speculative == "off" and self._budget_allows(deadline, "retry"):
+                    logger.warning("Low confidence detected — retrying without category filter")
+                    t_retry = time.perf_counter()
+                    try:
+                        source_docs = await asyncio.wait_for(
+                            self.retrieval_pool.run(
+                                lambda: self._collapse_views(self._semantic_search(retrieval_query, k=BROAD_K))
+                            ),
+                            timeout=deadline.timeout(QUERY_TIMEOUT_SECS),
+                        )
+                        filled, source_docs = fill(source_docs)
+                        raw_answer = await asyncio.wait_for(generate(filled), timeout=deadline.timeout(llm_timeout))
+                        logger.info("Retry succeeded")
+                    except asyncio.TimeoutError:
+                        logger.warning("Retry ran out of request budget — keeping first answer")
+                        self._count_budget_exhausted("retry")
+                    except Exception as e:
+                        logger.warning("Retry failed: " + str(e))
+                    self._record_retry(time.perf_counter() - t_retry)
+                    observe_stage("retry", t_retry)
+                    tracing.annotate(retried=True)
+
+            t_post = time.perf_counter()
+            if is_bare:
+                answer = self._clean_bare_list(raw_answer)
+            elif is_list:
+                answer = self._enforce_list_limit(raw_answer.strip())
+            else:
+                answer = self._clean_convo(raw_answer)
+
+            # ── Hallucination guard: warn in logs if invented species detected ──────
+            if (is_list or is_bare or is_conservation) and self._check_hallucination(answer):
+                logger.warning("Hallucination detected in answer — consider reviewing source data")
+                # Don't block the answer but log it for monitoring
+
+            if len(answer) > char_limit:
+                answer = answer[:char_limit].rsplit("\n", 1)[0]  # cut at last complete bullet
+            observe_stage("postprocess", t_post)
+
+            if not prefetching:
+                memory.save_context({"question": message}, {"answer": answer})
+            if not (self._warming_up or prefetching):
+                self._cache.set(message, answer, display_type=display_type)
+
+            sources = list({doc.metadata.get("source", "Knowledge Base") for doc in source_docs})
+
+            suggestions = []
+            if include_suggestions and not self._budget_allows(deadline, "suggestions"):
+                suggestions = self._default_suggestions(language=language)
+            elif include_suggestions:
+                suggestions = self._suggestions_for(message, answer, session_id, language, match_query=retrieval_query,
+                                                    top_doc=source_docs[0] if source_docs else None)
+
+            result = {"answer": answer, "sources": sources, "suggestions": suggestions,
+                      "display_type": display_type, "char_count": len(answer)}
+            if tracing.current() is not None:
+                tracing.annotate(answer_tokens=self.context_packer.count(answer), answer_chars=len(answer))
+            for event in self._final_events(result, stream and not streamed):
+                yield event
+        finally:
+            if ticket is not None:
+                ticket.close()
+
+    @staticmethod
+    def _max_tokens_for(char_limit: int, nepali: bool, floor: int = 0) -> int:
+        chars_per_token = CHARS_PER_TOKEN_NE if nepali else CHARS_PER_TOKEN_EN
+        return max(floor, int(char_limit / chars_per_token * MAX_TOKENS_HEADROOM))
+
+    async def _generate(self, llm, prompt: str, char_limit: int, max_items: int = None,
+                        max_tokens: int = None, on_text=None) -> str:
+        """
+        Stream the completion and stop as soon as the answer reaches its char
+        or bullet limit at a clean boundary — closing the stream cancels the
+        rest of the generation instead of paying for text that gets truncated.
+        on_text, if given, receives each new piece of text up to the stop point.
+        """
+        text, cut = "", None
+        t_start   = time.perf_counter()
+        stream = llm.astream(prompt)
+        try:
+            async for chunk in stream:
+                if not text:
+                    observe_stage("llm_ttft", t_start)
+                sent  = len(text)
+                text += chunk.content if hasattr(chunk, "content") else str(chunk)
+                cut   = _stop_point(text, char_limit, max_items)
+                if on_text is not None and (cut if cut is not None else len(text)) > sent:
+                    on_text(text[sent:cut])
+                if cut is not None:
+                    break
+        finally:
+            await stream.aclose()
+
+        if self._warming_up:
+            return text[:cut] if cut is not None else text
+        self._gen_stats["requests"] += 1
+        if cut is not None:
+            saved = max(0, (max_tokens or 0) - self.context_packer.count(text))
+            self._gen_stats["stopped_early"] += 1
+            self._gen_stats["tokens_saved"]  += saved
+            logger.info("Stopped generation at " + str(cut) + " chars — up to ~" + str(saved)
+                        + " of " + str(max_tokens) + " max tokens saved")
+            return text[:cut]
+        return text
 
-        suggestions = []
-        if include_suggestions:
+    async def _hedged_generate(self, generate, filled: str, docs: list, fill, broad_docs: list,
+                               deadline: Deadline = None):
+        """
+        Run the filtered LLM call; if it hasn't answered within HEDGE_DELAY_SECS,
+        launch the unfiltered (broad) call alongside it. The first confident
+        answer wins and the other call is cancelled. A filtered answer that comes
+        back fast but uncertain falls through to the broad call as a retry.
+        Returns (raw_answer, docs used for that answer).
+        """
+        primary = asyncio.ensure_future(generate(filled))
+        done, _ = await asyncio.wait({primary}, timeout=HEDGE_DELAY_SECS)
+        if done and not self._is_uncertain(primary.result()):
+            return primary.result(), docs
+        if done and deadline is not None and not self._budget_allows(deadline, "retry"):
+            return primary.result(), docs
+
+        broad_filled, broad_used = fill(broad_docs)
+        t_hedge = time.perf_counter()
+        hedge   = asyncio.ensure_future(generate(broad_filled))
+        if done:
+            logger.warning("Low confidence detected — retrying without category filter")
             try:
-                suggestions = self._structure_suggestions(
-                    self.suggestion_engine.get_raw_suggestions(
-                        user_query=message,
-                        bot_response=answer,
-                        match_query=retrieval_query,
-                        language="ne" if is_nepali_query else "en",
-                    )
-                )
-            except Exception:
-                suggestions = self._default_suggestions(language="ne" if is_nepali_query else "en")
-
-        return {"answer": answer, "sources": sources, "suggestions": suggestions,
-                "display_type": display_type, "char_count": len(answer)}
+                return await hedge, broad_used
+            except Exception as e:
+                logger.warning("Retry failed: " + str(e))
+                return primary.result(), docs
+            finally:
+                self._record_retry(time.perf_counter() - t_hedge)
+
+        if not self._warming_up:
+            self._guard_stats["hedges"] += 1
+        logger.info("Filtered call slower than " + str(HEDGE_DELAY_SECS) + "s — hedging with unfiltered context")
+        pending = {primary, hedge}
+        try:
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    if task.exception() is None and not self._is_uncertain(task.result()):
+                        if task is hedge and not self._warming_up:
+                            self._guard_stats["hedge_wins"] += 1
+                        return task.result(), (broad_used if task is hedge else docs)
+            # Both answered uncertainly (or failed) — prefer the filtered answer
+            if primary.exception() is None:
+                return primary.result(), docs
+            return hedge.result(), broad_used
+        finally:
+            for task in (primary, hedge):
+                task.cancel()
+
+    def _budget_allows(self, deadline: Deadline, stage: str) -> bool:
+        """Whether an optional stage fits in the remaining budget; counts it when skipped."""
+        if deadline.allows(stage):
+            return True
+        logger.info("Skipping " + stage + " — " + str(round(deadline.remaining(), 2)) + "s of request budget left")
+        self._count_budget_exhausted(stage)
+        return False
 
-    async def query_stream(self, message, session_id="default"):
-        message = message.strip()[:MAX_INPUT_CHARS]
-        if not message:
-            yield "Please ask me something!"
-            return
-        if self._is_greeting(message):
-            yield self._greeting_response(message)["answer"]
-            return
+    def _count_budget_exhausted(self, stage: str) -> None:
+        if not self._warming_up:
+            self._budget_exhausted[stage] = self._budget_exhausted.get(stage, 0) + 1
 
-        if self._is_activity_list(message):
-            yield self._activity_list_response(message)["answer"]
+    def _record_retry(self, secs: float) -> None:
+        if self._warming_up:
             return
+        self._guard_stats["retries"]    += 1
+        self._guard_stats["retry_secs"] += secs
+        logger.info("Confidence-guard retry cost " + str(round(secs, 2)) + "s")
 
-        is_bare         = self._is_bare_list(message)
-        is_price        = (not is_bare) and self._is_price(message)
-        is_conservation = (not is_bare) and (not is_price) and self._is_conservation(message)
-        is_list         = (not is_bare) and (not is_price) and (not is_conservation) and self._is_list(message)
-
-        if is_bare:
-            retriever = self.retriever_bare;  prompt = self._prompt_bare()
-        elif is_price:
-            retriever = self.retriever_price; prompt = self._prompt_price()
-        elif is_conservation or is_list:
-            retriever = self.retriever_list;  prompt = self._prompt_list()
-        else:
-            retriever = self.retriever_convo; prompt = self._prompt_convo()
+    def _guard_report(self) -> dict:
+        g        = self._guard_stats
+        filtered = max(g["filtered_queries"], 1)
+        return {
+            "mode":             SPECULATIVE_RETRIEVAL,
+            "filtered_queries": g["filtered_queries"],
+            "uncertain_rate":   round(g["uncertain"] / filtered, 3),
+            "retry_rate":       round(g["retries"] / filtered, 3),
+            "avg_retry_ms":     round(g["retry_secs"] / max(g["retries"], 1) * 1000, 1),
+            "total_retry_secs": round(g["retry_secs"], 2),
+            "hedges":           g["hedges"],
+            "hedge_wins":       g["hedge_wins"],
+        }
 
-        try:
-            # Translate Nepali query to English for better FAISS retrieval
-            retrieval_query  = await self._get_retrieval_query(message, session_id)
-            is_nepali_query  = self._is_nepali(message)
-            lang_prefix      = "[RESPOND IN NEPALI]\n" if is_nepali_query else "[RESPOND IN ENGLISH]\n"
-            source_docs      = retriever.invoke(retrieval_query)
-            context          = "\n\n".join(d.page_content for d in source_docs)
-            memory           = self._get_memory(session_id)
-            chat_history     = memory.load_memory_variables({}).get("chat_history", "")
-            filled           = prompt.format(context=context, chat_history=chat_history,
-                                             question=lang_prefix + message)
-            async for chunk in self.llm.astream(filled):
-                if chunk.content:
-                    yield chunk.content
-        except Exception as e:
-            logger.error("Streaming error: " + str(e))
-            yield "Sorry, something went wrong. Please try again."
+    def _log_prompt_tokens(self, filled: str, packed: dict) -> None:
+        if self._warming_up:
+            return
+        tokens = self.context_packer.record(filled, packed)
+        tracing.annotate(prompt_tokens=tokens, docs_used=packed["docs_used"])
+        logger.info("Prompt tokens: " + str(tokens) + " (context " + str(packed["context_tokens"])
+                    + "/" + str(packed["budget"]) + ", docs " + str(packed["docs_used"]) + "/"
+                    + str(packed["docs_in"]) + ", trimmed " + str(packed["trimmed"]) + ")")
 
     # ── Confidence Guard ─────────────────────────────────────────────────────
 
@@ -753,45 +1848,38 @@ class RAGService:
         Returns True if the answer contains a species name NOT in our data.
         Only runs for list/conservation responses where hallucination risk is high.
         """
-        if not KNOWN_SPECIES:
+        if not self.species_lexicon:
             return False   # guard not ready yet
 
+        if not self._warming_up:
+            self._hallucination_stats["checks"] += 1
         # Extract capitalized multi-word phrases (likely species names)
-        candidates = re.findall(r"[A-Z][a-z]+(?: [A-Z][a-z]+)+", answer)
-        for candidate in candidates:
-            c_lower = candidate.lower()
-            # Check if ANY known species name contains this candidate
-            matched = any(c_lower in known or known in c_lower for known in KNOWN_SPECIES)
-            if not matched and len(candidate.split()) >= 2:
+        for candidate in _SPECIES_CANDIDATE.findall(answer):
+            # Known if it is part of, or contains, a known species name
+            if not self.species_lexicon.is_known(candidate.lower()):
                 logger.warning("Possible hallucination detected: " + candidate)
+                if not self._warming_up:
+                    self._hallucination_stats["flagged"] += 1
                 return True
         return False
 
     def _is_nepali(self, text: str) -> bool:
         """Return True if the message contains Nepali (Devanagari) characters."""
-        return any('\u0900' <= c <= '\u097F' for c in text)
-
-    def _is_followup_query(self, message: str) -> bool:
-        """Detect vague follow-up queries that rely on conversation context."""
-        followup_triggers = [
-            "describe it", "tell me more", "more about it", "what about it",
-            "explain it", "elaborate", "more details", "describe that",
-            "tell me about it", "what is it", "what's it", "and it",
-        ]
-        m = message.strip().lower()
-        # Short messages with pronouns are almost always follow-ups
-        if len(m.split()) <= 3 and any(w in m.split() for w in ["it", "that", "this", "them", "they", "those"]):
-            return True
-        return any(t in m for t in followup_triggers)
+        return is_nepali(text)
 
-    async def _get_retrieval_query(self, message: str, session_id: str = "default") -> str:
+    async def _get_retrieval_query(self, message: str, session_id: str = "default",
+                                   deadline: Deadline = None, query_intent: QueryIntent = None,
+                                   background: bool = False) -> str:
         """Build an effective FAISS retrieval query from the message.
         - For follow-up pronoun queries ('describe it'), anchors to the last user question.
-        - For Nepali queries, translates to English (FAISS index is English-only).
+        - For Nepali queries, translates to English (FAISS index is English-only),
+          unless the request deadline leaves too little time for it.
+          background (prefetch) translations use the background 8b lane.
         - Otherwise returns the message unchanged.
         """
         # ── Follow-up resolution: "describe it" → "describe Bengal Tiger" ─────
-        if self._is_followup_query(message):
+        query_intent = query_intent or classify(message)
+        if query_intent.is_followup:
             memory = self._get_memory(session_id)
             msgs = memory.messages
             # Find the last human message that isn't this follow-up
@@ -807,39 +1895,32 @@ class RAGService:
         # ── Nepali translation ─────────────────────────────────────────────────
         if not self._is_nepali(message):
             return message
+        if deadline is not None and not self._budget_allows(deadline, "translation"):
+            return message
+        try:
+            ticket = None if self._warming_up else self.admission.admit("llama-3.1-8b-instant",
+                                                                          background=background)
+        except AdmissionRejected:
+            return message  # 8b lane is full: retrieve with the original rather than queue
         try:
             llm = self._make_llm(max_tokens=80, model="llama-3.1-8b-instant")
             filled = f"Translate to English. Output ONLY the English translation, nothing else:\n{message}"
-            resp = await asyncio.wait_for(llm.ainvoke(filled), timeout=6.0)
+            timeout = deadline.timeout(6.0) if deadline is not None else 6.0
+            async with (ticket.slot() if ticket is not None else nullcontext()):
+                with timed_stage("translation"):
+                    resp = await asyncio.wait_for(llm.ainvoke(filled), timeout=timeout)
             translated = (resp.content if hasattr(resp, "content") else str(resp)).strip()
             logger.info("Nepali→English: " + message[:40] + " → " + translated[:60])
             return translated
+        except asyncio.TimeoutError:
+            if deadline is not None:
+                self._count_budget_exhausted("translation")
+            return message
         except Exception:
             return message  # fallback: use original
-
-    def _is_greeting(self, message):
-        single_word = {"hello", "hi", "hey", "namaste", "howdy", "greetings", "yo"}
-        multi_word  = {"good morning", "good evening", "good afternoon"}
-        # Nepali greetings (Devanagari)
-        nepali_greetings = {"नमस्ते", "नमस्कार", "सुप्रभात", "नमस्"}
-        msg   = message.strip().lower()
-        words = msg.split()
-        if len(words) > 4:
-            return False
-        if bool(single_word.intersection(words)) or any(p in msg for p in multi_word):
-            return True
-        # Check Nepali greetings by word match
-        return any(g in message for g in nepali_greetings)
-
-    def _is_activity_list(self, message):
-        """Detect questions asking to list available activities at CNP."""
-        triggers_en = ["what activities", "list activities", "what can i do", "available activities",
-                       "what to do", "things to do", "activities available", "all activities",
-                       "what are the activities", "what activities are there"]
-        triggers_ne = ["गतिविधिहरू छन्", "गतिविधि छन्", "के-के गतिविधि", "कुन-कुन गतिविधि",
-                       "कुन कुन गतिविधि", "के गर्न सकिन्छ", "गतिविधिहरू"]
-        m = message.lower()
-        return any(t in m for t in triggers_en) or any(t in message for t in triggers_ne)
+        finally:
+            if ticket is not None:
+                ticket.close()
 
     def _activity_list_response(self, message):
         """Return pre-built accurate activity list — no LLM, no hallucination."""
@@ -873,58 +1954,6 @@ class RAGService:
             "char_count": len(answer),
         }
 
-    def _is_price(self, message):
-        triggers = ["how much", "cost", "price", "fee", "ticket", "entry fee",
-                    "rate", "charge", "tariff", "npr", "rupee", "rupees",
-                    # timing triggers — use the same hardcoded table so no hallucination
-                    "when does", "when do", "what time", "timing", "schedule",
-                    "opening time", "closing time", "start time", "open at", "close at",
-                    "what are the timings", "what are the hours"]
-        nepali_triggers = ["कति", "शुल्क", "मूल्य", "टिकट", "पैसा", "रुपैयाँ",
-                           # Nepali timing triggers
-                           "कहिले", "कति बजे", "समय", "सुरु हुन्छ", "बन्द हुन्छ",
-                           "कार्यक्रम समय", "खुल्ने", "बन्द हुने"]
-        msg = message.lower()
-        return any(t in msg for t in triggers) or any(t in message for t in nepali_triggers)
-
-    def _is_conservation(self, message):
-        """Detect endangered/threatened/conservation LIST questions — needs high k retrieval.
-        Skips if it is a where/when/how/why/which/is/what is question — those stay conversational."""
-        import re
-        m = message.lower().strip()
-        # Location, time, method, explanation questions are always conversational
-        if re.match(r"^(where|when|how|why|is |are |what is|what's|which|who|can i|should i)", m):
-            return False
-        triggers = [
-            "endangered", "threatened", "vulnerable", "critically",
-            "conservation", "extinction", "extinct",
-            "at risk", "dying out", "nearly extinct", "conservation status",
-            "need protection", "needs protection", "protect",
-        ]
-        nepali_triggers = ["लोपोन्मुख", "संकटापन्न", "संरक्षण", "विलुप्त", "खतरामा"]
-        return any(t in m for t in triggers) or any(t in message for t in nepali_triggers)
-
-    def _is_list(self, message):
-        triggers = ["list", "name all", "name some", "tell me all", "give me all", "show all",
-                    "enumerate", "what types", "what kind", "what species", "examples of",
-                    "types of", "kinds of", "all the", "all animals", "all birds", "all mammals",
-                    "mention", "can you list", "could you list", "top 5", "top 10",
-                    "top five", "top ten", "top three", "top 3", "what are the", "what are some"]
-        nepali_triggers = ["सूची", "नाम बताउ", "सबै बताउ", "कुन-कुन", "कुन कुन",
-                           "प्रजातिहरू", "जनावरहरू", "चराहरू", "सबै जनावर",
-                           "चराहरू छन्", "जनावरहरू छन्"]
-        m = message.lower()
-        # These question starters always want a conversational answer, not a list
-        if re.match(r"^(which|what is|what's|how does|how do|why|who|when is|when|where|how much|how many|is |are |can i|should i)", m):
-            return False
-        return any(t in m for t in triggers) or any(t in message for t in nepali_triggers)
-
-    def _is_bare_list(self, message):
-        triggers = ["no explanation", "only list", "just list", "just names", "names only",
-                    "no description", "without description", "only names", "bare list",
-                    "list only", "just the names", "no details"]
-        return any(t in message.lower() for t in triggers)
-
     def _clean_convo(self, text):
         text = re.sub(r"^\s*[-*]\s+", "", text, flags=re.MULTILINE)
         text = re.sub(r"^\s*\d+\.\s+", "", text, flags=re.MULTILINE)
@@ -957,6 +1986,41 @@ class RAGService:
             return "\n".join(other_lines + bullet_lines[:MAX_LIST_ITEMS])
         return text
 
+    def _suggestions_for(self, message: str, answer: str, session_id: str, language: str,
+                         match_query: str = None, top_doc=None):
+        """Chips for an answer: suggestion graph first, keyword pools as fallback, defaults on error."""
+        t = time.perf_counter()
+        try:
+            return self._structure_suggestions(
+                self.suggestion_engine.get_raw_suggestions(
+                    user_query=message,
+                    bot_response=answer,
+                    match_query=match_query,
+                    language=language,
+                    session_id=session_id,
+                    pool=self._graph_suggestions(message, top_doc, language),
+                )
+            )
+        except Exception:
+            return self._default_suggestions(language=language)
+        finally:
+            observe_stage("suggestions", t)
+
+    def starter_suggestions(self, session_id: str = "default", language: str = "en"):
+        """Opening chips for a new conversation, rotated per session."""
+        return self._structure_suggestions(
+            self.suggestion_engine.get_raw_suggestions("", "", language=language, session_id=session_id)
+        )
+
+    def _graph_suggestions(self, message: str, top_doc, language: str):
+        """Precomputed follow-ups for the answered question or top document; None → keyword matching."""
+        pool, kind = (None, None)
+        if self.suggestion_graph is not None:
+            pool, kind = self.suggestion_graph.lookup(message, top_doc, language)
+        if not self._warming_up:
+            self._suggestion_hits[kind or "keyword"] += 1
+        return pool
+
     def _structure_suggestions(self, raw):
         icon_map = {"tiger": "🐯", "rhino": "🦏", "elephant": "🐘", "bird": "🦜",
                     "safari": "🗺️", "visit": "🕐", "photo": "📷", "snake": "🐍",
@@ -1022,11 +2086,24 @@ class RAGService:
             "display_type": "text", "char_count": 0,
         }
 
+    def _timeout_response(self):
+        return {"answer": "Connection timed out. Please try again.", "sources": [],
+                "suggestions": self._default_suggestions(), "display_type": "text"}
+
     def _error_response(self):
         return {"answer": "Something went wrong. Please try again.",
                 "sources": [], "suggestions": self._default_suggestions(), "display_type": "text"}
 
+    def _overloaded_response(self, retry_after: int):
+        return {"answer": "I'm answering a lot of questions right now. Please try again in "
+                          + str(retry_after) + " seconds. 🙏",
+                "sources": [], "suggestions": self._default_suggestions(), "display_type": "text",
+                "retry_after": retry_after}
+
     def _load_all_documents(self, wildlife_dir, raw_data_dir):
+        from langchain_core.documents import Document
+        from langchain_community.document_loaders import TextLoader, DirectoryLoader
+
         documents = []
 
         if wildlife_dir.exists():
@@ -1041,11 +2118,7 @@ class RAGService:
                             metadata={"source": json_file.name, "category": json_file.stem, "type": "wildlife"},
                         ))
                         # Register all known species names for hallucination guard
-                        for key in ("commonEnglishName", "english_name", "name", "title",
-                                    "nepaliName", "nepali_name", "scientificName", "scientific_name"):
-                            val = species.get(key)
-                            if val:
-                                KNOWN_SPECIES.add(val.lower().strip())
+                        self._species_names.update(species_names(species))
                     logger.info("  Loaded " + json_file.name)
                 except Exception as e:
                     logger.warning("  Skipping " + json_file.name + ": " + str(e))
@@ -1065,10 +2138,7 @@ class RAGService:
                 try:
                     with open(activity_file, "r", encoding="utf-8-sig") as f:
                         data = json.load(f)
-                    documents.append(Document(
-                        page_content=self._format_activities(data),
-                        metadata={"source": "activities.json", "type": "activities"},
-                    ))
+                    documents.extend(self._format_activities(data))
                     logger.info("Loaded activities.json")
                 except Exception as e:
                     logger.warning("Error loading activities.json: " + str(e))
@@ -1121,8 +2191,16 @@ class RAGService:
         return ". ".join(parts) + "."
 
     def _format_activities(self, data):
+        """
+        One compact canonical Document per activity.
+        The price/fee phrasings visitors use are attached as embedding views
+        (metadata["views"]) instead of being repeated in the text, so retrieval
+        matches any of them but the prompt only ever sees the short record.
+        """
+        from langchain_core.documents import Document
+
         activities = data if isinstance(data, list) else data.get("activities", [data])
-        lines = []
+        documents  = []
         for activity in activities:
             if not isinstance(activity, dict): continue
             name     = activity.get("activity", activity.get("name", "Activity"))
@@ -1137,16 +2215,31 @@ class RAGService:
             if pp: sentence += " costs " + ", ".join(pp) + "."
             if schedule: sentence += " Schedule: " + schedule + "."
             if timing:   sentence += " Timing: " + timing + "."
-            lines.append(sentence)
-            lines.append("Price of " + name + ": Domestic NPR " + str(prices.get("domestic", "N/A"))
+
+            canonical = (name + ": Domestic NPR " + str(prices.get("domestic", "N/A"))
                          + " | SAARC NPR " + str(prices.get("SAARC", "N/A"))
                          + " | Tourist NPR " + str(prices.get("tourist", "N/A")))
-            lines.append("How much does " + name + " cost? " + sentence)
-            lines.append(name + " fee: Domestic=" + str(prices.get("domestic"))
-                         + ", SAARC=" + str(prices.get("SAARC"))
-                         + ", Tourist=" + str(prices.get("tourist")))
-            lines.append("")
-        return "\n".join(lines)
+            if schedule: canonical += ". Schedule: " + schedule
+            if timing:   canonical += ". Timing: " + timing
+            canonical += "."
+
+            views = [
+                sentence,
+                "Price of " + name + ": Domestic NPR " + str(prices.get("domestic", "N/A"))
+                + " | SAARC NPR " + str(prices.get("SAARC", "N/A"))
+                + " | Tourist NPR " + str(prices.get("tourist", "N/A")),
+                "How much does " + name + " cost? " + sentence,
+                name + " fee: Domestic=" + str(prices.get("domestic"))
+                + ", SAARC=" + str(prices.get("SAARC"))
+                + ", Tourist=" + str(prices.get("tourist")),
+            ]
+            slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+            documents.append(Document(
+                page_content=canonical,
+                metadata={"source": "activities.json", "type": "activities",
+                          "parent_id": "activity:" + slug, "views": views},
+            ))
+        return documents
 
     def clear_memory(self, session_id="default"):
         if session_id in self._sessions:
@@ -1159,11 +2252,24 @@ class RAGService:
     def add_documents(self, documents):
         if not self.vector_db:
             raise ValueError("Vector store not initialized.")
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
         splitter   = RecursiveCharacterTextSplitter(chunk_size=800, chunk_overlap=200)
-        split_docs = splitter.split_documents(documents)
-        self.vector_db.add_documents(split_docs)
+        split_docs = splitter.split_documents([d for d in documents if not d.metadata.get("views")])
+        if split_docs:
+            self.vector_db.add_documents(split_docs)
+        view_texts, view_docs = self._expand_views([d for d in documents if d.metadata.get("views")])
+        if view_docs:
+            self.vector_db.add_embeddings(
+                list(zip([d.page_content for d in view_docs], self.embeddings.embed_documents(view_texts))),
+                metadatas=[d.metadata for d in view_docs],
+            )
         index_path = Path(__file__).resolve().parent.parent.parent / "vector_store" / "faiss_index"
-        self.vector_db.save_local(str(index_path))
+        self._save_index(index_path)
+        self._build_vector_engine()
+        self._build_bm25_index()
+        self.context_packer.annotate(self.vector_engine.docs)
+        self._load_router(index_path)
 
     def get_stats(self):
         if not self.vector_db:
@@ -1173,10 +2279,31 @@ class RAGService:
             "total_vectors":       self.vector_db.index.ntotal,
             "bm25_docs":           len(self._all_docs) if self._bm25_index else 0,
             "retrieval_mode":      "Hybrid BM25+FAISS" if self._bm25_index else "FAISS-only",
-            "embedding_model":     "BAAI/bge-small-en-v1.5",
+            "vector_engine_bytes": self.vector_engine.nbytes if self.vector_engine else 0,
+            "index_type":          self._index_meta.get("index_type", DEFAULT_INDEX_TYPE),
+            "index_params":        self._index_meta.get("index_params", {}),
+            "index_bytes":         self._index_bytes,
+            "embedding_model":     EMBEDDING_MODEL,
             "embedding_device":    "CPU (FastEmbed)",
             "llm_simple":          "llama-3.1-8b-instant",
             "llm_complex":         "llama-3.3-70b-versatile",
             "active_sessions":     len(self._sessions),
+            "memory_mode":         MEMORY_MODE,
+            "startup_timings":     self.startup_timings,
             "response_cache_size": self._cache.size,
+            "prefetch":            self.prefetcher.stats(),
+            "admission":           self.admission.stats(),
+            "model_router":        self.model_router.stats(),
+            "retrieval_executor":  self.retrieval_pool.stats(),
+            "tracing":             self.traces.stats(),
+            "profiler":            self.profiler.stats(),
+            "suggestions":         dict(self.suggestion_engine.stats(), sources=self._suggestion_hits,
+                                        graph_nodes=len(self.suggestion_graph) if self.suggestion_graph else 0),
+            "prompt_tokens":       self.context_packer.stats() if self.context_packer else {},
+            "generation":          self._gen_stats,
+            "confidence_guard":    self._guard_report(),
+            "budget_exhausted":    self._budget_exhausted,
+            "hallucination_guard": dict(self._hallucination_stats,
+                                        species=len(self.species_lexicon) if self.species_lexicon else 0),
+            "semantic_router":     dict(self._router_stats, prototypes=self.router.size if self.router else 0),
         }
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""
+retrieval_executor.py — Dedicated, sized executor for CPU-bound retrieval
+==========================================================================
+Query embedding and hybrid retrieval used to run on the event loop's default
+thread pool, which they shared with everything else. ONNX Runtime also starts
+one intra-op thread per core for every session, so a few concurrent queries
+oversubscribed the CPU and tail latency became unpredictable.
+
+  - RETRIEVAL_WORKERS threads (default: min(4, cores)) run embedding, FAISS
+    and BM25 work and nothing else
+  - ONNX_THREADS (default: cores // RETRIEVAL_WORKERS) is passed to FastEmbed,
+    so workers × intra-op threads stays within the core count
+  - BM25_PROCESSES=n > 0 scores BM25 in n worker processes, each holding its
+    own copy of the index. Scoring then runs outside the GIL and overlaps the
+    FAISS search of the same query. The in-process index stays as a fallback.
+
+Per task, the time spent queued for a worker is kept apart from the time
+spent running, and both are reported under /status "retrieval_executor".
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CPU_COUNT         = os.cpu_count() or 1
+RETRIEVAL_WORKERS = max(1, int(os.getenv("RETRIEVAL_WORKERS", str(min(4, CPU_COUNT)))))
+ONNX_THREADS      = max(1, int(os.getenv("ONNX_THREADS", str(max(1, CPU_COUNT // RETRIEVAL_WORKERS)))))
+BM25_PROCESSES    = max(0, int(os.getenv("BM25_PROCESSES", "0")))
+BM25_TIMEOUT_SECS = 5.0      # a stuck worker process falls back to in-process scoring
+TIMING_SAMPLES    = 500
+
+
+# ── BM25 scoring (shared by both modes) ───────────────────────────────────────
+def bm25_top(index, tokens: List[str], k: int) -> List[Tuple[int, float]]:
+    """(doc index, score) of the k best-scoring docs, highest first; ties keep index order."""
+    scores = index.get_scores(tokens)
+    top    = np.argsort(-np.asarray(scores), kind="stable")[:k]
+    return [(int(i), float(scores[i])) for i in top]
+
+
+_process_index = None   # the BM25 index inside a worker process
+
+
+def _bm25_process_init(tokenized: List[List[str]]):
+    global _process_index
+    from rank_bm25 import BM25Okapi
+    _process_index = BM25Okapi(tokenized)
+
+
+def _bm25_process_top(tokens: List[str], k: int) -> List[Tuple[int, float]]:
+    return bm25_top(_process_index, tokens, k)
+
+
+def _percentile(samples, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RetrievalExecutor:
+    def __init__(self, workers: int = RETRIEVAL_WORKERS, bm25_processes: int = BM25_PROCESSES):
+        self.workers        = workers
+        self.bm25_processes = bm25_processes
+        self._pool          = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retrieval")
+        self._bm25_pool: Optional[ProcessPoolExecutor] = None
+        self._closed        = False
+        self._lock          = threading.Lock()
+        self.queued         = 0
+        self.running        = 0
+        self.counts         = {"completed": 0, "cancelled": 0, "bm25_process": 0, "bm25_fallbacks": 0}
+        self._waits: deque  = deque(maxlen=TIMING_SAMPLES)
+        self._runs: deque   = deque(maxlen=TIMING_SAMPLES)
+
+    # ── Thread pool ───────────────────────────────────────────────────────────
+    def _timed(self, fn, args, submitted: float):
+        started = time.perf_counter()
+        with self._lock:
+            self.queued  -= 1
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.running -= 1
+                self.counts["completed"] += 1
+                self._waits.append(started - submitted)
+                self._runs.append(finished - started)
+
+    def _on_done(self, future):
+        if future.cancelled():           # cancelled while still queued — _timed never ran
+            with self._lock:
+                self.queued -= 1
+                self.counts["cancelled"] += 1
+
+    def run(self, fn, *args) -> asyncio.Future:
+        """
+        Run fn(*args) on a retrieval worker; awaitable from the event loop.
+        The caller's context (the request trace) goes with it.
+        """
+        with self._lock:
+            self.queued += 1
+        context = contextvars.copy_context()
+        future  = self._pool.submit(context.run, self._timed, fn, args, time.perf_counter())
+        future.add_done_callback(self._on_done)
+        return asyncio.wrap_future(future)
+
+    # ── BM25 worker processes ─────────────────────────────────────────────────
+    def start_bm25(self, tokenized: List[List[str]]):
+        """(Re)start the BM25 processes over this corpus. No-op unless BM25_PROCESSES > 0, or after shutdown()."""
+        if self.bm25_processes <= 0 or self._closed:
+            return
+        self.stop_bm25()
+        # spawn, not fork: the parent runs ONNX and event-loop threads
+        self._bm25_pool = ProcessPoolExecutor(max_workers=self.bm25_processes,
+                                              mp_context=multiprocessing.get_context("spawn"),
+                                              initializer=_bm25_process_init, initargs=(tokenized,))
+        # Start the workers now rather than on the first query
+        for future in [self._bm25_pool.submit(_bm25_process_top, [], 1) for _ in range(self.bm25_processes)]:
+            future.result()
+        logger.info("BM25 scoring in " + str(self.bm25_processes) + " worker process(es)")
+
+    def stop_bm25(self):
+        if self._bm25_pool is not None:
+            self._bm25_pool.shutdown(wait=False, cancel_futures=True)
+            self._bm25_pool = None
+
+    def submit_bm25(self, tokens: List[str], k: int):
+        """Future of bm25_top() in a worker process, or None in thread mode."""
+        if self._bm25_pool is None:
+            return None
+        try:
+            return self._bm25_pool.submit(_bm25_process_top, tokens, k)
+        except Exception as e:                 # broken pool (a worker died)
+            logger.warning("BM25 process pool unavailable: " + str(e))
+            self.counts["bm25_fallbacks"] += 1
+            return None
+
+    def bm25_result(self, future, index, tokens: List[str], k: int) -> List[Tuple[int, float]]:
+        """Result of submit_bm25(), or in-process scoring when there is none or it failed."""
+        if future is not None:
+            try:
+                ranked = future.result(timeout=BM25_TIMEOUT_SECS)
+                with self._lock:
+                    self.counts["bm25_process"] += 1
+                return ranked
+            except Exception as e:
+                logger.warning("BM25 process scoring failed — scoring in-process: " + str(e))
+                with self._lock:
+                    self.counts["bm25_fallbacks"] += 1
+        return bm25_top(index, tokens, k)
+
+    def shutdown(self):
+        self._closed = True
+        self.stop_bm25()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            waits, runs = list(self._waits), list(self._runs)
+            stats = dict(self.counts, queued=self.queued, running=self.running)
+        return dict(stats,
+                    workers=self.workers,
+                    onnx_threads=ONNX_THREADS,
+                    bm25_mode="process" if self._bm25_pool is not None else "thread",
+                    wait_p50_ms=round(_percentile(waits, 0.50) * 1000, 2),
+                    wait_p95_ms=round(_percentile(waits, 0.95) * 1000, 2),
+                    run_p50_ms=round(_percentile(runs, 0.50) * 1000, 2),
+                    run_p95_ms=round(_percentile(runs, 0.95) * 1000, 2))
@@ -0,0 +1,168 @@
+"""
+semantic_router.py — Embedding-based category / intent routing
+===============================================================
+The keyword classifier (intent_classifier.py) only knows the words in its
+lists, so "which hornbills live here" or "is the mugger dangerous" get no
+category and fall back to unfiltered retrieval. The router scores the query
+embedding — the same vector retrieval uses — against prototypes built at
+index time:
+  - one centroid per wildlife category, averaged over that category's
+    indexed vectors, plus a few example queries per category
+  - example queries per intent (price / list / conservation / convo)
+
+All prototypes live in one normalized matrix, so routing is a single
+matrix-vector product followed by a per-label max. A label is only returned
+when it clears ROUTER_MIN_SCORE and beats the runner-up by ROUTER_MIN_MARGIN;
+otherwise the keyword result stands.
+
+Prototypes are saved next to the index as router.npz and rebuilt when the
+examples, the embedding model or the index size change.
+"""
+
+import json
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ROUTER_FILE = "router.npz"
+
+# Tuned for bge-small cosine scores, which sit in a compressed ~0.4–0.9 band
+ROUTER_MIN_SCORE  = 0.62
+ROUTER_MIN_MARGIN = 0.03
+
+CATEGORY_EXAMPLES = {
+    "birds":       ["which hornbills live here", "where can I spot kingfishers and storks",
+                    "what is that colourful bird by the river", "vultures and eagles in the park"],
+    "mammals":     ["where do the one-horned rhinos graze", "can I see a sloth bear on safari",
+                    "how many gaur are in the park", "wild elephants and leopards"],
+    "reptiles":    ["is the mugger dangerous", "what does the gharial eat",
+                    "are there pythons or cobras on the trails", "crocodiles basking on the riverbank"],
+    "fish":        ["what lives in the Rapti river", "golden mahseer and catfish",
+                    "can you go fishing in Chitwan"],
+    "butterflies": ["colourful insects near the flowers", "what moths and butterflies fly here",
+                    "when are butterflies most active"],
+    "amphibians":  ["what croaks at night near the ponds", "frogs and toads after the monsoon",
+                    "are there salamanders in the wetlands"],
+    "plants":      ["what trees grow in the sal forest", "elephant grass in the floodplain",
+                    "medicinal plants and orchids in the park"],
+}
+
+INTENT_EXAMPLES = {
+    "price": ["how expensive is the elephant ride", "what do I pay to enter the park",
+              "is the canoe trip affordable for foreigners", "when does the morning jeep leave",
+              "what hours is the tharu museum open", "how many rupees for a jungle walk"],
+    "list":  ["show me the snakes of the park", "give me a few butterflies found here",
+              "tell me several birds I might see", "name the big mammals of Chitwan",
+              "a handful of reptiles that live here"],
+    "conservation": ["animals that might disappear from Chitwan", "species under threat in the park",
+                     "which wildlife is close to dying out", "rare animals that need saving"],
+    "convo": ["tell me about the bengal tiger", "what should I wear on a jungle walk",
+              "is it safe to walk in the jungle", "how do rhinos behave around people",
+              "what is the best season to visit", "do I need a guide inside the park"],
+}
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    m     = np.atleast_2d(np.asarray(m, dtype=np.float32))
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def router_signature(embedding_model: str, ntotal: int) -> str:
+    """Changes whenever the prototypes would: examples, embedding model or index size."""
+    blob = json.dumps([CATEGORY_EXAMPLES, INTENT_EXAMPLES, embedding_model, ntotal], sort_keys=True)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+class SemanticRouter:
+    def __init__(self, matrix: np.ndarray, labels: List[str], kinds: List[str]):
+        """Rows of one kind ("category" / "intent") must be contiguous and grouped by label."""
+        self.matrix = _normalize(matrix)
+        self.labels = list(labels)
+        self.kinds  = list(kinds)
+        self._segments: Dict[str, Tuple[np.ndarray, List[str], slice]] = {}
+        for kind in ("category", "intent"):
+            rows = [i for i, k in enumerate(self.kinds) if k == kind]
+            if not rows:
+                continue
+            starts, names = [], []
+            for i in rows:
+                if i == rows[0] or self.labels[i] != self.labels[i - 1]:
+                    starts.append(i - rows[0])
+                    names.append(self.labels[i])
+            self._segments[kind] = (np.asarray(starts), names, slice(rows[0], rows[-1] + 1))
+
+    @classmethod
+    def build(cls, embeddings, engine) -> "SemanticRouter":
+        """Category centroids from the indexed species vectors + embedded example queries."""
+        if engine.matrix is not None:
+            vectors = engine.matrix
+        else:
+            vectors = _normalize(engine.ann_index.reconstruct_n(0, engine.size))
+        categories = [d.metadata.get("category") for d in engine.docs]
+
+        rows, labels, kinds = [], [], []
+        for name, examples in CATEGORY_EXAMPLES.items():
+            members = [i for i, c in enumerate(categories) if c == name]
+            if members:
+                rows.append(_normalize(vectors[members].mean(axis=0)))
+                labels.append(name)
+                kinds.append("category")
+            rows.append(_normalize(embeddings.embed_documents(examples)))
+            labels += [name] * len(examples)
+            kinds  += ["category"] * len(examples)
+        for name, examples in INTENT_EXAMPLES.items():
+            rows.append(_normalize(embeddings.embed_documents(examples)))
+            labels += [name] * len(examples)
+            kinds  += ["intent"] * len(examples)
+        return cls(np.vstack(rows), labels, kinds)
+
+    @classmethod
+    def load(cls, path: Path, signature: str) -> Optional["SemanticRouter"]:
+        """Saved router, or None if missing or built for different examples/model/index."""
+        if not path.exists():
+            return None
+        try:
+            data = np.load(path, allow_pickle=False)
+            if str(data["signature"]) != signature:
+                return None
+            return cls(data["matrix"], data["labels"].tolist(), data["kinds"].tolist())
+        except Exception as e:
+            logger.warning("Could not load router prototypes: " + str(e))
+            return None
+
+    def save(self, path: Path, signature: str) -> None:
+        np.savez(path, matrix=self.matrix, labels=np.asarray(self.labels),
+                 kinds=np.asarray(self.kinds), signature=np.asarray(signature))
+
+    @property
+    def size(self) -> int:
+        return self.matrix.shape[0]
+
+    def _best(self, scores: np.ndarray, kind: str):
+        starts, names, rows = self._segments[kind]
+        per_label = np.maximum.reduceat(scores[rows], starts)
+        order     = np.argsort(-per_label)
+        top       = float(per_label[order[0]])
+        runner_up = float(per_label[order[1]]) if len(order) > 1 else -1.0
+        confident = top >= ROUTER_MIN_SCORE and top - runner_up >= ROUTER_MIN_MARGIN
+        return (names[order[0]] if confident else None), top
+
+    def route(self, query_vec) -> Dict:
+        """
+        One dot product against every prototype. Returns the confident category
+        and intent (None when unsure) with their scores.
+        """
+        scores = self.matrix @ _normalize(query_vec)[0]
+        result = {"category": None, "category_score": 0.0, "intent": None, "intent_score": 0.0}
+        if "category" in self._segments:
+            result["category"], result["category_score"] = self._best(scores, "category")
+        if "intent" in self._segments:
+            result["intent"], result["intent_score"] = self._best(scores, "intent")
+        return result
@@ -0,0 +1,112 @@
+"""
+species_lexicon.py — Known species names for the hallucination guard
+=====================================================================
+The guard flags capitalized multi-word phrases in list answers that match no
+species in our data. A phrase counts as known if it is part of a known name
+("Bengal Tiger" in "royal bengal tiger") or contains one ("Greater One Horned
+Rhinoceros Calf" contains "greater one horned rhinoceros").
+
+Checking that against every name costs O(candidates × species). Instead:
+  - "contains a known name" is one search with a trie-shaped regex of all names
+  - "part of a known name" looks up the candidate's character trigrams in an
+    inverted index and only substring-tests names that share all of them
+
+The names are collected while the wildlife JSON is indexed and saved next to
+the FAISS index as species_lexicon.json, so the guard also works when the
+index is loaded from disk rather than rebuilt.
+"""
+
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from intent_classifier import trie_regex
+
+logger = logging.getLogger(__name__)
+
+LEXICON_FILE = "species_lexicon.json"
+NGRAM        = 3
+
+# Species record fields that hold a name
+NAME_FIELDS = ("commonEnglishName", "english_name", "name", "title",
+               "nepaliName", "nepali_name", "scientificName", "scientific_name")
+
+
+def species_names(record: dict) -> List[str]:
+    """Lowercased names of one species record."""
+    names = []
+    for key in NAME_FIELDS:
+        val = record.get(key)
+        if isinstance(val, str) and val.strip():
+            names.append(val.lower().strip())
+    return names
+
+
+def collect_names(wildlife_dir: Path) -> Set[str]:
+    """Names from every wildlife JSON file — used when an older index has no saved lexicon."""
+    names: Set[str] = set()
+    for json_file in Path(wildlife_dir).glob("*.json"):
+        try:
+            with open(json_file, "r", encoding="utf-8-sig") as f:
+                data = json.load(f)
+            for record in (data if isinstance(data, list) else [data]):
+                names.update(species_names(record))
+        except Exception as e:
+            logger.warning("  Skipping " + json_file.name + " for species lexicon: " + str(e))
+    return names
+
+
+def _grams(text: str) -> Set[str]:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class SpeciesLexicon:
+    def __init__(self, names: Iterable[str]):
+        self.names: List[str] = sorted(set(names))
+        self._contains = re.compile(trie_regex(self.names)) if self.names else None
+        self._postings: Dict[str, Set[int]] = {}
+        for i, name in enumerate(self.names):
+            for gram in _grams(name):
+                self._postings.setdefault(gram, set()).add(i)
+
+    @classmethod
+    def load(cls, index_path) -> Optional["SpeciesLexicon"]:
+        path = Path(index_path) / LEXICON_FILE
+        if not path.exists():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return cls(json.load(f))
+        except Exception as e:
+            logger.warning("Could not load species lexicon: " + str(e))
+            return None
+
+    def save(self, index_path) -> None:
+        with open(Path(index_path) / LEXICON_FILE, "w", encoding="utf-8") as f:
+            json.dump(self.names, f, ensure_ascii=False, indent=0)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _within_known(self, phrase: str) -> bool:
+        """phrase is a substring of some known name."""
+        if len(phrase) < NGRAM:
+            return any(phrase in name for name in self.names)
+        # Any name containing the phrase is in every gram's posting list, so
+        # substring-testing the shortest list is enough
+        rarest = None
+        for i in range(len(phrase) - NGRAM + 1):
+            posting = self._postings.get(phrase[i:i + NGRAM])
+            if not posting:
+                return False
+            if rarest is None or len(posting) < len(rarest):
+                rarest = posting
+        return any(phrase in self.names[i] for i in rarest)
+
+    def is_known(self, phrase: str) -> bool:
+        """True if the lowercased phrase is part of, or contains, a known species name."""
+        if self._contains is None:
+            return False
+        return self._within_known(phrase) or self._contains.search(phrase) is not None
@@ -6,15 +6,86 @@ Fixes vs original:
   - Rotates through suggestion pools so the same 3 never repeat consecutively
   - Conservation queries get varied follow-ups (not always the same 3)
   - Tracks last shown suggestions to avoid repetition
+
+Keyword tables are compiled once per language, the deduplicated pool for
+each combination of matched keywords is memoized, and the "last shown"
+rotation state is kept per session (bounded, LRU-evicted), so one visitor's
+chips never change what another visitor sees.
 """
 
 import re
-from typing import List, Dict
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Tuple
+
+MAX_ROTATION_SESSIONS = 2000    # sessions whose last-shown chips are remembered
+MAX_POOL_COMBINATIONS = 512     # memoized keyword-combination pools per language
+
+_PUNCT = re.compile(r"[?!.,]")
+
+
+def normalize_question(text: str) -> str:
+    """Lowercased, punctuation-stripped form used to spot the question just asked."""
+    return _PUNCT.sub("", text.strip().lower())
+
+
+class _KeywordMatcher:
+    """
+    Keyword → bit table for one language's pools. Matching returns a bit mask
+    of the keywords found, which keys the memoized pool for that combination.
+
+    With ~20 short keywords, one C-level substring search per keyword over the
+    query and response joined by a newline (no keyword spans one) measured
+    faster than a combined trie regex, which has to be tried at every offset.
+    """
+
+    def __init__(self, pools: Dict[str, List[str]]):
+        self.keywords = list(pools)
+        self._bits    = tuple((k, 1 << i) for i, k in enumerate(self.keywords))
+        # (s, normalized s) per suggestion, per keyword — in pool order
+        self._entries = {k: [(s, normalize_question(s)) for s in pools[k]] for k in self.keywords}
+        self._pools: "OrderedDict[int, Tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mask(self, *texts: str) -> int:
+        text  = "\n".join(texts)
+        found = 0
+        for keyword, bit in self._bits:
+            if keyword in text:
+                found |= bit
+        return found
+
+    def pool(self, mask: int) -> Tuple:
+        """Deduplicated (suggestion, normalized) pairs for a keyword combination, in pool order."""
+        with self._lock:
+            cached = self._pools.get(mask)
+            if cached is not None:
+                self._pools.move_to_end(mask)
+                return cached
+        seen, pool = set(), []
+        for i, keyword in enumerate(self.keywords):
+            if mask >> i & 1:
+                for entry in self._entries[keyword]:
+                    if entry[0] not in seen:
+                        seen.add(entry[0])
+                        pool.append(entry)
+        pool = tuple(pool)
+        with self._lock:
+            self._pools[mask] = pool
+            if len(self._pools) > MAX_POOL_COMBINATIONS:
+                self._pools.popitem(last=False)
+        return pool
+
+    @property
+    def cached_pools(self) -> int:
+        return len(self._pools)
 
 
 class SuggestionEngine:
     def __init__(self):
-        self._last_suggestions: List[str] = []
+        # session_id → suggestions shown last turn (LRU-bounded)
+        self._last_suggestions: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._rotation_lock = threading.Lock()
 
         # Each key maps to a POOL of suggestions — we rotate through them
         self.suggestion_pools: Dict[str, List[str]] = {
@@ -283,67 +354,88 @@ class SuggestionEngine:
             "कुन चराहरू लोपोन्मुख छन्?",
         ]
 
+        # ── Compiled once per language ────────────────────────────────────────
+        self._matchers: Dict[str, _KeywordMatcher] = {
+            "en": _KeywordMatcher(self.suggestion_pools),
+            "ne": _KeywordMatcher(self.nepali_suggestion_pools),
+        }
+        self._default_entries: Dict[str, Tuple] = {
+            "en": tuple((s, normalize_question(s)) for s in self.default_suggestions),
+            "ne": tuple((s, normalize_question(s)) for s in self.nepali_default_suggestions),
+        }
+
+    def _last_shown(self, session_id: str) -> List[str]:
+        with self._rotation_lock:
+            last = self._last_suggestions.get(session_id)
+            if last is not None:
+                self._last_suggestions.move_to_end(session_id)
+            return last or []
+
+    def _remember(self, session_id: str, shown: List[str]) -> None:
+        with self._rotation_lock:
+            self._last_suggestions[session_id] = shown
+            self._last_suggestions.move_to_end(session_id)
+            while len(self._last_suggestions) > MAX_ROTATION_SESSIONS:
+                self._last_suggestions.popitem(last=False)
+
+    def forget(self, session_id: str) -> None:
+        """Drop a session's rotation state (called when its chat memory is cleared)."""
+        with self._rotation_lock:
+            self._last_suggestions.pop(session_id, None)
+
+    def stats(self) -> Dict:
+        return {
+            "rotation_sessions": len(self._last_suggestions),
+            "cached_pools":      {lang: m.cached_pools for lang, m in self._matchers.items()},
+        }
+
     def get_raw_suggestions(self, user_query: str, bot_response: str,
-                            match_query: str = None, language: str = "en") -> List[str]:
+                            match_query: str = None, language: str = "en",
+                            session_id: str = "default", pool: Tuple = None) -> List[str]:
         """
         Return 3 non-repeating, context-aware suggestions.
         - match_query: English translation of query for keyword matching (use when user wrote Nepali)
         - language: 'en' or 'ne' — determines which suggestion pool to draw from
+        - session_id: rotation ("not shown last turn") is tracked per session
+        - pool: ranked (suggestion, normalized) pairs, e.g. from the suggestion
+          graph — skips keyword matching
         """
-        # Use translated English query for keyword matching if provided
-        q_for_match = (match_query or user_query).lower()
-        r_lower     = bot_response.lower()
-
-        # Pick the right pool based on language
-        pools    = self.nepali_suggestion_pools if language == "ne" else self.suggestion_pools
-        defaults = self.nepali_default_suggestions if language == "ne" else self.default_suggestions
-
-        # Build candidate pool from all matching keywords
-        pool: List[str] = []
-        for keyword, suggestions in pools.items():
-            if keyword in q_for_match or keyword in r_lower:
-                pool.extend(suggestions)
-
-        # Deduplicate while preserving order
-        seen = set()
-        deduped = []
-        for s in pool:
-            if s not in seen:
-                seen.add(s)
-                deduped.append(s)
-        pool = deduped
-
-        # Fall back to language-appropriate defaults if no keyword matched
+        lang     = "ne" if language == "ne" else "en"
+        defaults = self._default_entries[lang]
+
         if not pool:
-            pool = defaults[:]
+            # Use translated English query for keyword matching if provided
+            matcher = self._matchers[lang]
+            mask    = matcher.mask((match_query or user_query).lower(), bot_response.lower())
+            # Deduplicated pool of every matching keyword, or language-appropriate defaults
+            pool = matcher.pool(mask) if mask else defaults
 
         # Filter out the user's own question
-        user_q_clean = re.sub(r"[?!.,]", "", user_query.strip().lower())
-        def not_same_as_query(s: str) -> bool:
-            return re.sub(r"[?!.,]", "", s.strip().lower()) != user_q_clean
+        user_q_clean = normalize_question(user_query)
+        last_shown   = self._last_shown(session_id)
 
         # Priority 1: fresh suggestions (not seen last turn, not same as query)
-        fresh = [s for s in pool if not_same_as_query(s) and s not in self._last_suggestions]
+        pool_filtered = [s for s, norm in pool if norm != user_q_clean]
+        fresh = [s for s in pool_filtered if s not in last_shown]
 
         # Priority 2: if not enough fresh, rotate from pool (skip query only)
         if len(fresh) < 3:
-            pool_filtered = [s for s in pool if not_same_as_query(s)]
-            seen_in_pool  = [s for s in pool_filtered if s in self._last_suggestions]
+            seen_in_pool = [s for s in pool_filtered if s in last_shown]
             fresh = pool_filtered[:3] if len(pool_filtered) >= 3 else (pool_filtered + seen_in_pool)
 
         # Priority 3: pad with language defaults if still not enough
         if len(fresh) < 3:
-            extras = [s for s in defaults if not_same_as_query(s) and s not in fresh]
+            extras = [s for s, norm in defaults if norm != user_q_clean and s not in fresh]
             fresh = (fresh + extras)[:3]
 
         result = fresh[:3]
 
         # Pad if somehow fewer than 3
         if len(result) < 3:
-            extras = [s for s in defaults if s not in result]
+            extras = [s for s, _ in defaults if s not in result]
             result = (result + extras)[:3]
 
         # Remember what we showed to avoid repeating next turn
-        self._last_suggestions = result[:]
+        self._remember(session_id, result[:])
 
         return result
\ No newline at end of file
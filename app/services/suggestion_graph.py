@@ -0,0 +1,184 @@
+"""
+suggestion_graph.py — Precomputed next-question suggestions
+============================================================
+SuggestionEngine picks chips at request time by keyword overlap, redoing the
+same work for the same answers over and over. The graph is built offline
+(scripts/build_suggestion_graph.py) by embedding every suggestion in the
+English/Nepali pools plus every cached or pre-answered question, and stores
+for each node a ranked list of related follow-ups:
+
+  - question nodes — keyed by the normalized question text
+  - document nodes — keyed by a hash of an indexed document's content, so the
+    top retrieved document finds follow-ups even for never-seen questions
+
+English follow-ups are ranked by cosine similarity to the node. The embedding
+model is English-only, so Nepali follow-ups are ranked by topic: each pool
+keyword scores by its English pool's centroid, and the Nepali pools of the best
+topics are interleaved.
+
+Serving is a dict lookup: answered question first, then the top document;
+the keyword engine is only the fallback. Rotation and "not the question just
+asked" filtering stay in SuggestionEngine.
+"""
+
+import json
+import hashlib
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from suggestion_engine import normalize_question
+
+logger = logging.getLogger(__name__)
+
+GRAPH_FILE         = "suggestion_graph.json"
+GRAPH_FOLLOWUPS    = 6       # ranked follow-ups kept per node and language
+GRAPH_TOP_TOPICS   = 3       # Nepali: pools of this many best topics are interleaved
+DUPLICATE_MIN_SIM  = 0.95    # a follow-up this close to the node is the same question
+
+_PUNCT = re.compile(r"[?!.,]")
+_SPACE = re.compile(r"[ \t]+")
+
+
+def question_key(text: str) -> str:
+    """Same normalization as ResponseCache keys: lowercased, punctuation stripped."""
+    return "q:" + _SPACE.sub(" ", _PUNCT.sub("", text.lower().strip()))
+
+
+def doc_key(doc) -> str:
+    """Content hash of an indexed document, cached on its metadata."""
+    key = doc.metadata.get("graph_key")
+    if key is None:
+        key = "d:" + hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()[:16]
+        doc.metadata["graph_key"] = key
+    return key
+
+
+def pools_signature(engine) -> str:
+    """Changes whenever the suggestion pools do — a stale graph is ignored."""
+    blob = json.dumps([engine.suggestion_pools, engine.nepali_suggestion_pools], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    m     = np.atleast_2d(np.asarray(m, dtype=np.float32))
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def _dedupe(items: List[str]) -> List[str]:
+    seen = set()
+    return [s for s in items if not (s in seen or seen.add(s))]
+
+
+def build_graph(embeddings, vector_engine, suggestion_engine, questions: List[str]) -> Dict:
+    """
+    Rank follow-ups for every suggestion, every given question and every
+    indexed document. Returns the JSON-ready graph.
+    """
+    en_pools = suggestion_engine.suggestion_pools
+    ne_pools = suggestion_engine.nepali_suggestion_pools
+    topics   = [k for k in en_pools if k in ne_pools]
+
+    en_suggestions = _dedupe([s for pool in en_pools.values() for s in pool])
+    en_vecs        = _normalize(embeddings.embed_documents(en_suggestions))
+    en_index       = {s: i for i, s in enumerate(en_suggestions)}
+    topic_vecs     = _normalize(np.stack([en_vecs[[en_index[s] for s in en_pools[t]]].mean(axis=0)
+                                          for t in topics]))
+
+    # ── Node vectors ──────────────────────────────────────────────────────────
+    keys, vecs = [], []
+    for s in en_suggestions:
+        keys.append(question_key(s))
+        vecs.append(en_vecs[en_index[s]])
+    for topic, pool in ne_pools.items():
+        if topic in topics:            # Nepali text embeds poorly — use the topic centroid
+            for s in pool:
+                keys.append(question_key(s))
+                vecs.append(topic_vecs[topics.index(topic)])
+    known = set(keys)
+    extra = [q for q in _dedupe(questions) if question_key(q) not in known]
+    if extra:
+        keys += [question_key(q) for q in extra]
+        vecs += list(_normalize(embeddings.embed_documents(extra)))
+
+    if vector_engine.matrix is not None:
+        doc_vecs = vector_engine.matrix
+    else:
+        doc_vecs = _normalize(vector_engine.ann_index.reconstruct_n(0, vector_engine.size))
+    by_doc: Dict[str, List[int]] = {}
+    for i, doc in enumerate(vector_engine.docs):
+        by_doc.setdefault(doc_key(doc), []).append(i)     # multi-view records share one node
+    for key, rows in by_doc.items():
+        keys.append(key)
+        vecs.append(doc_vecs[rows].mean(axis=0))
+
+    node_vecs = _normalize(np.stack(vecs))
+
+    # ── Rank follow-ups ───────────────────────────────────────────────────────
+    en_sims    = node_vecs @ en_vecs.T
+    topic_sims = node_vecs @ topic_vecs.T
+    nodes: Dict[str, Dict[str, List[str]]] = {}
+    for n, key in enumerate(keys):
+        if key in nodes:
+            continue
+        order = np.argsort(-en_sims[n])
+        en    = [en_suggestions[j] for j in order
+                 if en_sims[n, j] < DUPLICATE_MIN_SIM and question_key(en_suggestions[j]) != key]
+        best  = [topics[j] for j in np.argsort(-topic_sims[n])[:GRAPH_TOP_TOPICS]]
+        ne    = [s for row in zip(*(ne_pools[t] for t in best)) for s in row if question_key(s) != key]
+        nodes[key] = {"en": en[:GRAPH_FOLLOWUPS], "ne": _dedupe(ne)[:GRAPH_FOLLOWUPS]}
+
+    return {"signature": pools_signature(suggestion_engine), "nodes": nodes}
+
+
+class SuggestionGraph:
+    def __init__(self, nodes: Dict[str, Dict[str, List[str]]]):
+        # (suggestion, normalized) pairs, ready for SuggestionEngine's rotation
+        self._nodes: Dict[str, Dict[str, Tuple]] = {
+            key: {lang: tuple((s, normalize_question(s)) for s in items)
+                  for lang, items in langs.items()}
+            for key, langs in nodes.items()
+        }
+
+    @classmethod
+    def load(cls, path: Path, suggestion_engine) -> Optional["SuggestionGraph"]:
+        """Saved graph, or None if missing or built for different suggestion pools."""
+        if not Path(path).exists():
+            logger.warning("No suggestion graph at " + str(path) + " - suggestions fall back to keyword "
+                           "matching; run scripts/build_suggestion_graph.py")
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning("Could not load suggestion graph: " + str(e))
+            return None
+        if data.get("signature") != pools_signature(suggestion_engine):
+            logger.warning("Suggestion graph is stale (pools changed) - suggestions fall back to keyword "
+                           "matching; run scripts/build_suggestion_graph.py")
+            return None
+        return cls(data.get("nodes", {}))
+
+    @staticmethod
+    def save(graph: Dict, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(graph, f, ensure_ascii=False, indent=1)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def lookup(self, question: str, top_doc=None, language: str = "en") -> Tuple[Optional[Tuple], Optional[str]]:
+        """Ranked follow-ups for the answered question, else the top document. Returns (pool, hit kind)."""
+        node = self._nodes.get(question_key(question))
+        if node and node.get(language):
+            return node[language], "question"
+        if top_doc is not None:
+            node = self._nodes.get(doc_key(top_doc))
+            if node and node.get(language):
+                return node[language], "document"
+        return None, None
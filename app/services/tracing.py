@@ -0,0 +1,132 @@
+"""
+tracing.py — Per-request traces with stage spans
+================================================
+A histogram shows that requests are slow, but not why one particular request
+was. Each user query gets a trace: an id (returned to the client in the
+X-Trace-ID header), the spans of every pipeline stage it went through, and
+attributes such as intent, model, cache outcome and token counts.
+
+The current trace lives in a ContextVar. Stage timers (metrics.timed_stage /
+observe_stage) add a span to it, with no extra call sites, and the retrieval
+executor copies the context into its worker threads. Finished traces go into
+two bounded buffers: the TRACE_BUFFER most recent and the TRACE_BUFFER
+slowest. Both are served by the admin-only /api/v1/debug/traces endpoint.
+"""
+
+import os
+import re
+import time
+import uuid
+import heapq
+import threading
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+TRACE_BUFFER = int(os.getenv("TRACE_BUFFER", "50"))
+
+_TRACE_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+_current: ContextVar = ContextVar("rag_trace", default=None)
+
+
+def new_trace_id(candidate: str = None) -> str:
+    """The client's X-Trace-ID if it is a sane token, else a fresh id."""
+    if candidate and _TRACE_ID.match(candidate):
+        return candidate
+    return uuid.uuid4().hex[:16]
+
+
+class Trace:
+    def __init__(self, trace_id: str, message: str, session_id: str):
+        self.trace_id = trace_id
+        self.started  = time.perf_counter()
+        self.wall     = time.time()
+        self.spans: List[tuple] = []         # (name, start offset secs, duration secs)
+        self.attrs: Dict = {"query": message[:120], "session_id": session_id}
+
+    def span(self, name: str, started: float, secs: float):
+        self.spans.append((name, started - self.started, secs))
+
+    def to_dict(self, total_secs: float) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "time":     round(self.wall, 3),
+            "total_ms": round(total_secs * 1000, 1),
+            "attrs":    dict(self.attrs),
+            "spans":    [{"name": name, "start_ms": round(offset * 1000, 1), "ms": round(secs * 1000, 2)}
+                         for name, offset, secs in sorted(self.spans, key=lambda s: s[1])],
+        }
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+def add_span(name: str, started: float, secs: float):
+    """Add a span to the current trace, if there is one."""
+    trace = _current.get()
+    if trace is not None:
+        trace.span(name, started, secs)
+
+
+def annotate(**attrs):
+    """Attach attributes to the current trace, if there is one."""
+    trace = _current.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+class TraceStore:
+    def __init__(self, size: int = TRACE_BUFFER):
+        self.size     = size
+        self._recent: deque = deque(maxlen=size)
+        self._slowest: list = []             # min-heap of (total_ms, seq, trace dict)
+        self._seq     = 0
+        self._lock    = threading.Lock()
+        self.finished = 0
+
+    def start(self, trace_id: str, message: str, session_id: str):
+        """Begin a trace as the current one. Returns (trace, token for finish())."""
+        trace = Trace(trace_id, message, session_id)
+        return trace, _current.set(trace)
+
+    def finish(self, trace: Trace, token, **attrs) -> Dict:
+        try:
+            _current.reset(token)
+        except ValueError:                   # finished from another context (generator closed elsewhere)
+            _current.set(None)
+        trace.attrs.update(attrs)
+        record = trace.to_dict(time.perf_counter() - trace.started)
+        with self._lock:
+            self.finished += 1
+            self._seq     += 1
+            self._recent.append(record)
+            entry = (record["total_ms"], self._seq, record)
+            if len(self._slowest) < self.size:
+                heapq.heappush(self._slowest, entry)
+            elif entry[0] > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, entry)
+        return record
+
+    def list(self, order: str = "recent", limit: int = 20) -> List[Dict]:
+        with self._lock:
+            if order == "slowest":
+                records = [r for _, _, r in sorted(self._slowest, key=lambda e: -e[0])]
+            else:
+                records = list(reversed(self._recent))
+        return records[:max(0, limit)]
+
+    def get(self, trace_id: str) -> Optional[Dict]:
+        with self._lock:
+            for record in reversed(self._recent):
+                if record["trace_id"] == trace_id:
+                    return record
+            for _, _, record in self._slowest:
+                if record["trace_id"] == trace_id:
+                    return record
+        return None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"finished": self.finished, "buffer": self.size,
+                    "slowest_ms": round(max((e[0] for e in self._slowest), default=0.0), 1)}
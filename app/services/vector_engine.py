@@ -0,0 +1,206 @@
+"""
+vector_engine.py — In-memory dense retrieval core
+==================================================
+Replaces the per-query `vector_db.as_retriever(search_type="mmr")` path:
+  - Keeps every vector as one L2-normalized float32 matrix
+  - Query similarity is a single matmul, batched across queries
+  - MMR runs vectorized in NumPy over precomputed doc-doc similarities
+  - Category filters are cached boolean masks instead of post-filtering
+
+Results match LangChain's FAISS MMR for unfiltered searches. For filtered
+searches LangChain only looks at the top fetch_k*2 hits before filtering;
+here the whole category is searched, so a sparse category can return more
+(never fewer) relevant documents.
+
+For approximate/quantized indexes (see index_factory.py) the engine runs in
+ANN mode instead: candidates come from the FAISS index itself and only their
+vectors are reconstructed, so no full-precision matrix is held in memory.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Above this many vectors the N×N doc-doc similarity matrix is no longer
+# worth keeping (4096² float32 = 64 MB); candidate sims are computed per query.
+GRAM_MAX_DOCS = 4096
+
+# ANN mode over-fetches this many times fetch_k when a category filter applies
+ANN_FILTER_OVERFETCH = 4
+
+
+class VectorEngine:
+    def __init__(self, matrix, docs: list, gram_max_docs: int = GRAM_MAX_DOCS, ann_index=None):
+        self.docs        = docs
+        self.ann_index   = ann_index
+        self._categories = [d.metadata.get("category") for d in docs]
+        self._masks: Dict[str, np.ndarray] = {}
+        self.matrix = None
+        self._gram  = None
+        if ann_index is None:
+            matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+            norms  = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self.matrix = matrix / norms
+            if len(docs) <= gram_max_docs:
+                self._gram = self.matrix @ self.matrix.T
+
+    @classmethod
+    def from_faiss(cls, vector_db, exact: bool = True, **kwargs) -> "VectorEngine":
+        """
+        Pull documents (and, in exact mode, vectors) out of a LangChain FAISS store.
+        exact=False keeps searching through the FAISS index (ANN mode).
+        """
+        index = vector_db.index
+        docs  = [vector_db.docstore.search(vector_db.index_to_docstore_id[i]) for i in range(index.ntotal)]
+        return cls.from_index(index, docs, exact=exact, **kwargs)
+
+    @classmethod
+    def from_index(cls, index, docs: list, exact: bool = True, **kwargs) -> "VectorEngine":
+        """Same as from_faiss, from a raw FAISS index and its documents in index order."""
+        if not exact:
+            return cls(None, docs, ann_index=index, **kwargs)
+        n      = index.ntotal
+        matrix = index.reconstruct_n(0, n) if n else np.zeros((0, index.d), dtype=np.float32)
+        return cls(matrix, docs, **kwargs)
+
+    @property
+    def size(self) -> int:
+        return len(self.docs)
+
+    @property
+    def mode(self) -> str:
+        return "exact" if self.ann_index is None else "ann"
+
+    @property
+    def nbytes(self) -> int:
+        if self.matrix is None:
+            return 0
+        return self.matrix.nbytes + (self._gram.nbytes if self._gram is not None else 0)
+
+    def _mask(self, category: str) -> np.ndarray:
+        mask = self._masks.get(category)
+        if mask is None:
+            mask = np.array([c == category for c in self._categories], dtype=bool)
+            self._masks[category] = mask
+        return mask
+
+    @staticmethod
+    def _normalize(query_vecs) -> np.ndarray:
+        q = np.atleast_2d(np.asarray(query_vecs, dtype=np.float32))
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(q / norms)
+
+    def similarity(self, query_vecs) -> np.ndarray:
+        """Cosine similarity of each query (rows) against every document (cols). Exact mode only."""
+        if self.matrix is None:
+            raise RuntimeError("similarity() needs the in-memory matrix; engine is in ANN mode")
+        return self._normalize(query_vecs) @ self.matrix.T
+
+    def search(self, query_vecs, k: int,
+               filter_categories: Optional[Sequence[Optional[str]]] = None) -> List[List[int]]:
+        """Plain top-k by cosine similarity. Returns document indices per query."""
+        if self.ann_index is not None:
+            cand, rel, _ = self._ann_candidates(query_vecs, k, filter_categories, with_pairs=False)
+            return [[int(cand[r, c]) for c in np.argsort(-rel[r], kind="stable")[:k] if np.isfinite(rel[r, c])]
+                    for r in range(cand.shape[0])]
+        sims = self._apply_filters(self.similarity(query_vecs), filter_categories)
+        top  = self._top_candidates(sims, k)
+        return [[int(i) for i in row if np.isfinite(sims[r, i])] for r, row in enumerate(top)]
+
+    def mmr_search(self, query_vecs, k: int, fetch_k: int = 20, lambda_mult: float = 0.7,
+                   filter_categories: Optional[Sequence[Optional[str]]] = None) -> List[List[int]]:
+        """
+        Maximal Marginal Relevance over the fetch_k most similar documents.
+        filter_categories holds one category (or None) per query row.
+        Returns document indices per query in selection order.
+        """
+        if not self.size or k <= 0:
+            return [[] for _ in range(np.atleast_2d(query_vecs).shape[0])]
+
+        if self.ann_index is not None:
+            cand, rel, pair = self._ann_candidates(query_vecs, fetch_k, filter_categories)
+        else:
+            sims = self._apply_filters(self.similarity(query_vecs), filter_categories)
+            cand = self._top_candidates(sims, fetch_k)                    # Q×C
+            rel  = np.take_along_axis(sims, cand, axis=1)                 # Q×C
+            if self._gram is not None:
+                pair = self._gram[cand[:, :, None], cand[:, None, :]]     # Q×C×C
+            else:
+                vecs = self.matrix[cand]                                  # Q×C×d
+                pair = vecs @ vecs.transpose(0, 2, 1)
+        return self._mmr(cand, rel, pair, k, lambda_mult)
+
+    def _mmr(self, cand: np.ndarray, rel: np.ndarray, pair: np.ndarray,
+             k: int, lambda_mult: float) -> List[List[int]]:
+        """Greedy MMR selection, vectorized over queries and candidates."""
+        n_q, n_c   = cand.shape
+        rows       = np.arange(n_q)
+        taken      = ~np.isfinite(rel)              # filtered-out candidates are never picked
+        redundancy = np.full((n_q, n_c), -np.inf, dtype=np.float32)
+        picks      = np.full((n_q, min(k, n_c)), -1, dtype=np.int64)
+
+        for step in range(picks.shape[1]):
+            if step == 0:
+                score = rel.copy()
+            else:
+                score = lambda_mult * rel - (1 - lambda_mult) * redundancy
+            score[taken] = -np.inf
+            best  = score.argmax(axis=1)
+            valid = np.isfinite(score[rows, best])
+            picks[valid, step] = best[valid]
+            taken[rows[valid], best[valid]] = True
+            redundancy[valid] = np.maximum(redundancy[valid], pair[rows[valid], best[valid], :])
+
+        return [[int(cand[r, c]) for c in picks[r] if c >= 0] for r in range(n_q)]
+
+    def _ann_candidates(self, query_vecs, fetch_k: int, filter_categories, with_pairs: bool = True):
+        """
+        Candidate ids, query similarities and candidate-pair similarities from
+        the FAISS index. Similarities use reconstructed (possibly quantized) vectors.
+        """
+        q       = self._normalize(query_vecs)
+        filters = list(filter_categories or [])
+        n_fetch = fetch_k * (ANN_FILTER_OVERFETCH if any(filters) else 1)
+        n_fetch = max(1, min(n_fetch, self.size))
+        _, ids  = self.ann_index.search(q, n_fetch)                      # Q×F, -1 = empty slot
+
+        valid = ids >= 0
+        for r, category in enumerate(filters):
+            if category:
+                valid[r] &= self._mask(category)[np.where(ids[r] >= 0, ids[r], 0)]
+
+        # keep the best fetch_k valid hits per query (FAISS returns them best first)
+        order = np.argsort(~valid, axis=1, kind="stable")[:, :min(fetch_k, n_fetch)]
+        cand  = np.take_along_axis(ids, order, axis=1)
+        ok    = np.take_along_axis(valid, order, axis=1)
+        cand  = np.where(ok, cand, 0)
+
+        vecs = self.ann_index.reconstruct_batch(cand.ravel()).reshape(cand.shape + (-1,))
+        vecs = vecs / np.maximum(np.linalg.norm(vecs, axis=2, keepdims=True), 1e-12)
+        rel  = np.einsum("qcd,qd->qc", vecs, q)
+        rel[~ok] = -np.inf
+        pair = vecs @ vecs.transpose(0, 2, 1) if with_pairs else None
+        return cand, rel, pair
+
+    def _apply_filters(self, sims: np.ndarray, filter_categories) -> np.ndarray:
+        if not filter_categories or not any(filter_categories):
+            return sims
+        sims = sims.copy()
+        for r, category in enumerate(filter_categories):
+            if category:
+                sims[r, ~self._mask(category)] = -np.inf
+        return sims
+
+    def _top_candidates(self, sims: np.ndarray, n: int) -> np.ndarray:
+        """Indices of the n highest-similarity columns per row, best first."""
+        n = min(n, sims.shape[1])
+        if n <= 0:
+            return np.zeros((sims.shape[0], 0), dtype=np.int64)
+        if n < sims.shape[1]:
+            part = np.argpartition(-sims, n - 1, axis=1)[:, :n]
+        else:
+            part = np.tile(np.arange(sims.shape[1]), (sims.shape[0], 1))
+        order = np.argsort(-np.take_along_axis(sims, part, axis=1), axis=1, kind="stable")
+        return np.take_along_axis(part, order, axis=1)
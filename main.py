@@ -4,9 +4,10 @@ sys.stderr.reconfigure(encoding='utf-8', errors='replace')
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from pathlib import Path
 import os
+import asyncio
 import logging
 from dotenv import load_dotenv
 
@@ -32,7 +33,15 @@ api_key = os.getenv("GROQ_API_KEY")
 print(f"🔑 GROQ_API_KEY found: {api_key is not None}")
 print("="*60 + "\n")
 
-# Now import your logic files
+# Optional allocation tracing for GET /api/v1/debug/memory?tracemalloc=N — started
+# before the index and embedding model load so their allocations are seen
+TRACEMALLOC_FRAMES = int(os.getenv("TRACEMALLOC_FRAMES", "0"))
+if TRACEMALLOC_FRAMES > 0:
+    import tracemalloc
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+
+# Now import your logic files — cheap: rag_service defers LangChain/FAISS/FastEmbed
+# imports until initialize() runs
 from app.api import chatbot
 from app.services.rag_service import RAGService
 
@@ -40,6 +49,20 @@ from app.services.rag_service import RAGService
 rag_service = RAGService()
 
 # --- 2. LIFESPAN MANAGEMENT ---
+async def _initialize_in_background(rebuild: bool):
+    """
+    Loads the RAG service in a worker thread and warms it up on this event loop
+    (where requests will run), so the server accepts connections right away;
+    /api/v1/health reports "initializing" until warm-up has finished.
+    """
+    try:
+        await rag_service.ainitialize(rebuild_index=rebuild)
+        logger.info("✅ RAG Service initialized and ready")
+    except Exception as e:
+        rag_service.init_error = str(e)
+        logger.error(f"❌ Failed to initialize RAG Service: {e}", exc_info=True)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -55,20 +78,21 @@ async def lifespan(app: FastAPI):
         logger.error("   👉 Then add  GROQ_API_KEY=gsk_xxx...  to your .env file")
         raise ValueError("Missing GROQ_API_KEY — get a free key at https://console.groq.com")
 
-    # Initialize RAG service
+    # Store in state so chatbot.py can access it via request.app.state;
+    # endpoints check rag_service.ready before using it
+    app.state.rag_service = rag_service
     rebuild = os.getenv("REBUILD_INDEX", "false").lower() == "true"
-    try:
-        rag_service.initialize(rebuild_index=rebuild)
-        # Store in state so chatbot.py can access it via request.app.state
-        app.state.rag_service = rag_service
-        logger.info("✅ RAG Service initialized and attached to app state")
-    except Exception as e:
-        logger.error(f"❌ Failed to initialize RAG Service: {e}")
-        raise
+    app.state.init_task = asyncio.create_task(_initialize_in_background(rebuild))
 
     yield  # --- API is running ---
 
     logger.info("🛑 Shutting down API...")
+    # A startup still in progress is stopped at its next phase and waited for
+    # before the retrieval pool (and any BM25 processes) goes away
+    app.state.init_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await app.state.init_task
+    await rag_service.ashutdown()
 
 # --- 3. APP CONFIGURATION ---
 app = FastAPI(
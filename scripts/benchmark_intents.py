@@ -0,0 +1,193 @@
+"""
+Time the single-pass intent classifier (app/services/intent_classifier.py)
+against the per-method checks it replaced.
+
+1. Equivalence: the replaced checks are kept below as the reference, and
+   both are compared on a generated corpus that puts every trigger phrase
+   into several templates.
+2. Micro-benchmark: per-message time of the old chain vs classify().
+
+    python scripts/benchmark_intents.py [--reps 200]
+
+Exits non-zero on any mismatch, before timing. The pinned classifications
+live in tests/test_intent_classifier.py. Needs no index or API key.
+"""
+
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "app" / "services"))
+
+from intent_classifier import classify, RULE_PHRASES, CATEGORY_KEYWORDS, GREETING_WORDS
+
+TEMPLATES = ["{}", "please {} now", "Can you tell me {}?", "{} in chitwan national park", "WHAT {}"]
+
+
+# ── Reference: the per-method checks the classifier replaced ──────────────────
+
+def legacy_is_greeting(message):
+    single_word = {"hello", "hi", "hey", "namaste", "howdy", "greetings", "yo"}
+    multi_word  = {"good morning", "good evening", "good afternoon"}
+    nepali_greetings = {"नमस्ते", "नमस्कार", "सुप्रभात", "नमस्"}
+    msg   = message.strip().lower()
+    words = msg.split()
+    if len(words) > 4:
+        return False
+    if bool(single_word.intersection(words)) or any(p in msg for p in multi_word):
+        return True
+    return any(g in message for g in nepali_greetings)
+
+
+def legacy_is_activity_list(message):
+    triggers_en = ["what activities", "list activities", "what can i do", "available activities",
+                   "what to do", "things to do", "activities available", "all activities",
+                   "what are the activities", "what activities are there"]
+    triggers_ne = ["गतिविधिहरू छन्", "गतिविधि छन्", "के-के गतिविधि", "कुन-कुन गतिविधि",
+                   "कुन कुन गतिविधि", "के गर्न सकिन्छ", "गतिविधिहरू"]
+    m = message.lower()
+    return any(t in m for t in triggers_en) or any(t in message for t in triggers_ne)
+
+
+def legacy_is_price(message):
+    triggers = ["how much", "cost", "price", "fee", "ticket", "entry fee",
+                "rate", "charge", "tariff", "npr", "rupee", "rupees",
+                "when does", "when do", "what time", "timing", "schedule",
+                "opening time", "closing time", "start time", "open at", "close at",
+                "what are the timings", "what are the hours"]
+    nepali_triggers = ["कति", "शुल्क", "मूल्य", "टिकट", "पैसा", "रुपैयाँ",
+                       "कहिले", "कति बजे", "समय", "सुरु हुन्छ", "बन्द हुन्छ",
+                       "कार्यक्रम समय", "खुल्ने", "बन्द हुने"]
+    msg = message.lower()
+    return any(t in msg for t in triggers) or any(t in message for t in nepali_triggers)
+
+
+def legacy_is_conservation(message):
+    m = message.lower().strip()
+    if re.match(r"^(where|when|how|why|is |are |what is|what's|which|who|can i|should i)", m):
+        return False
+    triggers = ["endangered", "threatened", "vulnerable", "critically",
+                "conservation", "extinction", "extinct",
+                "at risk", "dying out", "nearly extinct", "conservation status",
+                "need protection", "needs protection", "protect"]
+    nepali_triggers = ["लोपोन्मुख", "संकटापन्न", "संरक्षण", "विलुप्त", "खतरामा"]
+    return any(t in m for t in triggers) or any(t in message for t in nepali_triggers)
+
+
+def legacy_is_list(message):
+    triggers = ["list", "name all", "name some", "tell me all", "give me all", "show all",
+                "enumerate", "what types", "what kind", "what species", "examples of",
+                "types of", "kinds of", "all the", "all animals", "all birds", "all mammals",
+                "mention", "can you list", "could you list", "top 5", "top 10",
+                "top five", "top ten", "top three", "top 3", "what are the", "what are some"]
+    nepali_triggers = ["सूची", "नाम बताउ", "सबै बताउ", "कुन-कुन", "कुन कुन",
+                       "प्रजातिहरू", "जनावरहरू", "चराहरू", "सबै जनावर",
+                       "चराहरू छन्", "जनावरहरू छन्"]
+    m = message.lower()
+    if re.match(r"^(which|what is|what's|how does|how do|why|who|when is|when|where|how much|how many|is |are |can i|should i)", m):
+        return False
+    return any(t in m for t in triggers) or any(t in message for t in nepali_triggers)
+
+
+def legacy_is_bare_list(message):
+    triggers = ["no explanation", "only list", "just list", "just names", "names only",
+                "no description", "without description", "only names", "bare list",
+                "list only", "just the names", "no details"]
+    return any(t in message.lower() for t in triggers)
+
+
+def legacy_category(message):
+    m = message.lower()
+    for name, words in CATEGORY_KEYWORDS:
+        if any(w in m for w in words):
+            return name
+    return None
+
+
+def legacy_is_nepali(text):
+    return any('ऀ' <= c <= 'ॿ' for c in text)
+
+
+def legacy_is_followup(message):
+    followup_triggers = ["describe it", "tell me more", "more about it", "what about it",
+                         "explain it", "elaborate", "more details", "describe that",
+                         "tell me about it", "what is it", "what's it", "and it"]
+    m = message.strip().lower()
+    if len(m.split()) <= 3 and any(w in m.split() for w in ["it", "that", "this", "them", "they", "those"]):
+        return True
+    return any(t in m for t in followup_triggers)
+
+
+def legacy_classify(message):
+    if legacy_is_greeting(message):
+        intent = "greeting"
+    elif legacy_is_activity_list(message):
+        intent = "activity_list"
+    elif legacy_is_bare_list(message):
+        intent = "bare_list"
+    elif legacy_is_price(message):
+        intent = "price"
+    elif legacy_is_conservation(message):
+        intent = "conservation"
+    elif legacy_is_list(message):
+        intent = "list"
+    else:
+        intent = "convo"
+    return (intent, legacy_category(message), legacy_is_nepali(message), legacy_is_followup(message))
+
+
+def as_tuple(q):
+    return (q.intent, q.category, q.is_nepali, q.is_followup)
+
+
+def build_corpus():
+    phrases = set(GREETING_WORDS)
+    for group in RULE_PHRASES.values():
+        phrases.update(group)
+    for _, words in CATEGORY_KEYWORDS:
+        phrases.update(words)
+    ordered = sorted(phrases)
+    corpus  = [t.format(phrase) for phrase in ordered for t in TEMPLATES]
+    # phrase pairs exercise precedence between rules
+    for i, a in enumerate(ordered):
+        b = ordered[(i * 7 + 3) % len(ordered)]
+        corpus.append(a + " " + b)
+        corpus.append(b.upper() + " and " + a)
+    return corpus
+
+
+def time_per_message(fn, corpus, reps):
+    t = time.perf_counter()
+    for _ in range(reps):
+        for msg in corpus:
+            fn(msg)
+    return (time.perf_counter() - t) / (reps * len(corpus)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reps", type=int, default=200, help="timed passes over the corpus")
+    args = parser.parse_args()
+
+    failures = 0
+    corpus   = build_corpus()
+    for message in corpus:
+        old, new = legacy_classify(message), as_tuple(classify(message))
+        if old != new:
+            failures += 1
+            print("LEGACY MISMATCH  " + repr(message) + "\n  legacy " + str(old) + "\n  new    " + str(new))
+
+    print(str(len(corpus)) + " messages compared against the legacy checks — " + str(failures) + " mismatches")
+    if failures:
+        sys.exit(1)
+
+    legacy_us = time_per_message(legacy_classify, corpus, args.reps)
+    new_us    = time_per_message(classify, corpus, args.reps)
+    print("legacy chain : " + str(round(legacy_us, 2)) + " µs/message")
+    print("classify()   : " + str(round(new_us, 2)) + " µs/message  (" + str(round(legacy_us / new_us, 1)) + "x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark the in-memory VectorEngine against LangChain's FAISS MMR retriever.
+Reports p50/p99 search latency per k and whether both return the same top-k.
+Run after the index exists:  python scripts/benchmark_retrieval.py [--reps 50]
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to Python path so we can import from app, and app/services
+# for the service modules, which import each other as top-level modules
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "app" / "services"))
+
+from app.services.rag_service import RAGService, MMR_FETCH_FACTOR, MMR_LAMBDA
+from intent_classifier import classify
+
+QUERIES = [
+    "How much does a jeep safari cost?",
+    "What time does the canoe safari start?",
+    "Tell me about Bengal tigers",
+    "Which birds are endangered in Chitwan?",
+    "Are there crocodiles in the rivers?",
+    "What should I wear inside the park?",
+    "Is a jungle walk safe?",
+    "List the mammals found in Chitwan",
+    "Tell me about the gharial",
+    "What butterflies can I see?",
+    "Which plants grow in the grasslands?",
+    "Do I really need a guide?",
+    "What is the best time to visit?",
+    "Where can I see one-horned rhinos?",
+    "Tharu cultural program timing",
+    "What frogs live in Chitwan?",
+    "How much is the entry fee for foreigners?",
+    "What are the park rules for photography?",
+]
+
+
+def percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def doc_key(doc):
+    return (doc.page_content, doc.metadata.get("view"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reps", type=int, default=50, help="timed repetitions per query")
+    args = parser.parse_args()
+
+    rag = RAGService()
+    rag.initialize(rebuild_index=False, warm_up=False)
+    engine = rag.vector_engine
+
+    filters = [classify(q).category for q in QUERIES]
+    vectors = np.asarray([rag.embeddings.embed_query(q) for q in QUERIES], dtype=np.float32)
+    print("Corpus: " + str(engine.size) + " vectors | " + str(len(QUERIES)) + " queries | "
+          + str(args.reps) + " reps")
+    print("")
+    print("  k | LangChain p50/p99 ms | Engine p50/p99 ms | Batched/query p50 ms | same top-k (unfiltered / filtered)")
+
+    for k in (2, 6, 10):
+        fetch_k = k * MMR_FETCH_FACTOR
+        lc_times, en_times, batch_times = [], [], []
+        same = {"unfiltered": [0, 0], "filtered": [0, 0]}
+
+        for _ in range(args.reps):
+            for vec, category in zip(vectors, filters):
+                t = time.perf_counter()
+                rag.vector_db.max_marginal_relevance_search_by_vector(
+                    vec.tolist(), k=k, fetch_k=fetch_k, lambda_mult=MMR_LAMBDA,
+                    filter={"category": category} if category else None,
+                )
+                lc_times.append(time.perf_counter() - t)
+
+                t = time.perf_counter()
+                engine.mmr_search(vec, k=k, fetch_k=fetch_k, lambda_mult=MMR_LAMBDA,
+                                  filter_categories=[category])
+                en_times.append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            engine.mmr_search(vectors, k=k, fetch_k=fetch_k, lambda_mult=MMR_LAMBDA,
+                              filter_categories=filters)
+            batch_times.append((time.perf_counter() - t) / len(QUERIES))
+
+        batched_ids = engine.mmr_search(vectors, k=k, fetch_k=fetch_k, lambda_mult=MMR_LAMBDA,
+                                        filter_categories=filters)
+        for vec, category, ids in zip(vectors, filters, batched_ids):
+            lc_docs = rag.vector_db.max_marginal_relevance_search_by_vector(
+                vec.tolist(), k=k, fetch_k=fetch_k, lambda_mult=MMR_LAMBDA,
+                filter={"category": category} if category else None,
+            )
+            bucket = "filtered" if category else "unfiltered"
+            same[bucket][1] += 1
+            if [doc_key(d) for d in lc_docs] == [doc_key(engine.docs[i]) for i in ids]:
+                same[bucket][0] += 1
+
+        print(" " + str(k).rjust(2)
+              + " | " + (str(percentile_ms(lc_times, 50)) + " / " + str(percentile_ms(lc_times, 99))).ljust(19)
+              + " | " + (str(percentile_ms(en_times, 50)) + " / " + str(percentile_ms(en_times, 99))).ljust(17)
+              + " | " + str(percentile_ms(batch_times, 50)).ljust(20)
+              + " | " + str(same["unfiltered"][0]) + "/" + str(same["unfiltered"][1])
+              + "  /  " + str(same["filtered"][0]) + "/" + str(same["filtered"][1]))
+
+    print("")
+    print("Filtered searches can differ by design: LangChain filters only the top fetch_k*2 hits,")
+    print("the engine searches the whole category.")
+
+
+if __name__ == "__main__":
+    main()
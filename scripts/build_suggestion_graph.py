@@ -0,0 +1,73 @@
+"""
+Build the next-question suggestion graph (app/services/suggestion_graph.py).
+
+Embeds every suggestion in the English/Nepali pools, every question in the
+response cache and the pre-answered warm-up/default questions, ranks related
+follow-ups for each of them and for every indexed document, and writes
+vector_store/suggestion_graph.json. The server loads it at startup; rerun
+after rebuilding the index or editing the suggestion pools. render.yaml runs
+it in the build, right after scripts/ingest_dat.py, so every deploy ships a
+graph matching its pools and index. Needs the index and the embedding model,
+not a GROQ_API_KEY.
+
+    python scripts/build_suggestion_graph.py [--sample 5]
+
+Run from the project root (the response cache file is read from there).
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Add parent directory to Python path so we can import from app, and app/services
+# for the service modules, which import each other as top-level modules
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent.parent / "app" / "services"))
+
+from app.services.rag_service import RAGService, WARMUP_QUERIES, INDEX_VERSION
+from suggestion_graph import SuggestionGraph, build_graph, GRAPH_FILE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sample", type=int, default=5, help="print follow-ups for this many question nodes")
+    args = parser.parse_args()
+
+    rag = RAGService()
+    try:
+        rag.initialize(rebuild_index=False, warm_up=False, llm=False)
+        if rag._index_meta.get("version") != INDEX_VERSION:
+            sys.exit("Index is not v" + str(INDEX_VERSION) + " - run scripts/ingest_dat.py first")
+        build(rag, args.sample)
+    finally:
+        rag.retrieval_pool.shutdown()
+
+
+def build(rag: RAGService, sample: int):
+    engine = rag.suggestion_engine
+
+    cached    = [entry["query"] for entry in rag._cache._cache.values() if entry.get("query")]
+    answered  = [message for _, message in WARMUP_QUERIES]
+    questions = cached + answered + engine.default_suggestions + engine.nepali_default_suggestions
+
+    t     = time.perf_counter()
+    graph = build_graph(rag.embeddings, rag.vector_engine, engine, questions)
+    path  = Path(__file__).parent.parent / "vector_store" / GRAPH_FILE
+    SuggestionGraph.save(graph, path)
+
+    nodes = graph["nodes"]
+    docs  = sum(1 for key in nodes if key.startswith("d:"))
+    print("Built " + str(len(nodes)) + " nodes (" + str(len(nodes) - docs) + " questions, " + str(docs)
+          + " documents; " + str(len(cached)) + " from the response cache) in "
+          + str(round(time.perf_counter() - t, 2)) + "s -> " + str(path))
+
+    for key in [k for k in nodes if k.startswith("q:")][:sample]:
+        print("")
+        print(key[2:])
+        for s in nodes[key]["en"][:3]:
+            print("  -> " + s)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
 """
 Script to ingest JSON data and create vector store
-Run this once to build the initial index, or when you update your data
+Run this once to build the initial index, or when you update your data.
+Needs no GROQ_API_KEY; render.yaml runs it in the build, so every deploy
+serves a current-format index (REBUILD_INDEX stays false at runtime).
+
+    python scripts/ingest_dat.py [--index-type flat|hnsw|ivfpq|sq8|fp16] [--report]
+
+--report also writes a recall@k vs latency vs memory comparison of every
+index type to vector_store/index_report.json
 """
 
 print("=" * 50)
@@ -8,6 +15,8 @@ print("DEBUG: Script is starting...")
 print("=" * 50)
 
 import sys
+import json
+import argparse
 from pathlib import Path
 
 print("DEBUG: Basic imports successful")
@@ -19,6 +28,7 @@ print("DEBUG: Path added, about to import RAGService")
 
 try:
     from app.services.rag_service import RAGService
+    from app.services.index_factory import INDEX_TYPES, evaluate_index_types
     print("DEBUG: RAGService imported successfully!")
 except Exception as e:
     print(f"ERROR importing RAGService: {e}")
@@ -26,29 +36,94 @@ except Exception as e:
     traceback.print_exc()
     sys.exit(1)
 
+REPORT_PATH = Path(__file__).parent.parent / "vector_store" / "index_report.json"
+
+# Realistic visitor questions; the report adds perturbed copies of indexed
+# vectors so recall is measured over the whole corpus, not just these.
+EVAL_QUERIES = [
+    "How much does a jeep safari cost?",
+    "What time does the canoe safari start?",
+    "Tell me about Bengal tigers",
+    "Which birds are endangered in Chitwan?",
+    "Are there crocodiles in the rivers?",
+    "What should I wear inside the park?",
+    "Is a jungle walk safe?",
+    "List the mammals found in Chitwan",
+    "What butterflies can I see?",
+    "Which plants grow in the grasslands?",
+    "Do I really need a guide?",
+    "What is the best time to visit?",
+]
+MAX_PERTURBED_QUERIES = 200
+REPORT_K = 10
+
+
+def build_report(rag):
+    import numpy as np
+
+    # Re-embed exactly what was indexed (view text for multi-view records) so the
+    # comparison uses full-precision vectors whatever index type was just built.
+    texts   = [d.metadata.get("view") or d.page_content for d in rag.vector_engine.docs]
+    vectors = np.asarray(rag.embeddings.embed_documents(texts), dtype=np.float32)
+
+    rng     = np.random.default_rng(0)
+    picks   = rng.choice(len(vectors), size=min(MAX_PERTURBED_QUERIES, len(vectors)), replace=False)
+    noisy   = vectors[picks] + rng.normal(0, 0.05, size=(len(picks), vectors.shape[1])).astype(np.float32)
+    noisy  /= np.linalg.norm(noisy, axis=1, keepdims=True)
+    queries = np.vstack([np.asarray([rag.embeddings.embed_query(q) for q in EVAL_QUERIES], dtype=np.float32), noisy])
+
+    rows = evaluate_index_types(vectors, queries, k=REPORT_K)
+
+    print("\n" + "=" * 50)
+    print("Index report: " + str(len(vectors)) + " vectors, " + str(len(queries)) + " queries")
+    print("=" * 50)
+    print("type  | recall@" + str(REPORT_K) + " | p50 ms  | p99 ms  | memory KB | build s")
+    for r in rows:
+        print(r["index_type"].ljust(5) + " | " + str(r["recall_at_k"]).ljust(9)
+              + " | " + str(r["p50_ms"]).ljust(7) + " | " + str(r["p99_ms"]).ljust(7)
+              + " | " + str(round(r["memory_bytes"] / 1024, 1)).ljust(9) + " | " + str(r["build_secs"]))
+
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump({"vectors": len(vectors), "queries": len(queries), "results": rows}, f, indent=2)
+    print("Report written to " + str(REPORT_PATH))
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Build the Chitwan National Park vector index")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=None,
+                        help="FAISS index type (default: INDEX_TYPE env var or flat)")
+    parser.add_argument("--report", action="store_true",
+                        help="compare recall/latency/memory of every index type")
+    args = parser.parse_args()
+
     print("\n" + "=" * 50)
     print("Chitwan National Park RAG - Data Ingestion")
     print("=" * 50)
-    
+
+    print("DEBUG: Creating RAGService instance...")
+    rag = RAGService()
+
     try:
-        print("DEBUG: Creating RAGService instance...")
-        rag = RAGService()
-        
         print("DEBUG: Initializing RAG with rebuild_index=True...")
-        rag.initialize(rebuild_index=True)
-        
+        rag.initialize(rebuild_index=True, index_type=args.index_type, warm_up=False, llm=False)
+
+        if args.report:
+            build_report(rag)
+
         print("\n" + "=" * 50)
         print("✓ Data ingestion completed successfully!")
         print("=" * 50)
-        
+
     except Exception as e:
         print(f"\n✗ Error during data ingestion: {e}")
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        rag.retrieval_pool.shutdown()
 
 print("DEBUG: About to call main()")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,64 @@
+"""
+Pinned classifications of the single-pass intent classifier
+(app/services/intent_classifier.py): visitor messages and the intent,
+category, language and follow-up flags they must get. render.yaml runs this
+before every deploy. scripts/benchmark_intents.py compares the classifier
+with the checks it replaced and times both.
+
+    python -m pytest -q tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).parent.parent / "app" / "services"))
+
+from intent_classifier import classify
+
+# message → (intent, category, is_nepali, is_followup)
+PINNED = [
+    ("hello",                                        ("greeting", None, False, False)),
+    ("Hi there!",                                    ("greeting", None, False, False)),
+    ("good morning guide",                           ("greeting", None, False, False)),
+    ("hello, what does a jeep safari cost for foreigners?", ("price", None, False, False)),
+    ("नमस्ते",                                        ("greeting", None, True, False)),
+    ("What activities are available?",               ("activity_list", None, False, False)),
+    ("things to do in chitwan",                      ("activity_list", None, False, False)),
+    ("के-के गतिविधि छन्?",                             ("activity_list", None, True, False)),
+    ("just list the reptiles, no explanation",       ("bare_list", "reptiles", False, False)),
+    ("names only: butterflies",                      ("bare_list", "butterflies", False, False)),
+    ("How much does a jeep safari cost?",            ("price", None, False, False)),
+    ("What time does the canoe safari start?",       ("price", None, False, False)),
+    ("what are the timings of the tharu program",    ("price", None, False, False)),
+    ("Entry fee for SAARC visitors",                 ("price", None, False, False)),
+    ("चितवनमा कति बाघ छन्?",                          ("price", None, True, False)),
+    ("Endangered mammals in Chitwan",                ("conservation", "mammals", False, False)),
+    ("list the critically endangered birds",         ("conservation", "birds", False, False)),
+    ("Which birds are endangered in Chitwan?",       ("convo", "birds", False, False)),
+    ("Is the gharial endangered?",                   ("convo", "reptiles", False, False)),
+    ("लोपोन्मुख जनावरहरू",                             ("conservation", None, True, False)),
+    ("List some birds found in Chitwan",             ("list", "birds", False, False)),
+    ("what species of frog live here",               ("list", "amphibians", False, False)),
+    ("top 5 animals to see",                         ("list", None, False, False)),
+    ("what are some trees in the park",              ("list", "plants", False, False)),
+    ("चितवनका चराहरू",                                 ("list", None, True, False)),
+    ("Which plants grow in the grasslands?",         ("convo", "plants", False, False)),
+    ("what is the list of mammals",                  ("convo", "mammals", False, False)),
+    ("Tell me about the Bengal tiger",               ("convo", "mammals", False, False)),
+    ("Are there crocodiles in the rivers?",          ("convo", "reptiles", False, False)),
+    ("tell me about the fishing cat",                ("convo", "fish", False, False)),
+    ("What should I wear inside the park?",          ("convo", None, False, False)),
+    ("describe it",                                  ("convo", None, False, True)),
+    ("tell me more",                                 ("convo", None, False, True)),
+    ("what about them",                              ("convo", None, False, True)),
+    ("is that dangerous",                            ("convo", None, False, True)),
+    ("यसको बारेमा थप भन्नुस्",                          ("convo", None, True, False)),
+]
+
+
+@pytest.mark.parametrize("message, expected", PINNED, ids=[message for message, _ in PINNED])
+def test_pinned(message, expected):
+    q = classify(message)
+    assert (q.intent, q.category, q.is_nepali, q.is_followup) == expected